@@ -0,0 +1,118 @@
+import datetime
+from sqlalchemy import func
+from models import db, Expense, Income, MonthlySummary
+from dates import bucket_expr, bucket_start, next_bucket, month_key
+from archive import ledger_table
+
+# ==========================================
+# TIME-SERIES ANALYTICS (/api/analytics/series)
+# ==========================================
+# SQL groups the rows into (bucket, group) sums; numpy lays them out on the
+# full bucket axis in one scatter-add, so empty buckets come back as 0 without
+# a Python loop. Month/quarter/year read the MonthlySummary rollup whenever it
+# has the grouping asked for, so the cost follows buckets x groups, not the
+# number of transactions. numpy is imported where it's used, not at the top:
+# create_app imports this module and shouldn't pay for numpy on every boot.
+
+METRICS = ('income', 'expense', 'net')
+GROUP_BY = ('category', 'source', 'payment_method')
+OTHER = '(other)'
+_UNITS = {'day': ('D', 1), 'week': ('D', 7), 'month': ('M', 1), 'quarter': ('M', 3), 'year': ('Y', 1)}
+
+def bucket_axis(first, last, granularity):
+    # Bucket starts from first to last (both bucket starts), as datetime64
+    import numpy as np
+    unit, step = _UNITS[granularity]
+    return np.arange(np.datetime64(first, unit), np.datetime64(last, unit) + 1, step)
+
+def _positions(bucket_strings, axis, granularity):
+    # 'YYYY-MM-DD' bucket starts -> index on the axis
+    import numpy as np
+    unit, step = _UNITS[granularity]
+    values = np.array(bucket_strings, dtype='datetime64[D]').astype(f'datetime64[{unit}]')
+    return ((values - axis[0]).astype(np.int64) // step).astype(np.intp)
+
+def _group_columns(group_by):
+    # Which column groups each side (by name); income has no payment_method, so it stays one series
+    if group_by in ('category', 'source'): return 'category', 'source'
+    if group_by == 'payment_method': return 'payment_method', None
+    return None, None
+
+def _raw_rows(model, group_name, user_id, start, end, granularity):
+    # [(bucket 'YYYY-MM-DD', group, total)] straight from the transactions (and the archive, if the range reaches it)
+    t = ledger_table(model, user_id, start)
+    bucket = bucket_expr(t.c.date, granularity).label('bucket')
+    group_col = t.c[group_name] if group_name is not None else None
+    group = group_col if group_col is not None else db.literal(None)
+    query = db.session.query(bucket, group, func.sum(t.c.amount)) \
+        .filter(t.c.user_id == user_id, t.c.date >= start, t.c.date < end)
+    return query.group_by(bucket, group).all() if group_col is not None else query.group_by(bucket).all()
+
+def _summary_rows(user_id, start, end, grouped):
+    # Same shape from the monthly rollup: ([(month, group, total)] income, ... expense)
+    columns = [MonthlySummary.month] + ([MonthlySummary.category] if grouped else [])
+    rows = db.session.query(*columns, func.sum(MonthlySummary.income_total), func.sum(MonthlySummary.income_count),
+                            func.sum(MonthlySummary.expense_total), func.sum(MonthlySummary.expense_count)) \
+        .filter(MonthlySummary.user_id == user_id, MonthlySummary.month >= month_key(start), MonthlySummary.month < month_key(end)) \
+        .group_by(*columns).all()
+    income, expense = [], []
+    for row in rows:
+        month, group = row[0] + '-01', (row[1] if grouped else None)
+        inc_total, inc_count, exp_total, exp_count = row[-4:]
+        if inc_count: income.append((month, group, inc_total))
+        if exp_count: expense.append((month, group, exp_total))
+    return income, expense
+
+def _layout(rows, axis, granularity, top):
+    # rows -> {group: values[len(axis)]}, top groups by total, the rest folded into OTHER
+    import numpy as np
+    if not rows: return {}
+    groups, index = np.unique(np.array([r[1] if r[1] is not None else '' for r in rows], dtype=object), return_inverse=True)
+    matrix = np.zeros((len(groups), len(axis)))
+    np.add.at(matrix, (index, _positions([r[0] for r in rows], axis, granularity)), np.array([r[2] or 0.0 for r in rows], dtype=float))
+
+    order = np.argsort(-matrix.sum(axis=1), kind='stable')
+    keep, rest = order[:top], order[top:]
+    series = {groups[i] or None: matrix[i] for i in keep}
+    if len(rest): series[OTHER] = matrix[rest].sum(axis=0)
+    return series
+
+def build_series(user_id, granularity, first, last, metrics=METRICS, group_by=None, top=10, max_buckets=None):
+    # first/last are any dates; the range is widened to whole buckets
+    import numpy as np
+    start = bucket_start(first, granularity)
+    end = next_bucket(bucket_start(last, granularity), granularity)  # exclusive
+    axis = bucket_axis(start, bucket_start(last, granularity), granularity)
+    if len(axis) == 0: raise ValueError("'from' must not be after 'to'")
+    if max_buckets and len(axis) > max_buckets:
+        raise ValueError(f"{len(axis)} {granularity} buckets requested (max {max_buckets}); use a coarser granularity")
+
+    expense_col, income_col = _group_columns(group_by)
+    if granularity in ('month', 'quarter', 'year') and group_by != 'payment_method':
+        income_rows, expense_rows = _summary_rows(user_id, start, end, grouped=group_by is not None)
+    else:
+        income_rows = _raw_rows(Income, income_col, user_id, start, end, granularity) if {'income', 'net'} & set(metrics) else []
+        expense_rows = _raw_rows(Expense, expense_col, user_id, start, end, granularity) if {'expense', 'net'} & set(metrics) else []
+
+    income = _layout(income_rows, axis, granularity, top if income_col is not None else 1)
+    expense = _layout(expense_rows, axis, granularity, top if expense_col is not None else 1)
+    zeros = np.zeros(len(axis))
+
+    series = []
+    for metric, by_group in (('income', income), ('expense', expense)):
+        if metric not in metrics: continue
+        if not by_group and (group_by is None or (metric == 'income' and income_col is None)):
+            by_group = {None: zeros}  # Ungrouped series are always present, even if empty
+        for group, values in by_group.items():
+            series.append({'metric': metric, 'group': group, 'total': round(float(values.sum()), 2), 'values': np.round(values, 2).tolist()})
+    if 'net' in metrics:
+        net = sum(income.values(), zeros) - sum(expense.values(), zeros)
+        series.append({'metric': 'net', 'group': None, 'total': round(float(net.sum()), 2), 'values': np.round(net, 2).tolist()})
+
+    return {
+        'granularity': granularity,
+        'from': start.isoformat(),
+        'to': (end - datetime.timedelta(days=1)).isoformat(),
+        'buckets': [str(b) for b in axis.astype('datetime64[D]')],
+        'series': series,
+    }
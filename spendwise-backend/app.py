@@ -3,6 +3,12 @@ from flask_cors import CORS
 from config import Config
 from models import db
 from extensions import mail
+from auth_cache import init_user_cache
+from cache import init_response_cache
+from instrumentation import init_instrumentation
+from insights import init_ledger_cache
+from serialization import init_serialization
+from passwords import init_passwords
 
 def create_app():
     app = Flask(__name__)
@@ -11,24 +17,39 @@ def create_app():
     app.config.from_object(Config)
     
     # 2. Enable CORS (Allows Frontend to talk to Backend)
-    CORS(app)
+    CORS(app, expose_headers=['X-Next-Cursor', 'ETag'])
     
     # 3. Initialize Extensions
     db.init_app(app)
     mail.init_app(app)
+    init_user_cache(app)
+    init_response_cache(app)
+    init_ledger_cache(app)
+    init_passwords(app)
+    init_instrumentation(app)  # Request timing + SQL accounting for /api/admin/metrics
+    init_serialization(app)  # orjson + gzip/brotli; registered last so compression is inside the timing
     
     # 4. Register Blueprints (Routes)
     from routes import main
     app.register_blueprint(main)
     
-    # 5. Create Tables Automatically
-    # This is the standard way for Flask to ensure tables exist
-    with app.app_context():
-        db.create_all()
+    # 5. Tables are NOT created here: creating the app must not touch the database
+    # (every worker boot and CLI script goes through this). Run `python migrate.py` on deploy.
+
+    # 6. Start the email outbox dispatcher (sends queued mail in the background).
+    # Started by the first request, so scripts that import the app don't spawn it.
+    if app.config.get('MAIL_DISPATCHER') == 'thread':
+        from mailer import start_dispatcher
+        @app.before_request
+        def ensure_dispatcher():
+            start_dispatcher(app)
 
     return app
 
 app = create_app()
 
 if __name__ == '__main__':
+    # Local dev server: bring the schema up to date first
+    from migrate import upgrade
+    with app.app_context(): upgrade()
     app.run(debug=True)
\ No newline at end of file
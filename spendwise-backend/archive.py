@@ -0,0 +1,84 @@
+import datetime
+import time
+from sqlalchemy import select, delete, insert, union_all, func
+from models import db, Expense, Income, ExpenseArchive, IncomeArchive
+
+# ==========================================
+# HOT / COLD TRANSACTIONS
+# ==========================================
+# Transactions dated more than ARCHIVE_AFTER_DAYS ago are moved (same id, same
+# columns) from expense/income into expense_archive/income_archive by
+# run_archive.py, so the live tables and their indexes only hold recent rows.
+# Aggregates don't change: monthly summaries and platform counters were updated
+# when the rows were written and still count them.
+#
+# Reads: ledger_table(model, user_id, start) is the table to query for a user's
+# rows dated `start` or later. It's the live table unless the user has archived
+# rows in that range, in which case it's a UNION ALL of both (the user/date
+# predicates are pushed into each side, so both indexes are still used).
+
+ARCHIVE_OF = {Expense: ExpenseArchive, Income: IncomeArchive}
+
+def archived_through(model, user_id):
+    # Date of the user's newest archived row, or None (one index probe)
+    archive = ARCHIVE_OF[model]
+    return db.session.query(func.max(archive.date)).filter(archive.user_id == user_id).scalar()
+
+def ledger_table(model, user_id=None, start=None):
+    # user_id=None: everyone (rebuilds, recounts), always includes the archive
+    if user_id is not None:
+        through = archived_through(model, user_id)
+        if through is None or (start is not None and start > through):
+            return model.__table__
+    live, archive = model.__table__, ARCHIVE_OF[model].__table__
+    return union_all(select(*live.c), select(*[archive.c[c.name] for c in live.c])).subquery(live.name + '_all')
+
+def find_row(model, user_id, row_id):
+    # (table, row) for a live or archived row of this user, or (None, None)
+    for m in (model, ARCHIVE_OF[model]):
+        row = db.session.query(m).filter_by(id=row_id, user_id=user_id).first()
+        if row is not None: return m, row
+    return None, None
+
+# ==========================================
+# ARCHIVAL JOB
+# ==========================================
+
+def cutoff_date(days, today=None):
+    return (today or datetime.date.today()) - datetime.timedelta(days=days)
+
+def _move(model, ids, cutoff):
+    # DELETE ... RETURNING then INSERT, in the caller's transaction. A second archiver
+    # racing on the same ids gets nothing back from its DELETE, so rows move once.
+    live, archive = model.__table__, ARCHIVE_OF[model].__table__
+    where = (live.c.id.in_(ids), live.c.date < cutoff)
+    if db.session.get_bind().dialect.delete_returning:
+        rows = db.session.execute(delete(live).where(*where).returning(*live.c)).all()
+    else:
+        rows = db.session.execute(select(*live.c).where(*where).with_for_update()).all()
+        db.session.execute(delete(live).where(live.c.id.in_([r.id for r in rows])))
+    if rows:
+        db.session.execute(insert(archive), [dict(row._mapping) for row in rows])
+    return len(rows)
+
+def archive_transactions(cutoff, batch_size=1000, pause=0.0, log=print):
+    # Walks each live table by primary key in batches of `batch_size`, one short
+    # transaction per batch (only those rows are locked). Returns {table: rows moved}.
+    moved = {}
+    for model in ARCHIVE_OF:
+        total, last_id = 0, 0
+        while True:
+            ids = [r[0] for r in db.session.query(model.id).filter(model.id > last_id, model.date < cutoff)
+                   .order_by(model.id).limit(batch_size)]
+            if not ids: break
+            try:
+                total += _move(model, ids, cutoff)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            last_id = ids[-1]
+            if pause: time.sleep(pause)  # Let other writers in between batches
+        moved[model.__tablename__] = total
+        log(f"   - {model.__tablename__}: {total} rows dated before {cutoff.isoformat()} archived")
+    return moved
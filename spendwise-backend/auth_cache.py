@@ -0,0 +1,82 @@
+import datetime
+import json
+from models import db, User
+from cache import LRUBackend, RedisBackend
+
+# ==========================================
+# AUTHENTICATED-USER CACHE
+# ==========================================
+# token_required used to load the User row on every request. It now keeps a
+# small snapshot of the user's identity and flags, keyed by user id and
+# checked against the token's version ('ver' claim). A password change bumps
+# User.token_version, which both revokes old tokens and misses the cache.
+#
+# Backends (see cache.py):
+#   LRUBackend       - bounded LRU with TTL, per process
+#   UserRedisBackend - shared between workers, so invalidations reach all of them
+# Anything with get(key) / set(key, value) / delete(key) can be plugged in.
+
+class CachedUser:
+    # What the routes need from current_user, without an ORM object behind it
+    FIELDS = ('id', 'username', 'email', 'user_type', 'is_admin', 'token_version', 'data_version', 'data_updated_at')
+    __slots__ = FIELDS
+
+    def __init__(self, **values):
+        for f in self.FIELDS: setattr(self, f, values.get(f))
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(**{f: getattr(user, f) for f in cls.FIELDS})
+
+    @classmethod
+    def from_dict(cls, values):
+        if values.get('data_updated_at'):
+            values['data_updated_at'] = datetime.datetime.fromisoformat(values['data_updated_at'])
+        return cls(**values)
+
+    def to_dict(self):
+        values = {f: getattr(self, f) for f in self.FIELDS}
+        if values['data_updated_at']: values['data_updated_at'] = values['data_updated_at'].isoformat()
+        return values
+
+class UserRedisBackend(RedisBackend):
+    def encode(self, value): return json.dumps(value.to_dict())
+    def decode(self, raw): return CachedUser.from_dict(json.loads(raw))
+
+class UserCache:
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    def load(self, user_id, token_version):
+        # Returns a CachedUser, or None if the user is gone or the token was revoked
+        if self.backend is not None:
+            cached = self.backend.get(user_id)
+            if cached is not None and cached.token_version == token_version:
+                return cached
+        user = db.session.get(User, user_id)
+        if user is None or (user.token_version or 0) != token_version:
+            return None
+        cached = CachedUser.from_user(user)
+        if self.backend is not None:
+            self.backend.set(user_id, cached)
+        return cached
+
+    def invalidate(self, user_id):
+        if self.backend is not None:
+            self.backend.delete(user_id)
+
+    def stats(self):
+        return self.backend.stats() if self.backend is not None else {'backend': 'none'}
+
+user_cache = UserCache()
+
+def init_user_cache(app, backend=None):
+    kind = app.config.get('USER_CACHE_BACKEND', 'local')
+    ttl = app.config.get('USER_CACHE_TTL', 60)
+    if backend is None:
+        if kind == 'redis':
+            backend = UserRedisBackend.from_url(app.config['REDIS_URL'], ttl=ttl, prefix='spendwise:user:')
+        elif kind == 'local':
+            backend = LRUBackend(app.config.get('USER_CACHE_SIZE', 10000), ttl)
+    user_cache.backend = backend
+    return user_cache
@@ -0,0 +1,94 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, request
+from werkzeug.exceptions import HTTPException
+from models import db
+
+# ==========================================
+# BATCHED REQUESTS (/api/batch)
+# ==========================================
+# One round trip for a page that needs several endpoints:
+#   POST /api/batch
+#   {"requests": [{"id": "dash", "path": "/api/dashboard"},
+#                 {"id": "trends", "path": "/api/analytics/monthly", "headers": {"If-None-Match": "W/\"...\""}},
+#                 {"id": "add", "method": "POST", "path": "/api/expenses", "body": {...}}],
+#    "parallel": true}
+#   -> {"responses": [{"id", "status", "headers": {ETag, X-Next-Cursor, ...}, "body"}]} in request order
+#
+# The token is checked once for the whole batch. Each sub-request then runs the
+# normal view (same decorators: conditional GET, response cache, replica routing
+# through its own environ) with token_required taking the batch's claims from
+# BATCH_AUTH instead of decoding the JWT again; the user itself comes from the
+# user cache, so a write earlier in the batch is seen by the reads after it.
+#
+# Sequential (default): in order, on the batch request's DB session.
+# parallel=true: only when every sub-request is a GET; they run on BATCH_WORKERS
+# threads, each with its own app context and session.
+
+BATCH_AUTH = 'spendwise.batch_auth'
+METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+PASS_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'X-Next-Cursor', 'Location')
+
+log = logging.getLogger('spendwise.batch')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _pool(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('BATCH_WORKERS', 4), thread_name_prefix='batch')
+    return _executor
+
+def parse_batch(data, max_requests):
+    # -> list of sub-request dicts; raises ValueError on a malformed batch
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items: raise ValueError("'requests' must be a non-empty list")
+    if len(items) > max_requests: raise ValueError(f"At most {max_requests} requests per batch")
+    parsed = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str) or not item['path'].startswith('/api/'):
+            raise ValueError(f"requests[{i}]: 'path' must be an /api/... URL")
+        method = str(item.get('method', 'GET')).upper()
+        if method not in METHODS: raise ValueError(f"requests[{i}]: method must be one of {', '.join(METHODS)}")
+        if item['path'].split('?')[0].rstrip('/') == '/api/batch': raise ValueError(f"requests[{i}]: batches can't be nested")
+        headers = item.get('headers') or {}
+        if not isinstance(headers, dict): raise ValueError(f"requests[{i}]: 'headers' must be an object")
+        parsed.append({'id': item.get('id', i), 'method': method, 'path': item['path'], 'body': item.get('body'),
+                       'headers': {k: str(v) for k, v in headers.items() if k.lower() not in ('authorization', 'cookie')}})
+    return parsed
+
+def _body(response):
+    if response.status_code == 304: return None
+    if response.is_json: return response.get_json()
+    return response.get_data(as_text=True)
+
+def _run_one(app, item, claims, remote_addr):
+    ctx = app.test_request_context(item['path'], method=item['method'], headers=item['headers'], json=item['body'],
+                                   environ_overrides={BATCH_AUTH: claims, 'REMOTE_ADDR': remote_addr})
+    with ctx:
+        try:
+            response = app.make_response(app.dispatch_request())
+        except HTTPException as e:
+            return {'id': item['id'], 'status': e.code, 'headers': {}, 'body': {'error': e.description}}
+        except Exception:
+            log.exception("batch sub-request %s %s failed", item['method'], item['path'])
+            db.session.rollback()
+            return {'id': item['id'], 'status': 500, 'headers': {}, 'body': {'error': 'Internal error'}}
+        if response.direct_passthrough or response.is_streamed:  # Files and CSV streams: call those directly
+            response.close()
+            return {'id': item['id'], 'status': 400, 'headers': {}, 'body': {'error': 'Downloads are not available in a batch'}}
+        return {'id': item['id'], 'status': response.status_code,
+                'headers': {h: response.headers[h] for h in PASS_HEADERS if h in response.headers}, 'body': _body(response)}
+
+def run_batch(items, claims, parallel=False):
+    app = current_app._get_current_object()
+    remote_addr = request.remote_addr
+    if parallel and len(items) > 1 and all(item['method'] == 'GET' for item in items):
+        def in_thread(item):
+            with app.app_context():
+                return _run_one(app, item, claims, remote_addr)
+        return list(_pool(app).map(in_thread, items))
+    return [_run_one(app, item, claims, remote_addr) for item in items]
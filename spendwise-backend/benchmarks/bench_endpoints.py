@@ -0,0 +1,215 @@
+import argparse
+import datetime
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Endpoint load benchmark: seeds users x years of data (seed_data.py), then measures
+# login, dashboard, monthly trends, listings, budget analysis and exports through
+#   - the Flask test client (in-process, sequential) and
+#   - a real threaded WSGI server driven over HTTP by N concurrent clients.
+# Reports p50/p95/p99 latency, throughput and SQL statements per request, and saves
+# JSON to benchmarks/results/<commit>.json so two commits can be compared:
+#   python benchmarks/bench_endpoints.py --users 20 --years 3
+#   BENCH_POSTGRES_URL=postgresql://localhost/spendwise_bench python benchmarks/bench_endpoints.py
+#   python benchmarks/bench_endpoints.py --compare benchmarks/results/old.json benchmarks/results/new.json
+# Response caching is off by default so the numbers reflect the query paths (--with-cache to keep it).
+# The PDF export asks for a different date range each time so it's built, not served from the artifact cache.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--users', type=int, default=20)
+parser.add_argument('--years', type=int, default=3)
+parser.add_argument('--requests', type=int, default=50, help='requests per endpoint (per mode)')
+parser.add_argument('--concurrency', type=int, default=8, help='HTTP clients hitting the WSGI server')
+parser.add_argument('--mode', choices=['client', 'wsgi', 'both'], default='both')
+parser.add_argument('--database', help='benchmark only this SQLAlchemy URL (default: temp SQLite + BENCH_POSTGRES_URL if set)')
+parser.add_argument('--with-cache', action='store_true', help='keep the response cache on')
+parser.add_argument('--output', help='JSON file (default: benchmarks/results/<commit>.json)')
+parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='diff two result files and exit')
+parser.add_argument('--worker-out', help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+# ==========================================
+# COMPARE TWO RUNS
+# ==========================================
+def compare(old_path, new_path):
+    old, new = json.load(open(old_path)), json.load(open(new_path))
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    for target, modes in new['targets'].items():
+        for mode, endpoints in modes.items():
+            print(f"\n[{target} / {mode}]")
+            print(f"{'endpoint':<24}{'p50 ms':>16}{'p95 ms':>16}{'queries':>14}")
+            for name, n in endpoints.items():
+                o = old['targets'].get(target, {}).get(mode, {}).get(name)
+                if not o:
+                    print(f"{name:<24}{n['p50_ms']:>16.2f}{n['p95_ms']:>16.2f}{n['queries_per_request']:>14.1f}  (new)")
+                    continue
+                change = (n['p50_ms'] - o['p50_ms']) / o['p50_ms'] * 100 if o['p50_ms'] else 0.0
+                print(f"{name:<24}{o['p50_ms']:>7.2f}->{n['p50_ms']:<7.2f}{o['p95_ms']:>7.2f}->{n['p95_ms']:<7.2f}"
+                      f"{o['queries_per_request']:>6.1f}->{n['queries_per_request']:<6.1f}{change:+7.0f}%")
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+def summarize(latencies, wall, queries):
+    latencies = sorted(latencies)
+    q = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {'requests': len(latencies), 'p50_ms': round(q[49] * 1000, 2), 'p95_ms': round(q[94] * 1000, 2),
+            'p99_ms': round(q[98] * 1000, 2), 'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+            'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+            'queries_per_request': round(queries / len(latencies), 1)}
+
+# ==========================================
+# ONE TARGET (runs in its own process, the app binds DATABASE_URL at import)
+# ==========================================
+def run_target(url):
+    os.environ['DATABASE_URL'] = url
+    os.environ['MAIL_DISPATCHER'] = 'off'
+    os.environ.setdefault('EXPORT_DIR', tempfile.mkdtemp())
+    if not args.with_cache: os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import event
+    from app import app
+    from models import db
+    from seed_data import seed
+    from migrate import upgrade
+
+    with app.app_context():
+        upgrade(log=lambda line: None)
+        t0 = time.perf_counter()
+        seed(args.users, args.years, prefix='bench', log=lambda line: None)
+        print(f"   seeded {args.users} users x {args.years} years in {time.perf_counter() - t0:.1f}s")
+        engine = db.engine
+
+    statements = {'n': 0}
+    lock = threading.Lock()
+    def count(*_):
+        with lock: statements['n'] += 1
+    event.listen(engine, 'before_cursor_execute', count)
+
+    usernames = [f"bench{i:05d}" for i in range(args.users)]
+    client = app.test_client()
+    tokens = [client.post('/api/auth/login', json={'username': u, 'password': 'password'}).get_json()['access_token']
+              for u in usernames]
+    this_month = datetime.date.today().strftime('%Y-%m')
+    year_ago = (datetime.date.today() - datetime.timedelta(days=365)).strftime('%Y-%m')
+
+    # name -> (method, path, json body); i picks the user and varies the request
+    fresh = itertools.count()  # Never repeats across modes, so every PDF is a cache miss
+    def pdf_path(i):
+        end = datetime.date.today() - datetime.timedelta(days=next(fresh))
+        return f"/api/export/pdf?from={(end - datetime.timedelta(days=90)).isoformat()}&to={end.isoformat()}"
+    endpoints = {
+        'login': lambda i: ('POST', '/api/auth/login', {'username': usernames[i % len(usernames)], 'password': 'password'}),
+        'dashboard': lambda i: ('GET', '/api/dashboard', None),
+        'monthly_trends': lambda i: ('GET', '/api/analytics/monthly', None),
+        'expenses_list': lambda i: ('GET', '/api/expenses', None),
+        'income_list': lambda i: ('GET', '/api/income', None),
+        'budget_month': lambda i: ('GET', f'/api/budget-analysis?month={this_month}', None),
+        'budget_range': lambda i: ('GET', f'/api/budget-analysis?from={year_ago}&to={this_month}', None),
+        'export_csv': lambda i: ('GET', '/api/export/csv', None),
+        'export_pdf': lambda i: ('GET', pdf_path(i), None),
+    }
+    results = {}
+
+    if args.mode in ('client', 'both'):
+        results['client'] = {}
+        for name, make in endpoints.items():
+            latencies, queries = [], 0
+            wall = time.perf_counter()
+            for i in range(args.requests):
+                method, path, body = make(i)
+                headers = {'Authorization': f'Bearer {tokens[i % len(tokens)]}'}
+                before = statements['n']
+                t0 = time.perf_counter()
+                r = client.open(path, method=method, json=body, headers=headers)
+                r.get_data()  # Drain streamed bodies (CSV) inside the timing
+                latencies.append(time.perf_counter() - t0)
+                queries += statements['n'] - before
+                if r.status_code != 200: print(f"   ! {name}: HTTP {r.status_code}")
+            results['client'][name] = summarize(latencies, time.perf_counter() - wall, queries)
+
+    if args.mode in ('wsgi', 'both'):
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+
+        def hit(make, i):
+            method, path, body = make(i)
+            req = urllib.request.Request(base + path, method=method, data=json.dumps(body).encode() if body else None,
+                                         headers={'Authorization': f'Bearer {tokens[i % len(tokens)]}', 'Content-Type': 'application/json'})
+            t0 = time.perf_counter()
+            with urllib.request.urlopen(req) as r: r.read()
+            return time.perf_counter() - t0
+
+        results['wsgi'] = {}
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            for name, make in endpoints.items():
+                before = statements['n']
+                wall = time.perf_counter()
+                latencies = list(pool.map(lambda i: hit(make, i), range(args.requests)))
+                results['wsgi'][name] = summarize(latencies, time.perf_counter() - wall, statements['n'] - before)
+        server.shutdown()
+    return results
+
+def print_results(target, results):
+    for mode, endpoints in results.items():
+        print(f"\n[{target} / {mode}]")
+        print(f"{'endpoint':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'queries':>10}")
+        for name, r in endpoints.items():
+            print(f"{name:<18}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['throughput_rps']:>10.1f}{r['queries_per_request']:>10.1f}")
+
+if __name__ == "__main__":
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    if args.worker_out:
+        json.dump(run_target(args.database), open(args.worker_out, 'w'))
+        sys.exit(0)
+
+    targets = {}
+    if args.database:
+        targets[args.database.split(':')[0]] = args.database
+    else:
+        targets['sqlite'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+        if os.getenv('BENCH_POSTGRES_URL'): targets['postgres'] = os.environ['BENCH_POSTGRES_URL']
+
+    report = {'meta': {'commit': git_commit(), 'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(), 'users': args.users, 'years': args.years,
+                       'requests': args.requests, 'concurrency': args.concurrency, 'response_cache': args.with_cache},
+              'targets': {}}
+    for name, url in targets.items():
+        print(f"== {name}")
+        out = os.path.join(tempfile.mkdtemp(), 'result.json')
+        cmd = [sys.executable, os.path.abspath(__file__), '--worker-out', out, '--database', url, '--users', str(args.users),
+               '--years', str(args.years), '--requests', str(args.requests), '--concurrency', str(args.concurrency), '--mode', args.mode]
+        if args.with_cache: cmd.append('--with-cache')
+        if subprocess.call(cmd) != 0:
+            print(f"   ! {name} run failed, skipping")
+            continue
+        report['targets'][name] = json.load(open(out))
+        print_results(name, report['targets'][name])
+
+    path = args.output or os.path.join(HERE, 'results', f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    json.dump(report, open(path, 'w'), indent=2)
+    print(f"\nSaved {path}")
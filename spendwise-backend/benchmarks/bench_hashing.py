@@ -0,0 +1,111 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Login throughput at each password hashing setting (passwords.py).
+# One user per setting, hash stored with that setting (so no re-hash while
+# measuring); `--concurrency` threads then log in `--logins` times in total
+# through the test client. Reports, per setting:
+#   hash ms       one verify on its own (the cost knob)
+#   logins/s      wall-clock throughput with PASSWORD_HASH_WORKERS workers
+#   /core-s       logins per CPU-second of the process (throughput per core; thread/off pools
+#                 only, worker processes' CPU isn't counted)
+#   p50/p95 ms    login latency as the client sees it
+#   503s          requests dropped after PASSWORD_HASH_MAX_WAIT in the queue
+# Then checks that a login re-hashes a stored hash made with other settings,
+# and runs the first setting overloaded (4x the concurrency, short max wait).
+#   python benchmarks/bench_hashing.py
+#   python benchmarks/bench_hashing.py --methods pbkdf2:sha256:600000,scrypt:16384:8:1 --pool process
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--methods', help='comma-separated PASSWORD_HASH_METHOD values (default: a pbkdf2/scrypt/argon2 spread)')
+parser.add_argument('--logins', type=int, default=40, help='logins per setting')
+parser.add_argument('--concurrency', type=int, help='client threads (default: 2x workers)')
+parser.add_argument('--pool', default='thread', choices=['thread', 'process', 'off'])
+parser.add_argument('--workers', type=int, default=0, help='PASSWORD_HASH_WORKERS (0 = one per core)')
+parser.add_argument('--database', help='SQLAlchemy URL (default: temp SQLite file)')
+args = parser.parse_args()
+
+os.environ['DATABASE_URL'] = args.database or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'hashing.db')
+os.environ['MAIL_DISPATCHER'] = 'off'
+os.environ['PASSWORD_HASH_POOL'] = args.pool
+os.environ['PASSWORD_HASH_WORKERS'] = str(args.workers)
+sys.path.insert(0, ROOT)
+import passwords
+from app import app
+from models import db, User
+from migrate import upgrade
+
+DEFAULT_METHODS = ['pbkdf2:sha256:260000', 'pbkdf2:sha256:600000', 'pbkdf2:sha256', 'scrypt:16384:8:1', 'scrypt:32768:8:1']
+if passwords.argon2 is not None: DEFAULT_METHODS += ['argon2:2:19456:1', 'argon2']
+
+def make_user(name, method):
+    user = User(username=name, email=f'{name}@example.com', password_hash=passwords._hash(passwords.canonical_method(method), 'password'))
+    db.session.add(user)
+    db.session.commit()
+
+def hash_ms(method):
+    stored = passwords._hash(passwords.canonical_method(method), 'password')
+    t0 = time.perf_counter()
+    for _ in range(3): passwords._verify(stored, 'password')
+    return (time.perf_counter() - t0) / 3 * 1000
+
+def run_logins(username, total, concurrency):
+    latencies, statuses, lock = [], [], threading.Lock()
+    todo = iter(range(total))
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                if next(todo, None) is None: return
+            t0 = time.perf_counter()
+            status = client.post('/api/auth/login', json={'username': username, 'password': 'password'}).status_code
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+                statuses.append(status)
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    wall, cpu = time.perf_counter(), time.process_time()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    ok = statuses.count(200)
+    if any(s not in (200, 503) for s in statuses): print(f"   ! unexpected statuses: {sorted(set(statuses))}")
+    ok_latencies = sorted(l for l, s in zip(latencies, statuses) if s == 200) or [0]
+    return {'rate': ok / wall, 'per_core': ok / cpu if cpu else 0, 'p50': statistics.median(ok_latencies),
+            'p95': ok_latencies[int(len(ok_latencies) * 0.95) - 1 if len(ok_latencies) > 1 else 0], 'rejected': statuses.count(503)}
+
+if __name__ == "__main__":
+    methods = args.methods.split(',') if args.methods else DEFAULT_METHODS
+    workers = args.workers or os.cpu_count() or 1
+    concurrency = args.concurrency or workers * 2
+    with app.app_context():
+        upgrade(log=lambda line: None)
+        for i, method in enumerate(methods): make_user(f'hash{i:02d}', method)
+        make_user('rehash', methods[0])
+
+    print(f"{args.pool} pool, {workers} workers, {os.cpu_count()} cores, {concurrency} client threads, {args.logins} logins per setting")
+    print(f"{'method':<26}{'hash ms':>10}{'logins/s':>10}{'/core-s':>10}{'p50 ms':>10}{'p95 ms':>10}{'503s':>6}")
+    for i, method in enumerate(methods):
+        app.config['PASSWORD_HASH_METHOD'] = method
+        r = run_logins(f'hash{i:02d}', args.logins, concurrency)
+        per_core = f"{r['per_core']:.1f}" if args.pool != 'process' else '-'
+        print(f"{method:<26}{hash_ms(method):>10.1f}{r['rate']:>10.1f}{per_core:>10}{r['p50']:>10.1f}{r['p95']:>10.1f}{r['rejected']:>6}")
+
+    # Changing the setting: the next login stores a hash made with the new one
+    app.config['PASSWORD_HASH_METHOD'] = methods[-1]
+    run_logins('rehash', 1, 1)
+    with app.app_context():
+        stored = User.query.filter_by(username='rehash').first().password_hash
+        print(f"\nre-hash on login {methods[0]} -> {methods[-1]}: {'ok' if not passwords.needs_rehash(stored) else 'NOT re-hashed'}")
+
+    # Overloaded: 4x the client threads, queued jobs older than 50 ms dropped with a 503
+    app.config.update(PASSWORD_HASH_METHOD=methods[0], PASSWORD_HASH_MAX_WAIT=0.05)
+    r = run_logins('hash00', args.logins * 2, concurrency * 4)
+    print(f"overloaded ({concurrency * 4} threads, max wait 50 ms) {methods[0]}: {r['rate']:.1f} logins/s, "
+          f"p95 {r['p95']:.1f} ms, {r['rejected']} of {args.logins * 2} answered 503")
@@ -0,0 +1,70 @@
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Import throughput: one-row-per-POST /api/expenses vs bulk POST /api/import (CSV and JSON).
+# Runs the app in-process with the Flask test client against a throwaway SQLite file.
+#   python benchmarks/bench_import.py --rows 20000
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--rows', type=int, default=20000, help='rows per bulk import')
+parser.add_argument('--single-rows', type=int, default=500, help='rows sent one POST at a time')
+parser.add_argument('--database', help='SQLAlchemy URL (default: temp SQLite file)')
+args = parser.parse_args()
+
+tmp = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = args.database or 'sqlite:///' + os.path.join(tmp, 'bench.db')
+os.environ['MAIL_DISPATCHER'] = 'off'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import app
+from migrate import upgrade
+
+with app.app_context(): upgrade(log=lambda line: None)
+
+CATEGORIES = ['Food', 'Transport', 'Rent', 'Shopping', 'Bills', 'Health']
+client = app.test_client()
+rng = random.Random(7)
+
+def login(name):
+    client.post('/api/auth/register', json={'username': name, 'email': f'{name}@bench.local', 'password': 'pw'})
+    token = client.post('/api/auth/login', json={'username': name, 'password': 'pw'}).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+def make_rows(n):
+    base = datetime.date(2020, 1, 1)
+    return [{'type': 'expense', 'amount': round(rng.uniform(1, 300), 2), 'category': rng.choice(CATEGORIES),
+             'date': (base + datetime.timedelta(days=rng.randrange(365 * 6))).isoformat(),
+             'description': f'txn {i}', 'payment_method': 'Card'} for i in range(n)]
+
+def report(label, n, seconds):
+    print(f"{label:<28}{n:>8} rows{seconds:>9.2f}s{n / seconds:>12.0f} rows/s")
+
+headers = login('single')
+rows = make_rows(args.single_rows)
+t0 = time.perf_counter()
+for row in rows:
+    client.post('/api/expenses', json=row, headers=headers)
+report('POST /api/expenses x N', len(rows), time.perf_counter() - t0)
+
+headers = login('bulkjson')
+rows = make_rows(args.rows)
+t0 = time.perf_counter()
+r = client.post('/api/import', json=rows, headers=headers)
+report('POST /api/import (JSON)', r.get_json()['inserted'], time.perf_counter() - t0)
+
+headers = login('bulkcsv')
+lines = ['Type,Category,Amount,Date,Description,Payment Method'] + \
+        [f"Expense,{r['category']},{r['amount']},{r['date']},{r['description']},{r['payment_method']}" for r in make_rows(args.rows)]
+body = '\r\n'.join(lines).encode()
+t0 = time.perf_counter()
+r = client.post('/api/import', data=body, content_type='text/csv', headers=headers)
+report('POST /api/import (CSV)', r.get_json()['inserted'], time.perf_counter() - t0)
+
+t0 = time.perf_counter()
+r = client.post('/api/import', data=body, content_type='text/csv', headers={**headers, 'Idempotency-Key': 'reupload'})
+result = r.get_json()
+report('re-upload (all duplicates)', result['duplicates'], time.perf_counter() - t0)
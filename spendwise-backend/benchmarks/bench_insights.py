@@ -0,0 +1,141 @@
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# /api/analytics/insights: numpy ledger snapshots (insights.py) vs the same numbers from SQL aggregates.
+# Seeds users x years (seed_data.py), then per user times
+#   sql          one aggregate query per metric, every request (what the route would do without the engine)
+#   cold         snapshot loaded from scratch + metrics (first request after a restart / eviction)
+#   warm         snapshot already current + metrics (repeat views)
+#   incremental  one new expense since the last snapshot: append + metrics (typical after a write)
+# and checks that the engine and SQL agree on the headline numbers.
+#   python benchmarks/bench_insights.py --users 10 --years 5
+#   python benchmarks/bench_insights.py --database postgresql://localhost/spendwise_bench
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--users', type=int, default=10)
+parser.add_argument('--years', type=int, default=3)
+parser.add_argument('--repeat', type=int, default=5, help='timed runs per user and path')
+parser.add_argument('--months', type=int, default=12)
+parser.add_argument('--database', help='SQLAlchemy URL (default: temp SQLite file)')
+args = parser.parse_args()
+
+os.environ['DATABASE_URL'] = args.database or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'insights.db')
+os.environ['MAIL_DISPATCHER'] = 'off'
+sys.path.insert(0, ROOT)
+from sqlalchemy import event, func, extract
+from app import app
+from models import db, User, Expense, Income
+from seed_data import seed
+from migrate import upgrade
+from dates import add_months, month_expr
+from summaries import record_expense
+from versions import bump_data_version, get_data_version
+from insights import ledger_cache, compute_insights, ANOMALY_Z, ANOMALY_MIN_HISTORY, RECENT_DAYS
+
+# ==========================================
+# SQL-ONLY BASELINE (same metrics, aggregates computed by the database)
+# ==========================================
+def sql_insights(user_id, as_of, months):
+    first = add_months(as_of.replace(day=1), -(months - 1))
+    this_month = as_of.replace(day=1)
+    year_ago, six_ago = add_months(this_month, -12), add_months(this_month, -6)
+    q = db.session.query
+    E, I = Expense, Income
+    mine = lambda model, *f: (model.user_id == user_id,) + f
+    result = {}
+    month = month_expr(E.date)
+    result['expense_pivot'] = q(E.category, month, func.sum(E.amount)).filter(*mine(E, E.date >= first, E.date <= as_of)).group_by(E.category, month).all()
+    income_month = month_expr(I.date)
+    result['income_pivot'] = q(I.source, income_month, func.sum(I.amount)).filter(*mine(I, I.date >= first, I.date <= as_of)).group_by(I.source, income_month).all()
+    result['expense_monthly'] = dict(q(month, func.sum(E.amount)).filter(*mine(E, E.date < this_month)).group_by(month).all())
+    result['income_monthly'] = dict(q(income_month, func.sum(I.amount)).filter(*mine(I, I.date < this_month)).group_by(income_month).all())
+    result['category_months'] = q(E.category, month, func.sum(E.amount)).filter(*mine(E, E.date >= year_ago, E.date < this_month)).group_by(E.category, month).all()
+    result['spent'] = q(E.category, func.sum(E.amount)).filter(*mine(E, E.date >= this_month, E.date <= as_of)).group_by(E.category).all()
+    result['income_so_far'] = q(func.sum(I.amount)).filter(*mine(I, I.date >= this_month, I.date <= as_of)).scalar()
+    result['six_total'] = q(func.sum(E.amount)).filter(*mine(E, E.date >= six_ago, E.date < this_month)).scalar()
+    result['six_sofar'] = q(func.sum(E.amount)).filter(*mine(E, E.date >= six_ago, E.date < this_month, extract('day', E.date) <= as_of.day)).scalar()
+    baseline = {c: (n, s, ss) for c, n, s, ss in q(E.category, func.count(E.id), func.sum(E.amount), func.sum(E.amount * E.amount))
+                .filter(*mine(E, E.date >= year_ago, E.date < this_month)).group_by(E.category)}
+    recent = q(E.id, E.category, E.amount).filter(*mine(E, E.date > as_of - datetime.timedelta(days=RECENT_DAYS), E.date <= as_of)).all()
+    flagged = []
+    for row_id, category, amount in recent:
+        n, s, ss = baseline.get(category, (0, 0.0, 0.0))
+        if n < ANOMALY_MIN_HISTORY: continue
+        mean = s / n
+        std = max(ss / n - mean ** 2, 0) ** 0.5
+        if std and (amount - mean) / std >= ANOMALY_Z: flagged.append(row_id)
+    result['anomalies'] = sorted(flagged)
+    return result
+
+def headline(sql_result, engine_result):
+    # The numbers both paths must agree on
+    spent = sum(v for _, v in sql_result['spent'])
+    pivot_total = sum(v for _, _, v in sql_result['expense_pivot'])
+    engine_pivot = sum(r['total'] for r in engine_result['pivot']['expenses']['rows'])
+    engine_anomalies = sorted(t['id'] for t in engine_result['anomalies']['transactions'])
+    return abs(spent - engine_result['projection']['spent_so_far']) < 0.02 and abs(pivot_total - engine_pivot) < 0.02 * len(sql_result['expense_pivot']) + 0.02 \
+        and (sql_result['anomalies'] == engine_anomalies or len(engine_anomalies) == 20)
+
+# ==========================================
+# RUN
+# ==========================================
+def timed(fn, statements):
+    before = statements['n']
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, statements['n'] - before, out
+
+if __name__ == "__main__":
+    with app.app_context():
+        upgrade(log=lambda line: None)
+        t0 = time.perf_counter()
+        seed(args.users, args.years, prefix='bench', log=lambda line: None)
+        print(f"   seeded {args.users} users x {args.years} years in {time.perf_counter() - t0:.1f}s")
+
+        statements = {'n': 0}
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.__setitem__('n', statements['n'] + 1))
+        as_of = datetime.date.today()
+        users = User.query.filter(User.username.like('bench%')).order_by(User.id).all()
+        times = {'sql': [], 'cold': [], 'warm': [], 'incremental': []}
+        queries = {name: [] for name in times}
+        rows, mismatches = [], 0
+
+        for user in users:
+            uid = user.id
+            rows.append(db.session.query(func.count(Expense.id)).filter(Expense.user_id == uid).scalar())
+            for _ in range(args.repeat):
+                dt, n, sql_result = timed(lambda: sql_insights(uid, as_of, args.months), statements)
+                times['sql'].append(dt); queries['sql'].append(n)
+
+                ledger_cache.backend.delete(uid)
+                version = get_data_version(uid)
+                dt, n, engine_result = timed(lambda: compute_insights(ledger_cache.snapshot(uid, version), as_of, args.months), statements)
+                times['cold'].append(dt); queries['cold'].append(n)
+                if not headline(sql_result, engine_result): mismatches += 1
+
+                dt, n, _ = timed(lambda: compute_insights(ledger_cache.snapshot(uid, version), as_of, args.months), statements)
+                times['warm'].append(dt); queries['warm'].append(n)
+
+                # A write lands: one new expense, the version moves
+                expense = Expense(amount=250.0, category='Food', date=as_of, description='bench', user_id=uid)
+                db.session.add(expense); record_expense(expense); bump_data_version(uid); db.session.commit()
+                version = get_data_version(uid)
+                dt, n, engine_result = timed(lambda: compute_insights(ledger_cache.snapshot(uid, version), as_of, args.months), statements)
+                times['incremental'].append(dt); queries['incremental'].append(n)
+                if not headline(sql_insights(uid, as_of, args.months), engine_result): mismatches += 1
+
+        print(f"{len(users)} users, {statistics.mean(rows):.0f} expenses each on average, {args.months}-month window")
+        print(f"{'path':<14}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}{'queries':>10}")
+        for name, values in times.items():
+            values = sorted(values)
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            print(f"{name:<14}{statistics.median(values) * 1000:>10.2f}{p95 * 1000:>10.2f}{statistics.mean(values) * 1000:>10.2f}{statistics.mean(queries[name]):>10.1f}")
+        print(f"snapshot cache: {ledger_cache.stats()}")
+        print(f"\n{'✅ SUCCESS' if not mismatches else '❌ ERROR'}: engine vs SQL headline mismatches: {mismatches}\n")
@@ -0,0 +1,95 @@
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import datetime
+
+# Before/after benchmark for the per-user month queries (dashboard, budget analysis, trends).
+#   before: TEXT date column, no indexes, LIKE 'YYYY-MM%' / substr(date, 1, 7)
+#   after:  DATE column with (user_id, date) and (user_id, category, date) indexes, range predicates
+# Uses plain sqlite3 so only the query plans are compared, not ORM overhead.
+#   python benchmarks/bench_month_queries.py --users 2000 --rows-per-user 500
+
+CATEGORIES = ['Food', 'Transport', 'Rent', 'Shopping', 'Bills', 'Health', 'Entertainment', 'Other']
+
+BEFORE_SCHEMA = """
+CREATE TABLE expense (id INTEGER PRIMARY KEY, amount FLOAT NOT NULL, category VARCHAR(50) NOT NULL,
+                      date VARCHAR(10) NOT NULL, payment_method VARCHAR(50), description VARCHAR(200), user_id INTEGER NOT NULL);
+"""
+AFTER_SCHEMA = """
+CREATE TABLE expense (id INTEGER PRIMARY KEY, amount FLOAT NOT NULL, category VARCHAR(50) NOT NULL,
+                      date DATE NOT NULL, payment_method VARCHAR(50), description VARCHAR(200), user_id INTEGER NOT NULL);
+CREATE INDEX ix_expense_user_date ON expense (user_id, date);
+CREATE INDEX ix_expense_user_category_date ON expense (user_id, category, date);
+"""
+
+BEFORE_QUERIES = {
+    'dashboard_total': "SELECT sum(amount) FROM expense WHERE user_id = :uid AND date LIKE :prefix",
+    'budget_category': "SELECT sum(amount) FROM expense WHERE user_id = :uid AND category = :cat AND date LIKE :prefix",
+    'monthly_trends': "SELECT substr(date, 1, 7) AS month, sum(amount) FROM expense WHERE user_id = :uid GROUP BY month",
+}
+AFTER_QUERIES = {
+    'dashboard_total': "SELECT sum(amount) FROM expense WHERE user_id = :uid AND date >= :start AND date < :end",
+    'budget_category': "SELECT sum(amount) FROM expense WHERE user_id = :uid AND category = :cat AND date >= :start AND date < :end",
+    'monthly_trends': "SELECT strftime('%Y-%m', date) AS month, sum(amount) FROM expense WHERE user_id = :uid AND date >= :wstart AND date < :end GROUP BY month",
+}
+
+def seed(conn, schema, users, rows_per_user, rng_seed):
+    conn.executescript(schema)
+    rng = random.Random(rng_seed)
+    base = datetime.date(2021, 1, 1)
+    rows = []
+    for uid in range(1, users + 1):
+        for _ in range(rows_per_user):
+            d = base + datetime.timedelta(days=rng.randrange(365 * 5))
+            rows.append((round(rng.uniform(1, 500), 2), rng.choice(CATEGORIES), d.isoformat(), 'Card', 'seed', uid))
+        if len(rows) >= 50000:
+            conn.executemany("INSERT INTO expense (amount, category, date, payment_method, description, user_id) VALUES (?,?,?,?,?,?)", rows)
+            rows = []
+    conn.executemany("INSERT INTO expense (amount, category, date, payment_method, description, user_id) VALUES (?,?,?,?,?,?)", rows)
+    conn.commit()
+    conn.execute("ANALYZE")
+
+def run(conn, queries, users, iterations, rng_seed):
+    rng = random.Random(rng_seed)
+    results = {}
+    for name, sql in queries.items():
+        timings = []
+        for _ in range(iterations):
+            params = {'uid': rng.randint(1, users), 'cat': rng.choice(CATEGORIES),
+                      'prefix': '2024-06%', 'start': '2024-06-01', 'end': '2024-07-01', 'wstart': '2023-07-01'}
+            t0 = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - t0) * 1000)
+        plan = ' | '.join(r[-1] for r in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall())
+        results[name] = (statistics.median(timings), plan)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--rows-per-user', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = {}
+        for label, schema, queries in (('before', BEFORE_SCHEMA, BEFORE_QUERIES), ('after', AFTER_SCHEMA, AFTER_QUERIES)):
+            conn = sqlite3.connect(os.path.join(tmp, f'{label}.db'))
+            t0 = time.perf_counter()
+            seed(conn, schema, args.users, args.rows_per_user, args.seed)
+            print(f"seeded {label}: {args.users * args.rows_per_user} rows in {time.perf_counter() - t0:.1f}s")
+            report[label] = run(conn, queries, args.users, args.iterations, args.seed)
+            conn.close()
+
+    print(f"\n{'query':<18}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in BEFORE_QUERIES:
+        before, after = report['before'][name][0], report['after'][name][0]
+        print(f"{name:<18}{before:>12.3f}{after:>12.3f}{before / after:>9.0f}x")
+    print("\nquery plans:")
+    for name in BEFORE_QUERIES:
+        print(f"  {name}\n    before: {report['before'][name][1]}\n    after:  {report['after'][name][1]}")
@@ -0,0 +1,91 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# JSON encoding + compression cost of the big responses (serialization.py).
+# Seeds users x years (seed_data.py), then for each endpoint and variant reports
+# CPU per request (process time, the whole request through the test client), CPU
+# for just encoding + compressing that response body, and bytes on the wire:
+#   stdlib        stdlib json provider (what runs without orjson), no compression
+#   orjson        orjson provider, no compression
+#   orjson+gzip   ... with Accept-Encoding: gzip
+#   orjson+br     ... with Accept-Encoding: br (only if the brotli package is installed)
+#   rows+gzip     listings with ?shape=rows (no per-row dicts), gzip
+#   python benchmarks/bench_serialization.py --users 200 --years 2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--users', type=int, default=200)
+parser.add_argument('--years', type=int, default=2)
+parser.add_argument('--requests', type=int, default=50, help='requests per endpoint and variant')
+parser.add_argument('--database', help='SQLAlchemy URL (default: temp SQLite file)')
+args = parser.parse_args()
+
+os.environ['DATABASE_URL'] = args.database or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'serialization.db')
+os.environ['MAIL_DISPATCHER'] = 'off'
+os.environ['RESPONSE_CACHE_BACKEND'] = 'none'  # Encode every time
+sys.path.insert(0, ROOT)
+import serialization
+from app import app
+from models import db, User
+from seed_data import seed
+from migrate import upgrade
+
+LISTINGS = {'expenses (500)': '/api/expenses?limit=500', 'income (500)': '/api/income?limit=500', 'admin users (500)': '/api/admin/users?limit=500'}
+OTHERS = {'monthly trends': '/api/analytics/monthly', 'series (daily, 1y)': '/api/analytics/series?granularity=day&group_by=category&top=20&from=' +
+          time.strftime('%Y') + '-01-01'}
+
+def measure(client, path, headers):
+    for _ in range(5): client.get(path, headers=headers)  # Warm up (statement cache, page cache)
+    cpu, sizes = [], []
+    for _ in range(args.requests):
+        t0 = time.process_time()
+        r = client.get(path, headers=headers)
+        body = r.get_data()
+        cpu.append(time.process_time() - t0)
+        if r.status_code != 200: print(f"   ! {path}: HTTP {r.status_code}")
+        sizes.append(len(body))
+    # The encode + compress step alone, on the same payload
+    data = app.json.loads(r.get_data() if 'Content-Encoding' not in r.headers else client.get(path, headers={**headers, 'Accept-Encoding': 'identity'}).get_data())
+    encode = []
+    with app.test_request_context(path, headers=headers):
+        for _ in range(args.requests):
+            t0 = time.process_time()
+            response = app.json.response(data)
+            if app.config.get('COMPRESS_RESPONSES', True): serialization.compress_response(response)
+            encode.append(time.process_time() - t0)
+    return statistics.median(cpu) * 1000, statistics.median(encode) * 1000, statistics.median(sizes)
+
+if __name__ == "__main__":
+    with app.app_context():
+        upgrade(log=lambda line: None)
+        seed(args.users, args.years, prefix='bench', log=lambda line: None)
+        admin = User.query.filter_by(username='bench00000').first()
+        admin.is_admin = True
+        db.session.commit()
+
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'username': 'bench00000', 'password': 'password'}).get_json()['access_token']
+    auth = {'Authorization': f'Bearer {token}'}
+    orjson = serialization.orjson
+
+    variants = [('stdlib', None, {}), ('orjson', orjson, {}), ('orjson+gzip', orjson, {'Accept-Encoding': 'gzip'})]
+    if serialization.brotli is not None: variants.append(('orjson+br', orjson, {'Accept-Encoding': 'br'}))
+    if orjson is None: print("   orjson is not installed: the orjson rows below use the stdlib fallback")
+
+    print(f"{args.users} users x {args.years} years, median of {args.requests} requests")
+    print(f"{'endpoint':<22}{'variant':<14}{'cpu ms/req':>12}{'encode ms':>12}{'bytes':>12}   vs stdlib")
+    for name, path in {**LISTINGS, **OTHERS}.items():
+        rows = list(variants) + ([('rows+gzip', orjson, {'Accept-Encoding': 'gzip'})] if name in LISTINGS and 'admin' not in name else [])
+        base = None
+        for variant, module, headers in rows:
+            serialization.orjson = module
+            cpu, encode, size = measure(client, path + ('&shape=rows' if variant.startswith('rows') else ''), {**auth, **headers})
+            base = base or (cpu, encode, size)
+            print(f"{name:<22}{variant:<14}{cpu:>12.2f}{encode:>12.2f}{size:>12.0f}   "
+                  f"{cpu / base[0]:.2f}x cpu, {encode / base[1]:.2f}x encode, {size / base[2]:.2f}x size")
+    serialization.orjson = orjson
@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Cold start: what a fresh gunicorn worker (or CLI script) pays before it can serve.
+# Each run is a new interpreter that imports app.py (= create_app), then serves one request.
+# Reports interpreter+import time, time to the first response, SQL statements issued
+# while booting (should be 0: schema work belongs to migrate.py) and whether ReportLab or numpy got loaded.
+#   python benchmarks/bench_startup.py --runs 10
+#   python benchmarks/bench_startup.py --importtime   (slowest imports, from python -X importtime)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--runs', type=int, default=10)
+parser.add_argument('--database', help='SQLAlchemy URL (default: temp SQLite file)')
+parser.add_argument('--importtime', action='store_true', help='also list the slowest imports')
+args = parser.parse_args()
+
+# Runs inside each child process
+CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+t1 = time.perf_counter()
+from app import app
+t2 = time.perf_counter()
+boot_statements = len(statements)
+r = app.test_client().get('/api/dashboard')  # 401 without a token: measures request plumbing, not queries
+t3 = time.perf_counter()
+print(json.dumps({'import_app_s': t2 - t1, 'first_request_s': t3 - t2, 'boot_statements': boot_statements,
+                  'reportlab_loaded': 'reportlab' in sys.modules,
+                  'numpy_loaded': 'numpy' in sys.modules, 'modules': len(sys.modules)}))
+'''
+
+env = dict(os.environ, MAIL_DISPATCHER=os.getenv('MAIL_DISPATCHER', 'thread'))
+env['DATABASE_URL'] = args.database or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'startup.db')
+env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+
+# Schema first (a deploy step, not something each worker does)
+subprocess.run([sys.executable, os.path.join(ROOT, 'migrate.py')], env=env, cwd=ROOT, check=True, capture_output=True)
+
+runs = []
+for _ in range(args.runs):
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', CHILD], env=env, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result['process_s'] = time.perf_counter() - t0
+    runs.append(result)
+
+def show(label, key):
+    values = [r[key] * 1000 for r in runs]
+    print(f"{label:<28}{statistics.median(values):>10.1f} ms (min {min(values):.1f}, max {max(values):.1f})")
+
+print(f"{args.runs} cold starts")
+show('whole process', 'process_s')
+show('import app (create_app)', 'import_app_s')
+show('first request', 'first_request_s')
+print(f"{'SQL statements at boot':<28}{runs[0]['boot_statements']:>10}")
+print(f"{'ReportLab loaded at boot':<28}{str(runs[0]['reportlab_loaded']):>10}")
+print(f"{'numpy loaded at boot':<28}{str(runs[0]['numpy_loaded']):>10}")
+print(f"{'modules loaded':<28}{runs[0]['modules']:>10}")
+
+if args.importtime:
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], env=env, cwd=ROOT, capture_output=True, text=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line: continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    print("\nslowest imports (cumulative):")
+    for cumulative, name in sorted(rows, reverse=True)[:15]:
+        print(f"{cumulative / 1000:>10.1f} ms  {name}")
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response, Response
+from conditional import data_stamp
+
+# ==========================================
+# CACHE BACKENDS
+# ==========================================
+# Shared by the response cache below and the user cache (auth_cache.py).
+# Every backend has get(key) / set(key, value) / delete(key) / stats().
+#   LRUBackend   - in-process, bounded by entry count (and optionally bytes) and TTL
+#   RedisBackend - any redis-py compatible client (get / setex / delete)
+#   FakeRedis    - in-memory stand-in for that client, for tests and local runs
+
+class LRUBackend:
+    def __init__(self, max_entries=5000, ttl=300, max_bytes=None, size_of=None):
+        self.max_entries, self.ttl, self.max_bytes = max_entries, ttl, max_bytes
+        self.size_of = size_of or (lambda value: 0)
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def _drop(self, key):
+        _, value = self._data.pop(key)
+        self._bytes -= self.size_of(value)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            if item[0] < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            if key in self._data: self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._bytes += self.size_of(value)
+            while len(self._data) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes and len(self._data) > 1):
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data: self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'lru', 'entries': len(self._data), 'bytes': self._bytes, 'max_entries': self.max_entries,
+                    'max_bytes': self.max_bytes, 'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'expirations': self.expirations}
+
+class RedisBackend:
+    # Values are stored as JSON; subclasses can override encode/decode
+    def __init__(self, client, ttl=300, prefix='spendwise:'):
+        self.client, self.ttl, self.prefix = client, ttl, prefix
+        self.hits = self.misses = 0
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis  # Optional dependency, only needed for this backend
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def encode(self, value): return json.dumps(value)
+    def decode(self, raw): return json.loads(raw)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + str(key))
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.decode(raw)
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + str(key), self.ttl, self.encode(value))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + str(key))
+
+    def stats(self):
+        # Evictions are Redis' own business; report them when the server tells us
+        info = self.client.info('stats') if hasattr(self.client, 'info') else {}
+        return {'backend': 'redis', 'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses,
+                'evictions': info.get('evicted_keys'), 'expirations': info.get('expired_keys')}
+
+class FakeRedis:
+    # Just enough of the redis-py client for RedisBackend
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self.expired = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item and item[0] < time.monotonic():
+                del self._data[key]
+                self.expired += 1
+                return None
+            return item[1] if item else None
+
+    def setex(self, key, ttl, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value.encode() if isinstance(value, str) else value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def info(self, section=None):
+        return {'evicted_keys': 0, 'expired_keys': self.expired}
+
+# ==========================================
+# RESPONSE CACHE (analytics endpoints)
+# ==========================================
+# Keys carry the user id, the user's data_version and the query string, so a
+# write to that user's expenses/incomes/budgets (which bumps the version)
+# makes every older entry unreachable at once; LRU/TTL then clears them out.
+# The version is read from the user row (conditional.data_stamp, shared with
+# the ETag), not from the cached user, which can lag behind other processes.
+# Use it under @token_required (and @conditional_get):
+#
+#   @main.route('/api/dashboard')
+#   @token_required
+#   @conditional_get
+#   @cached_response
+#   def get_dashboard(current_user): ...
+
+class ResponseCache:
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    def stats(self):
+        return self.backend.stats() if self.backend is not None else {'backend': 'none'}
+
+response_cache = ResponseCache()
+
+def _entry_size(entry):
+    return len(entry['body'])
+
+class _ResponseRedisBackend(RedisBackend):
+    # Bodies are bytes; keep them as latin-1 text inside the JSON envelope
+    def encode(self, entry): return json.dumps({**entry, 'body': entry['body'].decode('latin-1')})
+    def decode(self, raw):
+        entry = json.loads(raw)
+        entry['body'] = entry['body'].encode('latin-1')
+        return entry
+
+def init_response_cache(app, backend=None):
+    kind = app.config.get('RESPONSE_CACHE_BACKEND', 'lru')
+    ttl = app.config.get('RESPONSE_CACHE_TTL', 300)
+    if backend is None:
+        if kind == 'redis':
+            backend = _ResponseRedisBackend.from_url(app.config['REDIS_URL'], ttl=ttl, prefix='spendwise:resp:')
+        elif kind == 'fake-redis':
+            backend = _ResponseRedisBackend(FakeRedis(), ttl=ttl, prefix='spendwise:resp:')
+        elif kind == 'lru':
+            backend = LRUBackend(app.config.get('RESPONSE_CACHE_SIZE', 5000), ttl,
+                                 app.config.get('RESPONSE_CACHE_MAX_BYTES'), _entry_size)
+    response_cache.backend = backend
+    return response_cache
+
+def response_key(current_user):
+    args = hashlib.sha1(json.dumps(sorted(request.args.items(multi=True))).encode()).hexdigest()[:16]
+    today = time.strftime('%Y-%m-%d')  # "current month" style defaults move with the calendar
+    return f"{request.endpoint}:{current_user.id}:{data_stamp(current_user.id)[0]}:{today}:{args}"
+
+def cached_response(f):
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        backend = response_cache.backend
+        if request.method != 'GET' or backend is None:
+            return f(current_user, *args, **kwargs)
+        key = response_key(current_user)
+        entry = backend.get(key)
+        if entry is not None:
+            return Response(entry['body'], status=200, mimetype=entry['mimetype'], headers=entry['headers'])
+        response = make_response(f(current_user, *args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            headers = {k: v for k, v in response.headers.items() if k.startswith('X-')}
+            backend.set(key, {'body': response.get_data(), 'mimetype': response.mimetype, 'headers': headers})
+        return response
+    return decorated
@@ -0,0 +1,68 @@
+import datetime
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from sqlalchemy import select
+from models import db, User
+
+# ==========================================
+# CONDITIONAL GET (ETag / Last-Modified)
+# ==========================================
+# Read endpoints go stale only when the user's data_version moves (or the day
+# changes, since "this month" / "last 12 months" are relative to today).
+# So the ETag is built from those plus the URL, and a matching If-None-Match
+# is answered with 304 after one primary-key lookup, before the handler runs.
+#
+# The version is read from the user row (data_stamp), not from current_user:
+# the cached user can lag behind a write made by another worker or by a CLI
+# job (run_recurring.py, run_archive.py) for up to USER_CACHE_TTL, and a stale
+# version would mean 304s (and cached bodies, see cache.py) for changed data.
+# Use it under @token_required:
+#
+#   @main.route('/api/dashboard')
+#   @token_required
+#   @conditional_get
+#   def get_dashboard(current_user): ...
+
+DATA_STAMP = 'spendwise.data_stamp'
+
+def data_stamp(user_id):
+    # (data_version, data_updated_at), read once per request
+    stamp = request.environ.get(DATA_STAMP)
+    if stamp is None or stamp[0] != user_id:
+        row = db.session.execute(select(User.data_version, User.data_updated_at).where(User.id == user_id)).first()
+        stamp = request.environ[DATA_STAMP] = (user_id, (row[0] or 0) if row else 0, row[1] if row else None)
+    return stamp[1], stamp[2]
+
+def etag_for(user_id, version):
+    digest = hashlib.sha1(request.full_path.encode()).hexdigest()[:12]
+    return f"{user_id}.{version}.{datetime.date.today().isoformat()}.{digest}"
+
+def _not_modified(etag, changed):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return bool(since and changed and changed.replace(microsecond=0, tzinfo=datetime.timezone.utc) <= since
+                and since.date() == datetime.datetime.now(datetime.timezone.utc).date())
+
+def _stamp(response, etag, changed):
+    response.set_etag(etag, weak=True)
+    if changed:
+        response.last_modified = changed.replace(tzinfo=datetime.timezone.utc)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def conditional_get(f):
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        if request.method != 'GET':
+            return f(current_user, *args, **kwargs)
+        version, changed = data_stamp(current_user.id)
+        etag = etag_for(current_user.id, version)
+        if _not_modified(etag, changed):
+            return _stamp(make_response('', 304), etag, changed)
+        response = make_response(f(current_user, *args, **kwargs))
+        if response.status_code == 200:
+            _stamp(response, etag, changed)
+        return response
+    return decorated
@@ -4,23 +4,141 @@ from dotenv import load_dotenv
 # Load keys from .env
 load_dotenv()
 
+def database_url(name):
+    # Fixes Render's postgres:// issue automatically
+    uri = os.getenv(name)
+    if uri and uri.startswith("postgres://"):
+        uri = uri.replace("postgres://", "postgresql://", 1)
+    return uri
+
+def engine_options(uri, read_only=False):
+    # Pool / timeout settings for one engine. SQLite keeps Flask-SQLAlchemy's defaults
+    # (no server to lose connections to, and in-memory DBs use a pool without sizing).
+    if not uri or uri.startswith('sqlite'):
+        return {}
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),  # seconds to wait for a free connection
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),  # seconds; stay under the server/proxy idle timeout
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    }
+    timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))  # 0 = no limit
+    if uri.startswith('postgresql'):
+        settings = [f'-c statement_timeout={timeout_ms}'] if timeout_ms else []
+        if read_only: settings.append('-c default_transaction_read_only=on')
+        if settings: options['connect_args'] = {'options': ' '.join(settings)}
+    elif uri.startswith('mysql') and timeout_ms:
+        options['connect_args'] = {'init_command': f'SET SESSION max_execution_time={timeout_ms}'}
+    return options
+
 class Config:
     # Security Key
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key_if_none_found')
     
-    # Database Connection (Fixes Render's postgres:// issue automatically)
-    uri = os.getenv('DATABASE_URL')
-    if uri and uri.startswith("postgres://"):
-        uri = uri.replace("postgres://", "postgresql://", 1)
-        
+    # Database Connection
+    uri = database_url('DATABASE_URL')
     SQLALCHEMY_DATABASE_URI = uri
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(uri)
+
+    # === PASSWORD HASHING (passwords.py) ===
+    # 'pbkdf2:sha256:600000', 'scrypt:32768:8:1' or 'argon2[:time:memory_kib:parallelism]' (needs argon2-cffi).
+    # Hashes stored with other settings are re-hashed on the user's next successful login.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    PASSWORD_HASH_POOL = os.getenv('PASSWORD_HASH_POOL', 'thread')  # 'thread', 'process', or 'off' = on the request thread
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0))  # 0 = one per CPU core
+    PASSWORD_HASH_MAX_WAIT = float(os.getenv('PASSWORD_HASH_MAX_WAIT', 2.0))  # Seconds in the queue before a 503
+
+    # === READ REPLICA (optional) ===
+    # GET analytics/listings/exports/admin stats read from here (see replica.py).
+    # Locally: two SQLite files, kept in step with `python sync_replica.py --loop 5`.
+    replica_uri = database_url('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': {'url': replica_uri, **engine_options(replica_uri, read_only=True)}} if replica_uri else {}
+    REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 30))  # A user's reads stay on the primary this long after their write
+
+    # === LISTING PAGE SIZES (/api/expenses, /api/income) ===
+    PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE_DEFAULT', 100))
+    PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 500))
+
+    # === AUTHENTICATED-USER CACHE (token_required) ===
+    # 'local' = per-process LRU, 'redis' = shared via REDIS_URL, 'none' = always hit the DB
+    USER_CACHE_BACKEND = os.getenv('USER_CACHE_BACKEND', 'local')
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))  # seconds
+    REDIS_URL = os.getenv('REDIS_URL')
+
+    # === ANALYTICS RESPONSE CACHE (dashboard, trends, budget analysis) ===
+    # 'lru' = per-process, 'redis' = shared via REDIS_URL, 'fake-redis' = in-memory stand-in, 'none' = off
+    RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'lru')
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 5000))  # entries
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))  # seconds
+
+    # === TIME-SERIES ANALYTICS (/api/analytics/series) ===
+    SERIES_MAX_BUCKETS = int(os.getenv('SERIES_MAX_BUCKETS', 3700))  # ~10 years of days
+    SERIES_MAX_GROUPS = int(os.getenv('SERIES_MAX_GROUPS', 50))  # ?top= upper bound
+
+    # === LEDGER SNAPSHOTS (/api/analytics/insights) ===
+    # Per-process numpy copies of each active user's transactions, updated in place of re-reading
+    INSIGHTS_CACHE_SIZE = int(os.getenv('INSIGHTS_CACHE_SIZE', 500))  # users
+    INSIGHTS_CACHE_MAX_BYTES = int(os.getenv('INSIGHTS_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    INSIGHTS_CACHE_TTL = int(os.getenv('INSIGHTS_CACHE_TTL', 3600))  # seconds
+    INSIGHTS_MAX_MONTHS = int(os.getenv('INSIGHTS_MAX_MONTHS', 36))
+
+    # === BATCHED REQUESTS (/api/batch) ===
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 20))  # Sub-requests per batch
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))  # Threads for "parallel": true batches (GETs only)
+
+    # === DELTA SYNC (/api/sync) ===
+    SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 500))  # Changed rows per page
+    SYNC_PAGE_SIZE_MAX = int(os.getenv('SYNC_PAGE_SIZE_MAX', 2000))
+
+    # === RESPONSE COMPRESSION (gzip, or brotli if installed) ===
+    COMPRESS_RESPONSES = os.getenv('COMPRESS_RESPONSES', 'true').lower() == 'true'
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))  # Smaller bodies aren't worth the CPU
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+    # === REQUEST METRICS (/api/admin/metrics) ===
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 200))  # Statements slower than this get logged
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 10))  # Same statement this many times in one request
+
+    # === BULK IMPORT (/api/import) ===
+    IMPORT_MAX_ROWS = int(os.getenv('IMPORT_MAX_ROWS', 50000))
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 1000))
+
+    # === RECURRING EXPENSES (run_recurring.py) ===
+    RECURRING_BATCH_SIZE = int(os.getenv('RECURRING_BATCH_SIZE', 1000))
+    RECURRING_CLAIM_LEASE_SECONDS = int(os.getenv('RECURRING_CLAIM_LEASE_SECONDS', 600))
+    RECURRING_MAX_CATCHUP = int(os.getenv('RECURRING_MAX_CATCHUP', 400))  # periods booked per subscription per run
+
+    # === ARCHIVING OLD TRANSACTIONS (run_archive.py) ===
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 730))  # Rows dated before today - this move to the archive tables
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 1000))  # Rows per transaction
+    ARCHIVE_PAUSE_SECONDS = float(os.getenv('ARCHIVE_PAUSE_SECONDS', 0.05))  # Between batches
+
+    # === BACKGROUND EXPORTS (PDF reports) ===
+    EXPORT_DIR = os.getenv('EXPORT_DIR')  # Defaults to <instance>/exports
+    EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 2))
+    EXPORT_JOB_TIMEOUT = int(os.getenv('EXPORT_JOB_TIMEOUT', 600))  # seconds a running job may take
+    EXPORT_QUEUE_TIMEOUT = int(os.getenv('EXPORT_QUEUE_TIMEOUT', 3600))  # seconds a job may wait for a worker
 
     # === EMAIL CONFIGURATION (SMTP) ===
-    # Using Gmail settings by default
-    MAIL_SERVER = 'smtp.gmail.com'
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    # Using Gmail settings by default (override to point at a local test server)
+    MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'true').lower() == 'true'
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')  # Loaded from .env
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')  # Loaded from .env
-    MAIL_DEFAULT_SENDER = os.getenv('MAIL_USERNAME')
\ No newline at end of file
+    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME'))
+
+    # === EMAIL OUTBOX DISPATCHER ===
+    # 'thread' = run the dispatcher inside each app process, 'off' = use run_mailer.py instead
+    MAIL_DISPATCHER = os.getenv('MAIL_DISPATCHER', 'thread')
+    MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 50))
+    MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', 5))
+    MAIL_RETRY_BASE_SECONDS = int(os.getenv('MAIL_RETRY_BASE_SECONDS', 30))
+    MAIL_POLL_SECONDS = float(os.getenv('MAIL_POLL_SECONDS', 2))
+    MAIL_CLAIM_LEASE_SECONDS = int(os.getenv('MAIL_CLAIM_LEASE_SECONDS', 300))
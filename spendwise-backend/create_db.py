@@ -1,15 +1,15 @@
 from app import app
-from models import db
+from migrate import upgrade
 
-# This script creates any missing tables in your database
+# This script creates any missing tables in your database and applies
+# pending schema migrations (same as `python migrate.py`).
 # It will NOT delete or overwrite your existing users
 
 if __name__ == "__main__":
     with app.app_context():
         try:
-            db.create_all()
+            applied = upgrade()
             print("\n✅ SUCCESS: Database tables checked and created!")
-            print("   - If 'user' table was missing, it is now created.")
-            print("   - If 'feedback' table was missing, it is now created.\n")
+            print(f"   - {len(applied)} migrations applied (see `python migrate.py --status`).\n")
         except Exception as e:
-            print(f"\n❌ ERROR: Could not create tables. Reason: {e}\n")
\ No newline at end of file
+            print(f"\n❌ ERROR: Could not create tables. Reason: {e}\n")
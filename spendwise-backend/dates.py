@@ -0,0 +1,87 @@
+import datetime
+from sqlalchemy import func, cast, literal, Integer, String
+from models import db
+
+# ==========================================
+# DATE HELPERS
+# ==========================================
+# Transaction dates are real DATE columns, so month filters are written as
+# half-open ranges (start <= date < end). Those can use the (user_id, date)
+# indexes, unlike LIKE 'YYYY-MM%' or substr(date, 1, 7).
+
+def parse_date(value):
+    # Accepts 'YYYY-MM-DD' strings (what the frontend sends) or date objects
+    if isinstance(value, datetime.datetime): return value.date()
+    if isinstance(value, datetime.date): return value
+    return datetime.date.fromisoformat(str(value).strip()[:10])
+
+def parse_month(value):
+    # 'YYYY-MM' (or a full date) -> first day of that month
+    year, month = map(int, str(value).strip()[:7].split('-'))
+    return datetime.date(year, month, 1)
+
+def add_months(d, n):
+    total = d.year * 12 + (d.month - 1) + n
+    return datetime.date(total // 12, total % 12 + 1, 1)
+
+def month_key(d):
+    return d.strftime('%Y-%m')
+
+def current_month():
+    return datetime.datetime.now().strftime('%Y-%m')
+
+def month_range(month_str):
+    # 'YYYY-MM' -> (first day of month, first day of next month)
+    start = parse_month(month_str)
+    return start, add_months(start, 1)
+
+def month_expr(column):
+    # 'YYYY-MM' bucket computed in SQL. Only use it on rows that are already
+    # narrowed down by a range predicate, never as the filter itself.
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    if dialect in ('mysql', 'mariadb'):
+        return func.date_format(column, '%Y-%m')
+    return func.strftime('%Y-%m', column)
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+
+def bucket_start(d, granularity):
+    # First day of the bucket holding d (weeks start on Monday)
+    if granularity == 'day': return d
+    if granularity == 'week': return d - datetime.timedelta(days=d.weekday())
+    if granularity == 'month': return datetime.date(d.year, d.month, 1)
+    if granularity == 'quarter': return datetime.date(d.year, (d.month - 1) // 3 * 3 + 1, 1)
+    return datetime.date(d.year, 1, 1)
+
+def next_bucket(d, granularity):
+    # Start of the bucket after the one starting at d
+    if granularity == 'day': return d + datetime.timedelta(days=1)
+    if granularity == 'week': return d + datetime.timedelta(days=7)
+    return add_months(d, {'month': 1, 'quarter': 3, 'year': 12}[granularity])
+
+def bucket_expr(column, granularity):
+    # 'YYYY-MM-DD' of the bucket start, computed in SQL (same rules as bucket_start).
+    # Like month_expr: GROUP BY it, don't filter on it.
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        if granularity == 'day': return func.to_char(column, 'YYYY-MM-DD')
+        return func.to_char(func.date_trunc(granularity, column), 'YYYY-MM-DD')
+    if dialect in ('mysql', 'mariadb'):
+        if granularity == 'day': return func.date_format(column, '%Y-%m-%d')
+        if granularity == 'week': return func.date_format(func.subdate(column, func.weekday(column)), '%Y-%m-%d')
+        if granularity == 'month': return func.date_format(column, '%Y-%m-01')
+        if granularity == 'quarter':
+            return func.concat(func.year(column), '-', func.lpad((func.quarter(column) - 1) * 3 + 1, 2, '0'), '-01')
+        return func.date_format(column, '%Y-01-01')
+    if granularity == 'day': return func.date(column)
+    if granularity == 'week':
+        # strftime('%w') is 0 for Sunday; step back to Monday
+        back = cast((cast(func.strftime('%w', column), Integer) + 6) % 7, String)
+        return func.date(column, literal('-').concat(back).concat(' days'))
+    if granularity == 'month': return func.strftime('%Y-%m-01', column)
+    if granularity == 'quarter':
+        month = cast(func.strftime('%m', column), Integer)
+        return func.strftime('%Y-', column, type_=String).concat(func.printf('%02d', (month - 1) // 3 * 3 + 1)).concat('-01')
+    return func.strftime('%Y-01-01', column)
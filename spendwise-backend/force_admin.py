@@ -1,5 +1,6 @@
 from app import app
 from models import db, User
+from auth_cache import user_cache
 
 #  👇 TYPE YOUR EXACT USERNAME HERE
 my_username = "Admin" 
@@ -12,6 +13,7 @@ with app.app_context():
         # 2. Force them to be admin
         user.is_admin = True
         db.session.commit()
+        user_cache.invalidate(user.id)  # Shared cache backends pick this up right away; 'local' ones within USER_CACHE_TTL
         
         # 3. Verify it worked
         print(f"\n✅ SUCCESS: User '{user.username}' is now an ADMIN.")
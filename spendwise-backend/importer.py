@@ -0,0 +1,128 @@
+import csv
+import io
+import math
+from collections import Counter
+from sqlalchemy import insert
+from models import db, Expense, Income
+from dates import parse_date
+from summaries import record_bulk
+from versions import bump_data_version
+from archive import ledger_table
+
+# ==========================================
+# BULK TRANSACTION IMPORT
+# ==========================================
+# Accepts the CSV that /api/export/csv produces, or a JSON array of rows.
+# Rows are validated one by one (errors are reported per row), matched
+# against what the user already has so re-uploading a file doesn't double
+# insert, and written with chunked executemany INSERTs in one transaction.
+
+CSV_COLUMNS = {'type': 'type', 'category': 'category', 'amount': 'amount', 'date': 'date',
+               'description': 'description', 'payment method': 'payment_method', 'source': 'source'}
+
+def parse_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    rows = []
+    for raw in reader:
+        row = {CSV_COLUMNS[k.strip().lower()]: (v or '').strip() for k, v in raw.items() if k and k.strip().lower() in CSV_COLUMNS}
+        # The export puts an income's source in the Category column
+        if row.get('type', '').lower() == 'income' and not row.get('source'):
+            row['source'] = row.get('category', '')
+        rows.append(row)
+    return rows
+
+def parse_json(payload):
+    rows = payload.get('rows') if isinstance(payload, dict) else payload
+    if not isinstance(rows, list): raise ValueError('Expected a JSON array of rows (or {"rows": [...]})')
+    return rows
+
+def validate_row(row):
+    # Returns (kind, values) or raises ValueError with a message for the client
+    if not isinstance(row, dict): raise ValueError('Row must be an object')
+    kind = str(row.get('type', 'expense')).strip().lower()
+    if kind not in ('expense', 'income'): raise ValueError("type must be 'expense' or 'income'")
+    try:
+        amount = round(float(row.get('amount')), 2)
+    except (TypeError, ValueError):
+        raise ValueError('amount must be a number')
+    if not math.isfinite(amount): raise ValueError('amount must be a number')  # float() takes 'inf' and 'nan'
+    if amount <= 0: raise ValueError('amount must be positive')
+    try:
+        date = parse_date(row.get('date'))
+    except (TypeError, ValueError):
+        raise ValueError('date must be YYYY-MM-DD')
+
+    label_field = 'category' if kind == 'expense' else 'source'
+    label = str(row.get(label_field) or '').strip()
+    if not label: raise ValueError(f'{label_field} is required')
+    if len(label) > 50: raise ValueError(f'{label_field} is too long (max 50)')
+    if kind == 'income':
+        return kind, {'amount': amount, 'source': label, 'date': date}
+
+    description = str(row.get('description') or '').strip() or None
+    payment_method = str(row.get('payment_method') or '').strip() or None
+    if description and len(description) > 200: raise ValueError('description is too long (max 200)')
+    if payment_method and len(payment_method) > 50: raise ValueError('payment_method is too long (max 50)')
+    return kind, {'amount': amount, 'category': label, 'date': date, 'description': description, 'payment_method': payment_method}
+
+def _fingerprint(kind, values):
+    if kind == 'income':
+        return (kind, values['date'], round(values['amount'], 2), values['source'])
+    return (kind, values['date'], round(values['amount'], 2), values['category'], values['description'] or None)
+
+def _existing_fingerprints(user_id, kinds_dates):
+    # Only the user's rows inside the imported date range are read (index range on user_id, date),
+    # archived ones included so re-importing an old file doesn't book it twice
+    counts = Counter()
+    for kind, model, columns in (('expense', Expense, ('date', 'amount', 'category', 'description')),
+                                 ('income', Income, ('date', 'amount', 'source'))):
+        dates = kinds_dates.get(kind)
+        if not dates: continue
+        t = ledger_table(model, user_id, min(dates))
+        query = db.session.query(*[t.c[c] for c in columns]).filter(t.c.user_id == user_id, t.c.date >= min(dates), t.c.date <= max(dates))
+        for row in query.yield_per(5000):
+            counts[(kind, row[0], round(row[1], 2), *row[2:])] += 1
+    return counts
+
+def import_rows(user_id, rows, chunk_size=1000, atomic=False):
+    # Returns the response dict. Does not commit; the caller does.
+    errors, valid = [], []
+    for index, row in enumerate(rows, start=1):
+        try:
+            valid.append((index,) + validate_row(row))
+        except ValueError as e:
+            errors.append({'row': index, 'error': str(e)})
+    if atomic and errors:
+        return _result([], [], [], errors)
+
+    # Duplicate detection as a multiset: a re-uploaded row matches one existing row,
+    # while two identical coffees on the same day in a fresh file both go in
+    kinds_dates = {}
+    for _, kind, values in valid: kinds_dates.setdefault(kind, []).append(values['date'])
+    existing = _existing_fingerprints(user_id, kinds_dates)
+    expenses, incomes, duplicates = [], [], []
+    for index, kind, values in valid:
+        fp = _fingerprint(kind, values)
+        if existing[fp] > 0:
+            existing[fp] -= 1
+            duplicates.append(index)
+            continue
+        values['user_id'] = user_id
+        (expenses if kind == 'expense' else incomes).append(values)
+
+    if expenses or incomes:
+        seq = bump_data_version(user_id)  # Stamps the new rows for delta sync
+        for values in expenses + incomes: values['updated_seq'] = seq
+    for model, batch in ((Expense, expenses), (Income, incomes)):
+        for start in range(0, len(batch), chunk_size):
+            db.session.execute(insert(model), batch[start:start + chunk_size])
+    if expenses or incomes:
+        record_bulk(user_id, expenses, incomes)
+
+    return _result(expenses, incomes, duplicates, errors)
+
+def _result(expenses, incomes, duplicates, errors):
+    # Row lists are capped so a badly broken file can't produce a huge response
+    return {'inserted': len(expenses) + len(incomes), 'expenses': len(expenses), 'incomes': len(incomes),
+            'duplicates': len(duplicates), 'duplicate_rows': duplicates[:1000],
+            'error_count': len(errors), 'errors': errors[:1000]}
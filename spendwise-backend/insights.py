@@ -0,0 +1,251 @@
+from sqlalchemy import func, select
+from models import db, Expense, Income, Tombstone
+from archive import ARCHIVE_OF, ledger_table
+from cache import LRUBackend
+
+# ==========================================
+# IN-MEMORY LEDGER ENGINE (/api/analytics/insights)
+# ==========================================
+# A user's whole Expense/Income history is loaded once into parallel numpy
+# arrays (id, day number, month number, day of month, int-coded category,
+# amount), and every insight is a few vectorized passes over them instead of
+# a pile of aggregate queries. Snapshots live in a bounded per-process LRU.
+# When the user's data_version moves, only rows with a higher id are fetched
+# and appended. If a transaction was deleted since the snapshot's version
+# (there's a tombstone for it, see sync.py) or the row count doesn't add up,
+# the snapshot is rebuilt from scratch. Archived rows are part of the ledger
+# (archiving moves rows without changing the count, so it never forces a rebuild).
+# numpy loads on the first snapshot, not with the module (app.py imports
+# init_ledger_cache at boot).
+
+ROLLING_WINDOWS = (3, 6, 12)
+ANOMALY_Z = 3.0            # Transactions this many std devs above the category's mean
+ANOMALY_MIN_HISTORY = 5    # ...but only for categories with at least this many past transactions
+CATEGORY_Z = 2.0           # Category months this far above their recent monthly mean
+RECENT_DAYS = 30
+
+class Ledger:
+    # One side of the books (expenses or incomes); immutable, extend() returns a new one
+    def __init__(self, ids, days, codes, amounts, labels):
+        import numpy as np
+        self.ids, self.days, self.codes, self.amounts = ids, days, codes, amounts
+        self.labels = labels                        # code -> category / source
+        self.months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)  # months since 1970-01
+        self.dom = (days - self.months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int32) + 1).astype(np.int8)
+
+    @classmethod
+    def empty(cls):
+        import numpy as np
+        return cls(np.zeros(0, np.int64), np.zeros(0, np.int32), np.zeros(0, np.int32), np.zeros(0), [])
+
+    def extend(self, rows):
+        # rows: [(id, date, label, amount)] in id order
+        import numpy as np
+        if not rows: return self
+        labels = list(self.labels)
+        index = {label: code for code, label in enumerate(labels)}
+        codes = np.fromiter((index.setdefault(r[2] or '', len(index)) for r in rows), np.int32, len(rows))
+        labels += list(index)[len(labels):]
+        return Ledger(np.concatenate([self.ids, np.fromiter((r[0] for r in rows), np.int64, len(rows))]),
+                      np.concatenate([self.days, np.array([r[1] for r in rows], dtype='datetime64[D]').astype(np.int32)]),
+                      np.concatenate([self.codes, codes]),
+                      np.concatenate([self.amounts, np.fromiter((r[3] or 0.0 for r in rows), float, len(rows))]),
+                      labels)
+
+    @property
+    def max_id(self):
+        return int(self.ids[-1]) if len(self.ids) else 0
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.ids, self.days, self.codes, self.amounts, self.months, self.dom))
+
+class LedgerSnapshot:
+    def __init__(self, user_id, data_version, expenses, incomes):
+        self.user_id, self.data_version = user_id, data_version
+        self.expenses, self.incomes = expenses, incomes
+
+    @property
+    def nbytes(self):
+        return self.expenses.nbytes + self.incomes.nbytes
+
+# ==========================================
+# LOADING & CACHE
+# ==========================================
+
+def _fetch(model, label, user_id, after_id=None):
+    # Everything (live + archived), or only live rows past after_id: new rows never go to the archive first
+    t = ledger_table(model, user_id) if after_id is None else model.__table__
+    query = db.session.query(t.c.id, t.c.date, t.c[label], t.c.amount).filter(t.c.user_id == user_id)
+    if after_id is not None: query = query.filter(t.c.id > after_id)
+    return query.order_by(t.c.id).all()
+
+def _count(model, user_id):
+    # Live + archived in one statement, so a concurrent archive batch can't be seen half-moved.
+    # Answered from the (user_id, date) indexes.
+    archive = ARCHIVE_OF[model]
+    live = select(func.count(model.id)).where(model.user_id == user_id).scalar_subquery()
+    archived = select(func.count(archive.id)).where(archive.user_id == user_id).scalar_subquery()
+    return db.session.execute(select(live + archived)).scalar()
+
+def _refresh(ledger, model, label, user_id):
+    # Append new rows; rebuild if anything disappeared (only appends keep count == old + new)
+    new_rows = _fetch(model, label, user_id, ledger.max_id)
+    if len(ledger.ids) + len(new_rows) == _count(model, user_id):
+        return ledger.extend(new_rows)
+    return Ledger.empty().extend(_fetch(model, label, user_id))
+
+def _deleted_since(user_id, data_version):
+    # One probe on the (user_id, seq) index
+    return db.session.query(Tombstone.id).filter(Tombstone.user_id == user_id, Tombstone.seq > data_version,
+                                                 Tombstone.resource.in_(('expense', 'income'))).first() is not None
+
+class LedgerCache:
+    def __init__(self, backend=None):
+        self.backend = backend or LRUBackend(500, 3600, 256 * 1024 * 1024, lambda s: s.nbytes)
+        self.full_loads = self.incremental = 0
+
+    def snapshot(self, user_id, data_version):
+        snap = self.backend.get(user_id)
+        if snap is not None and snap.data_version == data_version:
+            return snap
+        if snap is None or _deleted_since(user_id, snap.data_version):
+            self.full_loads += 1
+            snap = LedgerSnapshot(user_id, data_version, Ledger.empty().extend(_fetch(Expense, 'category', user_id)),
+                                  Ledger.empty().extend(_fetch(Income, 'source', user_id)))
+        else:
+            self.incremental += 1
+            snap = LedgerSnapshot(user_id, data_version, _refresh(snap.expenses, Expense, 'category', user_id),
+                                  _refresh(snap.incomes, Income, 'source', user_id))
+        self.backend.set(user_id, snap)
+        return snap
+
+    def stats(self):
+        return {**self.backend.stats(), 'full_loads': self.full_loads, 'incremental_refreshes': self.incremental}
+
+ledger_cache = LedgerCache()
+
+def init_ledger_cache(app):
+    ledger_cache.backend = LRUBackend(app.config.get('INSIGHTS_CACHE_SIZE', 500), app.config.get('INSIGHTS_CACHE_TTL', 3600),
+                                      app.config.get('INSIGHTS_CACHE_MAX_BYTES'), lambda s: s.nbytes)
+    return ledger_cache
+
+# ==========================================
+# METRICS (all vectorized over the snapshot)
+# ==========================================
+
+def _month_label(m):
+    import numpy as np
+    return str(np.datetime64(int(m), 'M'))
+
+def _day(d):
+    import numpy as np
+    return int(np.datetime64(d, 'D').astype(np.int32))
+
+def _pivot(ledger, first_month, n_months, mask=None):
+    # labels x months matrix of sums (only rows inside the window)
+    import numpy as np
+    rel = ledger.months - first_month
+    keep = (rel >= 0) & (rel < n_months)
+    if mask is not None: keep &= mask
+    n_labels = len(ledger.labels)
+    flat = np.bincount(ledger.codes[keep] * n_months + rel[keep], weights=ledger.amounts[keep], minlength=n_labels * n_months)
+    return flat.reshape(n_labels, n_months)
+
+def _pivot_json(ledger, matrix, months):
+    import numpy as np
+    totals = matrix.sum(axis=1)
+    order = [i for i in np.argsort(-totals, kind='stable') if totals[i] > 0]
+    return {'months': months, 'rows': [{'label': ledger.labels[i], 'total': round(float(totals[i]), 2),
+                                        'values': np.round(matrix[i], 2).tolist()} for i in order]}
+
+def _rolling(values, k):
+    # Trailing k-month mean; the first months average over what exists so far
+    import numpy as np
+    sums = np.cumsum(np.concatenate([[0.0], values]))
+    idx = np.arange(1, len(values) + 1)
+    lo = np.maximum(idx - k, 0)
+    return (sums[idx] - sums[lo]) / (idx - lo)
+
+def compute_insights(snap, as_of, months=12):
+    import numpy as np
+    e, inc = snap.expenses, snap.incomes
+    today_day = _day(as_of)
+    cur_m = int(np.datetime64(as_of, 'M').astype(np.int32))
+    first_m = cur_m - months + 1
+    labels = [_month_label(m) for m in range(first_m, cur_m + 1)]
+    upto_today = e.days <= today_day
+
+    # 1. Category x month pivots (current month so far included)
+    expense_pivot = _pivot(e, first_m, months, upto_today)
+    income_pivot = _pivot(inc, first_m, months, inc.days <= today_day)
+
+    # 2. Monthly totals from the first month on record through last month, rolling averages over completed months
+    start_m = int(min(e.months.min() if len(e.months) else cur_m, inc.months.min() if len(inc.months) else cur_m, first_m - 12))
+    span = cur_m - start_m
+    exp_monthly = np.bincount(e.months[e.months < cur_m] - start_m, weights=e.amounts[e.months < cur_m], minlength=span)[:span]
+    inc_monthly = np.bincount(inc.months[inc.months < cur_m] - start_m, weights=inc.amounts[inc.months < cur_m], minlength=span)[:span]
+    done = labels[:-1]
+    rolling = {}
+    for name, series in (('expense', exp_monthly), ('income', inc_monthly), ('net', inc_monthly - exp_monthly)):
+        rolling[name] = {str(k): np.round(_rolling(series, k)[len(series) - len(done):], 2).tolist() for k in ROLLING_WINDOWS}
+    completed = _pivot(e, cur_m - 12, 12)  # labels x last 12 completed months
+    category_rolling = {e.labels[i]: {str(k): round(float(completed[i, -k:].mean()), 2) for k in ROLLING_WINDOWS}
+                        for i in np.flatnonzero(completed.sum(axis=1) > 0)}
+
+    # 3. Current month velocity: straight-line pace and the user's usual pace by this day of the month
+    day_of_month = as_of.day
+    days_in_month = (np.datetime64(as_of, 'M') + 1 - np.datetime64(as_of, 'M')).astype('timedelta64[D]').astype(int)
+    this_month = (e.months == cur_m) & upto_today
+    spent = float(e.amounts[this_month].sum())
+    linear = spent / day_of_month * days_in_month
+    recent = (e.months >= cur_m - 6) & (e.months < cur_m)
+    by_month_total = np.bincount(e.months[recent] - (cur_m - 6), weights=e.amounts[recent], minlength=6)
+    by_month_sofar = np.bincount(e.months[recent & (e.dom <= day_of_month)] - (cur_m - 6),
+                                 weights=e.amounts[recent & (e.dom <= day_of_month)], minlength=6)
+    usable = by_month_total > 0
+    share = float(by_month_sofar[usable].sum() / by_month_total[usable].sum()) if usable.any() else 0.0
+    paced = spent / share if share > 0 else linear
+    cat_spent = np.bincount(e.codes[this_month], weights=e.amounts[this_month], minlength=len(e.labels))
+    cat_projected = cat_spent / day_of_month * days_in_month
+    avg3 = completed[:, -3:].mean(axis=1) if len(e.labels) else np.zeros(0)
+    projection = {
+        'month': labels[-1], 'day': day_of_month, 'days_in_month': int(days_in_month),
+        'spent_so_far': round(spent, 2), 'projected_linear': round(linear, 2), 'projected_by_usual_pace': round(paced, 2),
+        'usual_share_by_today': round(share, 4),
+        'income_so_far': round(float(inc.amounts[(inc.months == cur_m) & (inc.days <= today_day)].sum()), 2),
+        'categories': [{'category': e.labels[i], 'spent': round(float(cat_spent[i]), 2), 'projected': round(float(cat_projected[i]), 2),
+                        'avg_3_months': round(float(avg3[i]), 2)} for i in np.argsort(-cat_projected, kind='stable') if cat_spent[i] > 0],
+    }
+
+    # 4. Anomalies against the user's own baseline (previous 12 completed months)
+    base = (e.months >= cur_m - 12) & (e.months < cur_m)
+    n = np.bincount(e.codes[base], minlength=len(e.labels))
+    total = np.bincount(e.codes[base], weights=e.amounts[base], minlength=len(e.labels))
+    squares = np.bincount(e.codes[base], weights=e.amounts[base] ** 2, minlength=len(e.labels))
+    mean = np.divide(total, n, out=np.zeros_like(total), where=n > 0)
+    std = np.sqrt(np.maximum(np.divide(squares, n, out=np.zeros_like(squares), where=n > 0) - mean ** 2, 0))
+    window = (e.days > today_day - RECENT_DAYS) & upto_today
+    codes = e.codes[window]
+    z = np.divide(e.amounts[window] - mean[codes], std[codes], out=np.zeros(int(window.sum())), where=std[codes] > 0)
+    flagged = np.flatnonzero((z >= ANOMALY_Z) & (n[codes] >= ANOMALY_MIN_HISTORY))
+    flagged = flagged[np.argsort(-z[flagged], kind='stable')][:20]
+    ids, days, amounts = e.ids[window], e.days[window], e.amounts[window]
+    transactions = [{'id': int(ids[i]), 'date': str(np.datetime64(int(days[i]), 'D')), 'category': e.labels[codes[i]],
+                     'amount': round(float(amounts[i]), 2), 'z_score': round(float(z[i]), 2),
+                     'category_mean': round(float(mean[codes[i]]), 2)} for i in flagged]
+
+    six = completed[:, -6:]
+    m_mean, m_std = six.mean(axis=1), six.std(axis=1)
+    m_z = np.divide(cat_projected - m_mean, m_std, out=np.zeros_like(m_mean), where=m_std > 0)
+    hot = [i for i in np.argsort(-m_z, kind='stable') if m_z[i] >= CATEGORY_Z and (six[i] > 0).sum() >= 3]
+    categories = [{'category': e.labels[i], 'projected': round(float(cat_projected[i]), 2), 'monthly_mean': round(float(m_mean[i]), 2),
+                   'z_score': round(float(m_z[i]), 2)} for i in hot]
+
+    return {
+        'as_of': as_of.isoformat(),
+        'pivot': {'expenses': _pivot_json(e, expense_pivot, labels), 'income': _pivot_json(inc, income_pivot, labels)},
+        'rolling': {'months': done, **rolling, 'categories': category_rolling},
+        'projection': projection,
+        'anomalies': {'transactions': transactions, 'categories': categories},
+    }
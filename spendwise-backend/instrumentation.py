@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from models import db
+
+# ==========================================
+# REQUEST & SQL INSTRUMENTATION
+# ==========================================
+# Per endpoint: latency histogram, SQL statements and DB time per request.
+# Per query: slow-query log above SLOW_QUERY_MS. Per request: an N+1 warning when
+# the same statement runs N_PLUS_ONE_THRESHOLD+ times. Everything is kept in
+# process memory and rendered as Prometheus text by /api/admin/metrics.
+# Cost per request is a few perf_counter() calls and dict updates, so it stays on in production.
+# Note: for streamed responses (CSV export) the latency is time to first byte.
+
+log = logging.getLogger('spendwise.metrics')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound: break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+_lock = threading.Lock()
+_latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))      # endpoint -> seconds
+_statements = defaultdict(lambda: Histogram(STATEMENT_BUCKETS))  # endpoint -> statements per request
+_db_seconds = defaultdict(float)                                 # endpoint -> total DB time
+_requests = Counter()                                            # (endpoint, method, status)
+_n_plus_one = Counter()                                          # endpoint
+_slow_queries = Counter()                                        # endpoint ('' = outside a request)
+_slow_query_ms = 200         # Set from SLOW_QUERY_MS
+_n_plus_one_threshold = 10   # Set from N_PLUS_ONE_THRESHOLD
+
+# ==========================================
+# SQLALCHEMY HOOKS
+# ==========================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    state = g.get('_metrics') if has_request_context() else None
+    if state is not None:
+        state['queries'] += 1
+        state['db_time'] += elapsed
+        state['statements'][statement] += 1  # Already parameterized, so repeats share one key
+    if elapsed * 1000 >= _slow_query_ms:
+        endpoint = (request.endpoint or '') if state is not None else ''
+        with _lock: _slow_queries[endpoint] += 1
+        log.warning("Slow query (%.0f ms) in %s: %s", elapsed * 1000, endpoint or 'background', ' '.join(statement.split())[:500])
+
+# ==========================================
+# FLASK HOOKS
+# ==========================================
+
+def _start_request():
+    g._metrics = {'start': time.perf_counter(), 'queries': 0, 'db_time': 0.0, 'statements': Counter()}
+
+def _finish_request(response):
+    _record(response.status_code)
+    return response
+
+def _teardown_request(exc):
+    if exc is not None and g.get('_metrics') is not None: _record(500)
+
+def _record(status):
+    state = g.pop('_metrics', None)
+    if state is None: return
+    elapsed = time.perf_counter() - state['start']
+    endpoint = request.endpoint or 'unmatched'
+    repeated = [(s, n) for s, n in state['statements'].items() if n >= _n_plus_one_threshold]
+
+    with _lock:
+        _latency[endpoint].observe(elapsed)
+        _statements[endpoint].observe(state['queries'])
+        _db_seconds[endpoint] += state['db_time']
+        _requests[(endpoint, request.method, status)] += 1
+        if repeated: _n_plus_one[endpoint] += 1
+
+    for statement, n in repeated:
+        log.warning("Possible N+1 in %s: statement ran %d times in one request: %s", endpoint, n, ' '.join(statement.split())[:300])
+
+def init_instrumentation(app):
+    global _slow_query_ms, _n_plus_one_threshold
+    if not app.config.get('METRICS_ENABLED', True): return
+    _slow_query_ms = app.config.get('SLOW_QUERY_MS', 200)
+    _n_plus_one_threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
+
+# ==========================================
+# PROMETHEUS TEXT FORMAT
+# ==========================================
+
+def _labels(**labels):
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels.items()) + '}'
+
+def _histogram_lines(name, help_text, histograms):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for endpoint, h in sorted(histograms.items()):
+        cumulative = 0
+        for bound, n in zip(list(h.buckets) + ['+Inf'], h.counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{_labels(endpoint=endpoint, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(endpoint=endpoint)} {h.sum:.6f}")
+        lines.append(f"{name}_count{_labels(endpoint=endpoint)} {h.count}")
+    return lines
+
+def _gauges(prefix, stats):
+    # Flattens {'hits': 3, 'send_latency_ms': {'p50': 1.2}} -> prefix_hits 3, prefix_send_latency_ms_p50 1.2
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            lines += _gauges(f"{prefix}_{key}", value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"{prefix}_{key} {value}")
+    return lines
+
+def render_metrics(extra=None):
+    # extra: {'outbox': outbox_stats(), ...} -> exported as spendwise_<name>_<key> gauges
+    with _lock:
+        lines = _histogram_lines('spendwise_http_request_duration_seconds', 'Request latency by endpoint.', _latency)
+        lines += _histogram_lines('spendwise_db_statements_per_request', 'SQL statements executed per request.', _statements)
+        lines += ["# HELP spendwise_db_time_seconds_total Time spent in SQL by endpoint.", "# TYPE spendwise_db_time_seconds_total counter"]
+        lines += [f"spendwise_db_time_seconds_total{_labels(endpoint=e)} {s:.6f}" for e, s in sorted(_db_seconds.items())]
+        lines += ["# HELP spendwise_http_requests_total Requests by endpoint, method and status.", "# TYPE spendwise_http_requests_total counter"]
+        lines += [f"spendwise_http_requests_total{_labels(endpoint=e, method=m, status=s)} {n}" for (e, m, s), n in sorted(_requests.items())]
+        lines += ["# HELP spendwise_n_plus_one_total Requests that repeated one statement N_PLUS_ONE_THRESHOLD+ times.", "# TYPE spendwise_n_plus_one_total counter"]
+        lines += [f"spendwise_n_plus_one_total{_labels(endpoint=e)} {n}" for e, n in sorted(_n_plus_one.items())]
+        lines += ["# HELP spendwise_slow_queries_total Statements slower than SLOW_QUERY_MS.", "# TYPE spendwise_slow_queries_total counter"]
+        lines += [f"spendwise_slow_queries_total{_labels(endpoint=e or 'background')} {n}" for e, n in sorted(_slow_queries.items())]
+    for name, stats in (extra or {}).items():
+        lines += _gauges(f"spendwise_{name}", stats)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,148 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import update
+from models import db, User, ExportJob
+from dates import parse_date
+from versions import get_data_version
+
+# ==========================================
+# BACKGROUND EXPORT JOBS
+# ==========================================
+# Job state lives in the ExportJob table, finished files on disk (EXPORT_DIR).
+# Work runs on a small in-process thread pool, so no broker or extra service
+# is needed. Artifacts are keyed by the user's data_version: as soon as the
+# user writes anything, the next request gets a fresh report and older files
+# for that user are removed.
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _pool(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('EXPORT_WORKERS', 2), thread_name_prefix='export')
+    return _executor
+
+def _export_dir(app):
+    path = app.config.get('EXPORT_DIR') or os.path.join(app.instance_path, 'exports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def cache_key_for(user_id, version, fmt, params):
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+    return f"{user_id}-v{version}-{fmt}-{digest}"
+
+def expire_if_stuck(job):
+    # A job whose worker died (deploy, crash) would stay queued/running forever.
+    # Running jobs time out from when a worker took them; queued ones get longer,
+    # since a busy pool can keep them waiting well past the build time.
+    if job.status == 'running':
+        since, timeout = job.started_at or job.created_at, current_app.config.get('EXPORT_JOB_TIMEOUT', 600)
+    elif job.status == 'queued':
+        since, timeout = job.created_at, current_app.config.get('EXPORT_QUEUE_TIMEOUT', 3600)
+    else:
+        return job
+    now = datetime.datetime.utcnow()
+    if since < now - datetime.timedelta(seconds=timeout):
+        # Only if it's still in that state (a worker may have just claimed or finished it)
+        db.session.execute(update(ExportJob).where(ExportJob.id == job.id, ExportJob.status == job.status)
+                           .values(status='failed', error='Timed out', finished_at=now))
+        db.session.commit()
+        db.session.refresh(job)
+    return job
+
+def find_cached(user_id, fmt, params):
+    key = cache_key_for(user_id, get_data_version(user_id), fmt, params)
+    jobs = ExportJob.query.filter(ExportJob.user_id == user_id, ExportJob.cache_key == key, ExportJob.status.in_(['queued', 'running', 'done'])) \
+        .order_by(ExportJob.created_at.desc()).all()
+    for job in jobs:
+        expire_if_stuck(job)
+        if job.status in ('queued', 'running'): return key, job
+        if job.status == 'done' and job.file_path and os.path.exists(job.file_path): return key, job
+    return key, None
+
+def create_job(user_id, fmt, params, key):
+    job = ExportJob(id=uuid.uuid4().hex, user_id=user_id, format=fmt, params=json.dumps(params),
+                    data_version=get_data_version(user_id), cache_key=key)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def submit_export(user_id, fmt, params):
+    # Returns an existing job for the same (data version, params) if there is one,
+    # otherwise queues a new one on the worker pool
+    key, job = find_cached(user_id, fmt, params)
+    if job: return job
+    job = create_job(user_id, fmt, params, key)
+    app = current_app._get_current_object()
+    _pool(app).submit(run_job, app, job.id)
+    return job
+
+def build_now(user_id, fmt, params):
+    # Synchronous path for the old GET /api/export/pdf, sharing the same cache
+    key, job = find_cached(user_id, fmt, params)
+    if job and job.status == 'done': return job
+    job = create_job(user_id, fmt, params, key)
+    run_job(current_app._get_current_object(), job.id)
+    db.session.expire_all()
+    return db.session.get(ExportJob, job.id)
+
+def run_job(app, job_id):
+    with app.app_context():
+        # Claim the job, so it can only ever run once
+        claimed = db.session.execute(update(ExportJob).where(ExportJob.id == job_id, ExportJob.status == 'queued')
+                                     .values(status='running', started_at=datetime.datetime.utcnow())).rowcount
+        db.session.commit()
+        if not claimed: return
+
+        job = db.session.get(ExportJob, job_id)
+        try:
+            user = db.session.get(User, job.user_id)
+            params = json.loads(job.params)
+            start = parse_date(params['from']) if params.get('from') else None
+            end = parse_date(params['to']) if params.get('to') else None
+            from reports import build_pdf  # ReportLab is heavy; load it only where reports are built
+            data = build_pdf(user.id, user.username, start, end)
+
+            path = os.path.join(_export_dir(app), f"{job.cache_key}.{job.format}")
+            with open(path + '.tmp', 'wb') as f: f.write(data)
+            os.replace(path + '.tmp', path)
+            job.file_path, job.status = path, 'done'
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(ExportJob, job_id)
+            job.status, job.error = 'failed', str(e)[:300]
+            print(f"Export Error: {e}")
+        job.finished_at = datetime.datetime.utcnow()
+        db.session.commit()
+        if job.status == 'done': prune_artifacts(job)
+
+def prune_artifacts(job):
+    # Files built from an older data version can never be served again
+    old = ExportJob.query.filter(ExportJob.user_id == job.user_id, ExportJob.status == 'done',
+                                 ExportJob.data_version < job.data_version).all()
+    for o in old:
+        if o.file_path and os.path.exists(o.file_path): os.remove(o.file_path)
+        o.status, o.file_path = 'expired', None
+    db.session.commit()
+
+def job_to_dict(job):
+    return {
+        'job_id': job.id,
+        'format': job.format,
+        'params': json.loads(job.params),
+        'status': job.status,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': f"/api/export/jobs/{job.id}",
+        'download_url': f"/api/export/jobs/{job.id}/download" if job.status == 'done' else None,
+    }
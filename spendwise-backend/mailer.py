@@ -0,0 +1,150 @@
+import collections
+import datetime
+import threading
+import time
+import uuid
+from flask_mail import Message
+from sqlalchemy import update, or_, and_, func
+from models import db, EmailOutbox
+from extensions import mail
+
+# ==========================================
+# EMAIL OUTBOX & DISPATCHER
+# ==========================================
+# Routes only call queue_email(), which adds a row to the outbox in the same
+# transaction as the change that triggered it. A background dispatcher claims
+# pending rows in batches, sends each batch over ONE SMTP connection, and
+# retries failures with exponential backoff.
+#
+# Local testing against a stand-in SMTP server:
+#   python -m aiosmtpd -n -l localhost:8025
+#   MAIL_SERVER=localhost MAIL_PORT=8025 MAIL_USE_TLS=false python app.py
+
+_wake = threading.Event()
+
+def queue_email(subject, recipient, body):
+    # Caller commits. Nothing is sent on the request thread.
+    db.session.add(EmailOutbox(subject=subject, recipient=recipient, body=body))
+    _wake.set()
+
+# ==========================================
+# METRICS
+# ==========================================
+
+_stats_lock = threading.Lock()
+_latencies = collections.deque(maxlen=1000)  # seconds, most recent sends
+_counters = {'sent': 0, 'retried': 0, 'failed': 0, 'batches': 0}
+
+def _record(kind, latency=None):
+    with _stats_lock:
+        _counters[kind] += 1
+        if latency is not None: _latencies.append(latency)
+
+def _percentile_ms(values, q):
+    if not values: return None
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+
+def outbox_stats():
+    depth = dict(db.session.query(EmailOutbox.status, func.count(EmailOutbox.id))
+                 .filter(EmailOutbox.status.in_(['pending', 'sending'])).group_by(EmailOutbox.status).all())
+    with _stats_lock:
+        latencies = sorted(_latencies)
+        counters = dict(_counters)
+    return {
+        'queue_depth': depth.get('pending', 0),
+        'in_flight': depth.get('sending', 0),
+        'send_latency_ms': {'p50': _percentile_ms(latencies, 0.5), 'p95': _percentile_ms(latencies, 0.95), 'max': _percentile_ms(latencies, 1.0), 'samples': len(latencies)},
+        **counters,
+    }
+
+# ==========================================
+# DISPATCHER
+# ==========================================
+
+def claim_batch(batch_size, lease_seconds):
+    # Rows are claimed with a token through a conditional UPDATE, so several
+    # dispatchers (one per worker, or a separate process) never send the same
+    # mail twice. A 'sending' row whose lease ran out (dispatcher died) is up for grabs again.
+    now = datetime.datetime.utcnow()
+    ready = or_(and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+                and_(EmailOutbox.status == 'sending', EmailOutbox.claimed_at < now - datetime.timedelta(seconds=lease_seconds)))
+    query = db.session.query(EmailOutbox.id).filter(ready).order_by(EmailOutbox.id).limit(batch_size)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        query = query.with_for_update(skip_locked=True)
+    ids = [r[0] for r in query.all()]
+    if not ids:
+        db.session.commit()
+        return []
+
+    token = uuid.uuid4().hex
+    db.session.execute(update(EmailOutbox).where(EmailOutbox.id.in_(ids), ready)
+                       .values(status='sending', claim_token=token, claimed_at=now)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+    return EmailOutbox.query.filter_by(claim_token=token, status='sending').order_by(EmailOutbox.id).all()
+
+def _retry_later(row, error, config):
+    row.attempts += 1
+    row.last_error = str(error)[:300]
+    row.claim_token = None
+    if row.attempts >= config.get('MAIL_MAX_ATTEMPTS', 5):
+        row.status = 'failed'
+        _record('failed')
+        print(f"Email Error: giving up on outbox #{row.id} to {row.recipient}: {error}")
+    else:
+        delay = min(config.get('MAIL_RETRY_BASE_SECONDS', 30) * 2 ** (row.attempts - 1), 3600)
+        row.status, row.next_attempt_at = 'pending', datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)
+        _record('retried')
+
+def dispatch_batch(app):
+    # Sends one batch; returns how many rows it handled
+    config = app.config
+    rows = claim_batch(config.get('MAIL_BATCH_SIZE', 50), config.get('MAIL_CLAIM_LEASE_SECONDS', 300))
+    if not rows: return 0
+    _record('batches')
+    try:
+        with mail.connect() as conn:
+            for row in rows:
+                msg = Message(row.subject, recipients=[row.recipient], body=row.body)
+                started = time.perf_counter()
+                try:
+                    conn.send(msg)
+                except Exception as e:
+                    _retry_later(row, e, config)
+                    continue
+                row.status, row.sent_at, row.claim_token = 'sent', datetime.datetime.utcnow(), None
+                _record('sent', time.perf_counter() - started)
+    except Exception as e:
+        # Could not even open the connection: the whole batch goes back in the queue
+        for row in rows:
+            if row.status == 'sending': _retry_later(row, e, config)
+    db.session.commit()
+    return len(rows)
+
+_thread = None
+_start_lock = threading.Lock()
+
+def _loop(app):
+    with app.app_context():
+        while True:
+            try:
+                handled = dispatch_batch(app)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Email Error: dispatcher: {e}")
+                handled = 0
+            finally:
+                db.session.remove()
+            if not handled:
+                _wake.wait(app.config.get('MAIL_POLL_SECONDS', 2))
+                _wake.clear()
+
+def start_dispatcher(app):
+    # Cheap enough to call on every request (see create_app); only the first one starts the thread
+    global _thread
+    if _thread is not None and _thread.is_alive(): return _thread
+    with _start_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_loop, args=(app,), name='mail-dispatcher', daemon=True)
+            _thread.start()
+    return _thread
@@ -1,5 +1,6 @@
 from app import app
 from models import db, User
+from auth_cache import user_cache
 
 # REPLACE 'admin' WITH YOUR EXACT USERNAME
 target_username = 'Admin' 
@@ -9,6 +10,7 @@ with app.app_context():
     if user:
         user.is_admin = True
         db.session.commit()
+        user_cache.invalidate(user.id)  # Shared cache backends pick this up right away; 'local' ones within USER_CACHE_TTL
         print(f"✅ SUCCESS: User '{user.username}' is now an Admin!")
     else:
         print(f"❌ ERROR: User '{target_username}' not found.")
\ No newline at end of file
@@ -0,0 +1,222 @@
+import argparse
+import datetime
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, inspect, text, select
+from sqlalchemy.schema import CreateColumn
+from archive import ARCHIVE_OF
+from models import db, Expense, Income, RecurringExpense, Budget, MonthlySummary, PlatformCounter, ExpenseArchive, IncomeArchive, Tombstone, ExportJob
+
+# ==========================================
+# VERSIONED SCHEMA MIGRATIONS
+# ==========================================
+# Run once per deploy, BEFORE the new app processes start:
+#   python migrate.py           -> apply everything not applied yet
+#   python migrate.py --status  -> list migrations and whether they ran
+# Applied versions are recorded in the schema_version table. Each migration
+# runs in its own transaction together with its schema_version row.
+#
+# Adding one: write a function taking the connection, append it to MIGRATIONS
+# with the next number. Migration 1 creates tables straight from models.py, so
+# a brand new database already has every later column/index when 2+ run:
+# later migrations must check before they add (see add_column / create_index).
+
+schema_version = Table('schema_version', MetaData(),
+                       Column('version', Integer, primary_key=True),
+                       Column('name', String(200), nullable=False),
+                       Column('applied_at', DateTime, nullable=False))
+
+# ==========================================
+# HELPERS FOR MIGRATIONS
+# ==========================================
+
+def add_column(conn, model, name):
+    # ALTER TABLE ... ADD COLUMN from the model's definition, unless it's already there
+    table = getattr(model, '__table__', model)
+    if name in {c['name'] for c in inspect(conn).get_columns(table.name)}: return
+    spec = CreateColumn(table.c[name]).compile(dialect=conn.dialect)
+    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {spec}'))
+    print(f"   - added {table.name}.{name}")
+
+def create_index(conn, model, name):
+    index = next(i for i in getattr(model, '__table__', model).indexes if i.name == name)
+    index.create(conn, checkfirst=True)
+
+# ==========================================
+# MIGRATIONS
+# ==========================================
+
+def create_tables(conn):
+    db.metadata.create_all(conn)
+
+def date_columns(conn):
+    # Expense/Income.date and RecurringExpense.next_due_date used to be strings: turns them
+    # into DATE on Postgres, and normalizes odd-shaped values to 'YYYY-MM-DD' on SQLite
+    columns = [(Expense, 'date'), (Income, 'date'), (RecurringExpense, 'next_due_date')]
+    if conn.dialect.name == 'postgresql':
+        # The old column is VARCHAR, so cast it in place
+        inspector = inspect(conn)
+        for model, column in columns:
+            table = model.__tablename__
+            col_type = next(c['type'] for c in inspector.get_columns(table) if c['name'] == column)
+            if 'CHAR' in str(col_type).upper():
+                conn.execute(text(f'ALTER TABLE "{table}" ALTER COLUMN "{column}" TYPE DATE USING "{column}"::date'))
+                print(f"   - {table}.{column}: VARCHAR -> DATE")
+    elif conn.dialect.name == 'sqlite':
+        # SQLite keeps DATE values as 'YYYY-MM-DD' text; only rewrite rows in another shape
+        for model, column in columns:
+            table = model.__tablename__
+            rows = conn.execute(text(f'SELECT id, "{column}" FROM "{table}" WHERE date("{column}") IS NULL OR date("{column}") != "{column}"')).fetchall()
+            for row_id, value in rows:
+                try:
+                    conn.execute(text(f'UPDATE "{table}" SET "{column}" = :d WHERE id = :id'), {'d': fix_date(str(value)).isoformat(), 'id': row_id})
+                except ValueError:
+                    print(f"   ! {table} id={row_id}: could not parse {value!r}, fix it by hand")
+
+def fix_date(value):
+    # Handles the shapes we have seen in old rows: '2025-3-7', '2025/03/07', '2025-03-07 00:00:00'
+    year, month, day = (int(p) for p in value.replace('/', '-').replace('T', ' ').split(' ')[0].split('-')[:3])
+    return datetime.date(year, month, day)
+
+def columns_and_indexes(conn):
+    # Columns and indexes that models.py gained before migrations were versioned:
+    # adds whichever of them an older database is missing
+    for table in db.metadata.sorted_tables:
+        for column in table.columns:
+            add_column(conn, table, column.name)
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def backfill_summaries(conn):
+    # Older databases have transactions but an empty rollup
+    from summaries import rebuild_for_users
+    if conn.execute(select(MonthlySummary.id).limit(1)).first(): return
+    user_ids = [r[0] for r in conn.execute(select(Expense.user_id).union(select(Income.user_id)))]
+    for start in range(0, len(user_ids), 500):
+        rebuild_for_users(user_ids[start:start + 500])
+
+def backfill_platform_counters(conn):
+    from platform_stats import recount
+    if not conn.execute(select(PlatformCounter.id).limit(1)).first(): recount()
+
+def expense_search_index(conn):
+    from search import create_search_index
+    create_search_index(conn)
+
+def archive_tables(conn):
+    from search import create_search_index
+    db.metadata.create_all(conn, tables=[ExpenseArchive.__table__, IncomeArchive.__table__])
+    create_search_index(conn, 'expense_archive')
+
+def sync_tracking(conn):
+    # Existing rows get updated_seq 0: a client's first sync (no token) returns them all anyway
+    for model, index in ((Expense, 'ix_expense_user_seq'), (Income, 'ix_income_user_seq'), (RecurringExpense, 'ix_recurring_user_seq'),
+                         (Budget, 'ix_budget_user_seq'), (ExpenseArchive, 'ix_expense_archive_user_seq'), (IncomeArchive, 'ix_income_archive_user_seq')):
+        add_column(conn, model, 'updated_seq')
+        create_index(conn, model, index)
+    db.metadata.create_all(conn, tables=[Tombstone.__table__])
+
+def _rebuild_autoincrement(conn, model):
+    # SQLite reuses the highest rowid after it's deleted (archived) unless the table is
+    # AUTOINCREMENT, which takes a rebuild: rename, create from the model, copy, drop.
+    # Live rows that already took an archived row's id get a new one.
+    table, archive = model.__table__, ARCHIVE_OF[model].__table__
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :n"), {'n': table.name}).scalar()
+    if 'AUTOINCREMENT' in (sql or '').upper(): return
+    columns = ', '.join(f'"{c.name}"' for c in table.c if c.name in {c['name'] for c in inspect(conn).get_columns(table.name)})
+    conn.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{table.name}_old"'))
+    for index in table.indexes:
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index.name}"'))
+    table.create(conn)
+    clash = f'id IN (SELECT id FROM "{archive.name}")'
+    conn.execute(text(f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "{table.name}_old" WHERE NOT {clash}'))
+    # Next id: past everything ever handed out, archived rows included
+    top = conn.execute(text(f'SELECT max(id) FROM (SELECT id FROM "{table.name}_old" UNION ALL SELECT id FROM "{archive.name}")')).scalar() or 0
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :n"), {'n': table.name})
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:n, :s)"), {'n': table.name, 's': top})
+    renumbered = conn.execute(text(f'SELECT count(*) FROM "{table.name}_old" WHERE {clash}')).scalar()
+    if renumbered:
+        others = ', '.join(name for name in columns.split(', ') if name != '"id"')
+        conn.execute(text(f'INSERT INTO "{table.name}" ({others}) SELECT {others} FROM "{table.name}_old" WHERE {clash} ORDER BY id'))
+        print(f"   - {table.name}: {renumbered} rows shared an id with an archived row and got a new one")
+    conn.execute(text(f'DROP TABLE "{table.name}_old"'))  # Takes the old search triggers with it
+    return renumbered
+
+def autoincrement_ids(conn):
+    # Postgres sequences never hand out an id twice; nothing to do there
+    if conn.dialect.name != 'sqlite': return
+    from search import create_search_index
+    for model in ARCHIVE_OF:
+        renumbered = _rebuild_autoincrement(conn, model)
+        if model is Expense and renumbered is not None:
+            create_search_index(conn)  # Triggers on the new table
+            if renumbered: conn.execute(text("INSERT INTO expense_fts(expense_fts) VALUES ('rebuild')"))
+
+def export_job_started_at(conn):
+    # Jobs already running when this lands have none; their timeout counts from created_at
+    add_column(conn, ExportJob, 'started_at')
+
+MIGRATIONS = [
+    (1, 'create tables', create_tables),
+    (2, 'date columns as DATE', date_columns),
+    (3, 'columns and indexes added before versioning', columns_and_indexes),
+    (4, 'backfill monthly summaries', backfill_summaries),
+    (5, 'backfill platform counters', backfill_platform_counters),
+    (6, 'expense full-text search index', expense_search_index),
+    (7, 'archive tables for old transactions', archive_tables),
+    (8, 'change tracking for delta sync', sync_tracking),
+    (9, 'never reuse transaction ids (SQLite)', autoincrement_ids),
+    (10, 'export job start time', export_job_started_at),
+]
+
+# ==========================================
+# RUNNER
+# ==========================================
+
+def applied_versions():
+    conn = db.session.connection()
+    schema_version.create(conn, checkfirst=True)
+    return {row.version for row in conn.execute(select(schema_version.c.version))}
+
+def upgrade(log=print):
+    # Returns the versions it applied. Data migrations use db.session, which runs
+    # on the same connection/transaction as the DDL.
+    done = applied_versions()
+    db.session.commit()
+    applied = []
+    for version, name, migration in MIGRATIONS:
+        if version in done: continue
+        conn = db.session.connection()
+        if conn.dialect.name == 'postgresql':
+            # Two deploys racing: the second waits here, then sees the version is taken
+            conn.execute(text('SELECT pg_advisory_xact_lock(7405532)'))
+            conn.execute(text('SET LOCAL statement_timeout = 0'))  # DB_STATEMENT_TIMEOUT_MS is for requests, not backfills
+            if conn.execute(select(schema_version.c.version).where(schema_version.c.version == version)).first():
+                db.session.commit(); continue
+        log(f"   - {version}: {name}")
+        try:
+            migration(conn)
+            conn.execute(schema_version.insert().values(version=version, name=name, applied_at=datetime.datetime.utcnow()))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--status', action='store_true', help='list migrations and exit')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        try:
+            if args.status:
+                done = applied_versions()
+                for version, name, _ in MIGRATIONS:
+                    print(f"   {'[x]' if version in done else '[ ]'} {version}: {name}")
+            else:
+                applied = upgrade()
+                print(f"\n✅ SUCCESS: Database is at version {MIGRATIONS[-1][0]} ({len(applied)} migrations applied).\n")
+        except Exception as e:
+            print(f"\n❌ ERROR: Migration failed. Reason: {e}\n")
+            raise SystemExit(1)  # Fail the deploy step
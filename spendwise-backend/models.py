@@ -1,11 +1,16 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from replica import RoutingSession
 
 # Initialize the Database Manager
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})  # Sends @read_only GETs to the replica (replica.py)
 
 # 1. User Table
 class User(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_type_id', 'user_type', 'id'),
+        db.Index('ix_user_joined_at', 'joined_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False) # Critical for Email Features
@@ -13,6 +18,11 @@ class User(db.Model):
     user_type = db.Column(db.String(20), default='individual')
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_admin = db.Column(db.Boolean, default=False)
+    # Bumped on every change to the user's transactions (cache keys, export artifacts)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    data_updated_at = db.Column(db.DateTime)
+    # Bumped on password change/reset; tokens carrying an older 'ver' stop working
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationships (Link data to user)
     expenses = db.relationship('Expense', backref='user', lazy=True)
@@ -23,39 +33,67 @@ class User(db.Model):
 
 # 2. Expense Table
 class Expense(db.Model):
+    __table_args__ = (
+        db.Index('ix_expense_user_date', 'user_id', 'date'),
+        db.Index('ix_expense_user_category_date', 'user_id', 'category', 'date'),
+        db.Index('ix_expense_user_seq', 'user_id', 'updated_seq'),
+        {'sqlite_autoincrement': True},  # Never reuse an id, even one that now lives in the archive
+    )
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Float, nullable=False)
     category = db.Column(db.String(50), nullable=False)
-    date = db.Column(db.String(10), nullable=False) # YYYY-MM-DD
+    date = db.Column(db.Date, nullable=False) # YYYY-MM-DD
     payment_method = db.Column(db.String(50))
     description = db.Column(db.String(200))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # data_version of the write that last touched the row (delta sync, see sync.py)
+    updated_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 # 3. Income Table
 class Income(db.Model):
+    __table_args__ = (
+        db.Index('ix_income_user_date', 'user_id', 'date'),
+        db.Index('ix_income_user_seq', 'user_id', 'updated_seq'),
+        {'sqlite_autoincrement': True},
+    )
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Float, nullable=False)
     source = db.Column(db.String(50), nullable=False)
-    date = db.Column(db.String(10), nullable=False)
+    date = db.Column(db.Date, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    updated_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 # 4. Budget Table
 class Budget(db.Model):
+    __table_args__ = (
+        db.Index('ix_budget_user_month', 'user_id', 'month'),
+        db.Index('ix_budget_user_seq', 'user_id', 'updated_seq'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     category = db.Column(db.String(50), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     month = db.Column(db.String(7), nullable=False) # YYYY-MM
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    updated_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 # 5. Recurring/Subscriptions Table
 class RecurringExpense(db.Model):
+    __table_args__ = (
+        db.Index('ix_recurring_due', 'next_due_date', 'id'),
+        db.Index('ix_recurring_user', 'user_id'),
+        db.Index('ix_recurring_user_seq', 'user_id', 'updated_seq'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(100), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     category = db.Column(db.String(50))
     frequency = db.Column(db.String(20), default='monthly')
-    next_due_date = db.Column(db.String(10), nullable=False)
+    next_due_date = db.Column(db.Date, nullable=False) # YYYY-MM-DD
+    # Set while a materializer process owns the row (see recurring.py)
+    claim_token = db.Column(db.String(32))
+    claimed_until = db.Column(db.DateTime)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    updated_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 # 6. Emergency Fund Table
 class EmergencyFund(db.Model):
@@ -68,8 +106,129 @@ class EmergencyFund(db.Model):
     
 # 7. Feedback Table (Admin use)
 class Feedback(db.Model):
+    __table_args__ = (
+        db.Index('ix_feedback_user', 'user_username'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_username = db.Column(db.String(80))
     rating = db.Column(db.Integer)
     message = db.Column(db.Text)
-    date = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    date = db.Column(db.DateTime, default=datetime.utcnow)
+# 8. Monthly Summary Table (per-user rollup, read by dashboard & trends)
+# One row per (user, month, category). Income rows use their source as the category.
+class MonthlySummary(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'month', 'category', name='uq_summary_user_month_category'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), nullable=False) # YYYY-MM
+    category = db.Column(db.String(50), nullable=False)
+    income_total = db.Column(db.Float, nullable=False, default=0.0)
+    income_count = db.Column(db.Integer, nullable=False, default=0)
+    expense_total = db.Column(db.Float, nullable=False, default=0.0)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+# 9. Export Job Table (background PDF reports)
+class ExportJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True) # uuid4 hex
+    format = db.Column(db.String(10), nullable=False, default='pdf')
+    params = db.Column(db.String(200), nullable=False, default='{}') # JSON: from/to
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued, running, done, failed
+    data_version = db.Column(db.Integer, nullable=False)
+    cache_key = db.Column(db.String(120), nullable=False, index=True)
+    file_path = db.Column(db.String(300))
+    error = db.Column(db.String(300))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime) # when a worker picked it up
+    finished_at = db.Column(db.DateTime)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+
+# 10. Email Outbox Table (requests enqueue, the mail dispatcher sends)
+class EmailOutbox(db.Model):
+    __table_args__ = (
+        db.Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending') # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32))
+    claimed_at = db.Column(db.DateTime)
+    last_error = db.Column(db.String(300))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+# 11. Import Batch Table (idempotency for POST /api/import)
+class ImportBatch(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_import_user_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(100), nullable=False)
+    result = db.Column(db.Text) # JSON response of the original request
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+# 12. Platform Counters (admin stats without scanning users/expenses/feedback)
+# Each counter is split over a few shard rows so concurrent writers don't all
+# queue on one row lock; readers add the shards up (see platform_stats.py).
+class PlatformCounter(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('name', 'shard', name='uq_counter_name_shard'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(40), nullable=False) # users, feedback, expense_volume, expense_count
+    shard = db.Column(db.Integer, nullable=False, default=0)
+    value = db.Column(db.Float, nullable=False, default=0.0)
+
+# 13. Daily Signups (admin signups chart)
+class DailySignup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, unique=True, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+# 14. Archived Expenses / 15. Archived Incomes (cold rows moved out by run_archive.py)
+# Same columns and ids as the live tables; reads go through archive.ledger_table().
+# Monthly summaries and platform counters keep counting these rows.
+class ExpenseArchive(db.Model):
+    __table_args__ = (
+        db.Index('ix_expense_archive_user_date', 'user_id', 'date'),
+        db.Index('ix_expense_archive_user_seq', 'user_id', 'updated_seq'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    amount = db.Column(db.Float, nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    payment_method = db.Column(db.String(50))
+    description = db.Column(db.String(200))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    updated_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+class IncomeArchive(db.Model):
+    __table_args__ = (
+        db.Index('ix_income_archive_user_date', 'user_id', 'date'),
+        db.Index('ix_income_archive_user_seq', 'user_id', 'updated_seq'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    amount = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(50), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    updated_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+# 16. Tombstones (delta sync): one row per deleted expense / subscription, so
+# /api/sync can tell clients what went away since their last sync
+class Tombstone(db.Model):
+    __table_args__ = (
+        db.Index('ix_tombstone_user_seq', 'user_id', 'seq'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    resource = db.Column(db.String(20), nullable=False) # expense, recurring, ...
+    row_id = db.Column(db.Integer, nullable=False)
+    seq = db.Column(db.Integer, nullable=False) # data_version of the delete
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -0,0 +1,79 @@
+import base64
+import json
+from flask import request, current_app
+from sqlalchemy import or_, and_
+from models import db
+from dates import parse_date
+
+# ==========================================
+# KEYSET PAGINATION HELPERS
+# ==========================================
+# Listings are ordered newest first by (date, id) and paged with an opaque
+# cursor holding the last row's sort key, so page N costs the same as page 1
+# (no OFFSET) and only `limit` rows are ever materialized per request.
+
+def encode_cursor(*values):
+    raw = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    # Raises ValueError on anything that isn't one of our cursors
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def page_size():
+    default = current_app.config.get('PAGE_SIZE_DEFAULT', 100)
+    maximum = current_app.config.get('PAGE_SIZE_MAX', 500)
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+def parse_fields(allowed, default):
+    # ?fields=id,amount,date -> ['id', 'amount', 'date'] (validated against `allowed`)
+    raw = request.args.get('fields')
+    if not raw: return list(default)
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown: raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def after_cursor(date_col, id_col, cursor):
+    # WHERE (date, id) < (cursor_date, cursor_id), spelled out so every backend can use the index
+    try:
+        last_date, last_id = decode_cursor(cursor)
+        last_date, last_id = parse_date(last_date), int(last_id)
+    except (TypeError, ValueError, IndexError): raise ValueError('Invalid cursor')
+    return or_(date_col < last_date, and_(date_col == last_date, id_col < last_id))
+
+def keyset_page(table, fields, filters, cursor=None, limit=100):
+    # `table`: a table or the live+archive union (archive.ledger_table), filters are on its columns.
+    # Selects only the requested columns (+ date/id for the cursor).
+    # Returns (row tuples in `fields` order, next_cursor or None); dates stay dates.
+    columns = list(dict.fromkeys(fields + ['date', 'id']))
+    query = db.session.query(*[table.c[c] for c in columns]).filter(*filters)
+    if cursor:
+        query = query.filter(after_cursor(table.c.date, table.c.id, cursor))
+    rows = query.order_by(table.c.date.desc(), table.c.id.desc()).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1][columns.index('date')], rows[-1][columns.index('id')]) if has_more else None
+    return [tuple(row)[:len(fields)] for row in rows], next_cursor
+
+def id_page(query, id_col, cursor=None, limit=100):
+    # Newest first by primary key alone (admin listings). Returns (rows, next_cursor or None).
+    if cursor:
+        try: last_id = int(decode_cursor(cursor)[0])
+        except (TypeError, IndexError): raise ValueError('Invalid cursor')
+        query = query.filter(id_col < last_id)
+    rows = query.order_by(id_col.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].id) if has_more else None
+
+def prefix_match(column, prefix):
+    # The range lets a plain B-tree index on the column do the work (LIKE 'x%' can't use
+    # one on SQLite, or on Postgres outside the C collation); LIKE keeps the match exact.
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return and_(column >= prefix, column < prefix + '\uffff', column.like(escaped + '%', escape='\\'))
@@ -0,0 +1,151 @@
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+try:
+    import argon2  # Optional: only needed for PASSWORD_HASH_METHOD=argon2...
+    from argon2.exceptions import VerificationError, InvalidHashError
+except ImportError:
+    argon2 = None
+
+# ==========================================
+# PASSWORD HASHING
+# ==========================================
+# Hashing is slow on purpose, so it doesn't run on the request thread: every
+# hash/verify goes to a pool of PASSWORD_HASH_WORKERS (one per core by default).
+# hashlib's pbkdf2/scrypt and argon2-cffi release the GIL, so plain threads use
+# every core; PASSWORD_HASH_POOL=process is there for hashers that don't.
+#
+# A job that waited in the queue longer than PASSWORD_HASH_MAX_WAIT is dropped
+# without hashing and the request gets a 503 (HashingBusy): under a login storm
+# the pool keeps answering the requests it can still answer in time instead of
+# working through a backlog nobody is waiting for any more.
+#
+# PASSWORD_HASH_METHOD sets the algorithm and its cost:
+#   pbkdf2:sha256:600000       werkzeug pbkdf2 ('pbkdf2:sha256' = werkzeug's default iterations)
+#   scrypt:32768:8:1           werkzeug scrypt (n, r, p)
+#   argon2 / argon2:3:65536:4  argon2id (time cost, memory KiB, parallelism), needs argon2-cffi
+# Hashes stored with any other setting still verify, and are re-hashed with the
+# current one on the next successful login, so cost goes up (or down) without a reset.
+
+log = logging.getLogger('spendwise.passwords')
+
+class HashingBusy(Exception):
+    # The job waited too long for a worker; answered with 503
+    pass
+
+_executor = None
+_executor_lock = threading.Lock()
+_stats = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'rejected': 0}
+_stats_lock = threading.Lock()
+
+def _pool(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = app.config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1
+            if app.config.get('PASSWORD_HASH_POOL') == 'process':
+                _executor = ProcessPoolExecutor(max_workers=workers)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='passwords')
+    return _executor
+
+def _count(name):
+    with _stats_lock: _stats[name] += 1
+
+def hashing_stats():
+    with _stats_lock: return dict(_stats)
+
+# ==========================================
+# METHODS (also run inside pool processes: module-level, config passed in)
+# ==========================================
+
+def canonical_method(method):
+    # The method prefix werkzeug stores in front of the hash ('pbkdf2:sha256:1000000$salt$...'),
+    # with defaults filled in, so a stored hash can be compared with the configured method
+    name, *args = method.split(':')
+    if name == 'pbkdf2':
+        if len(args) > 2: raise ValueError("'pbkdf2' takes a hash name and an iteration count")
+        return f"pbkdf2:{args[0] if args else 'sha256'}:{int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS}"
+    if name == 'scrypt':
+        if args and len(args) != 3: raise ValueError("'scrypt' takes n, r and p")
+        n, r, p = (int(a) for a in args) if args else (2**15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    if name == 'argon2':
+        if argon2 is None: raise ValueError("'argon2' needs the argon2-cffi package")
+        if args and len(args) != 3: raise ValueError("'argon2' takes time cost, memory (KiB) and parallelism")
+        return method
+    raise ValueError(f"Unknown password hash method '{method}'")
+
+@functools.lru_cache(maxsize=None)
+def _argon2_hasher(method):
+    args = [int(a) for a in method.split(':')[1:]]
+    if not args: return argon2.PasswordHasher()
+    return argon2.PasswordHasher(time_cost=args[0], memory_cost=args[1], parallelism=args[2])
+
+def _hash(method, password):
+    if method.startswith('argon2'): return _argon2_hasher(method).hash(password)
+    return generate_password_hash(password, method=method)
+
+def _verify(stored, password):
+    if stored.startswith('$argon2'):
+        if argon2 is None:
+            log.error("argon2 hash found but argon2-cffi isn't installed")
+            return False
+        try: return _argon2_hasher('argon2').verify(stored, password)  # Parameters come from the hash
+        except (VerificationError, InvalidHashError): return False
+    return check_password_hash(stored, password)
+
+def _run(queued_at, max_wait, func, *args):
+    if time.time() - queued_at > max_wait: raise HashingBusy()
+    return func(*args)
+
+def _submit(func, *args):
+    app = current_app._get_current_object()
+    if app.config.get('PASSWORD_HASH_POOL') == 'off': return func(*args)
+    future = _pool(app).submit(_run, time.time(), app.config.get('PASSWORD_HASH_MAX_WAIT', 2.0), func, *args)
+    try:
+        return future.result()
+    except HashingBusy:
+        _count('rejected')
+        raise
+
+# ==========================================
+# PUBLIC API
+# ==========================================
+
+def hash_password(password):
+    method = canonical_method(current_app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256'))
+    _count('hashed')
+    return _submit(_hash, method, password)
+
+def verify_password(stored, password):
+    _count('verified')
+    return _submit(_verify, stored, password)
+
+def needs_rehash(stored):
+    method = canonical_method(current_app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256'))
+    if method.startswith('argon2'):
+        return not stored.startswith('$argon2') or _argon2_hasher(method).check_needs_rehash(stored)
+    return stored.split('$', 1)[0] != method
+
+def verify_and_update(user, password):
+    # Login: True if the password matches. A hash stored with other settings is replaced
+    # on the user object (the caller commits); if the pool is busy by then, it waits for next time.
+    if not verify_password(user.password_hash, password): return False
+    if needs_rehash(user.password_hash):
+        try:
+            user.password_hash = hash_password(password)
+            _count('rehashed')
+        except HashingBusy:
+            pass
+    return True
+
+def init_passwords(app):
+    # Fail at startup on a typo in PASSWORD_HASH_METHOD, not on the first login
+    canonical_method(app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256'))
@@ -0,0 +1,75 @@
+import datetime
+import random
+from sqlalchemy import update, delete, func
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Expense, Feedback, PlatformCounter, DailySignup
+from archive import ledger_table
+
+# ==========================================
+# PLATFORM-WIDE COUNTERS (admin stats)
+# ==========================================
+# Maintained in the same session as the write that changes them (callers
+# commit), so /api/admin/stats reads a handful of rows instead of counting
+# every user and summing every expense. recount_stats.py rebuilds them from
+# the raw tables if they ever drift (or after upgrading an existing database).
+
+COUNTER_SHARDS = 16
+COUNTERS = ('users', 'feedback', 'expense_volume', 'expense_count')
+
+def _increment(model, key, values, new_row):
+    # Same pattern as the monthly summaries: increment in SQL, insert on a miss,
+    # and if someone else inserted first, increment their row.
+    bump = update(model).where(*key).values(**values).execution_options(synchronize_session=False)
+    if db.session.execute(bump).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(new_row)
+    except IntegrityError:
+        db.session.execute(bump)
+
+def bump_counter(name, amount, shard_key=None):
+    # shard_key (e.g. the user id) keeps one writer on one shard; otherwise pick any
+    shard = (shard_key if shard_key is not None else random.randrange(COUNTER_SHARDS)) % COUNTER_SHARDS
+    _increment(PlatformCounter, (PlatformCounter.name == name, PlatformCounter.shard == shard),
+               {'value': PlatformCounter.value + amount}, PlatformCounter(name=name, shard=shard, value=amount))
+
+def record_signup(day=None):
+    day = day or datetime.datetime.utcnow().date()
+    bump_counter('users', 1)
+    _increment(DailySignup, (DailySignup.day == day,), {'count': DailySignup.count + 1}, DailySignup(day=day, count=1))
+
+def record_feedback():
+    bump_counter('feedback', 1)
+
+def record_expenses(user_id, amount, count):
+    # Called by summaries.py on every expense write (count is negative on delete)
+    bump_counter('expense_volume', amount, user_id)
+    bump_counter('expense_count', count, user_id)
+
+def totals():
+    values = dict(db.session.query(PlatformCounter.name, func.sum(PlatformCounter.value)).group_by(PlatformCounter.name).all())
+    return {name: values.get(name) or 0 for name in COUNTERS}
+
+def signups(days=30):
+    since = datetime.datetime.utcnow().date() - datetime.timedelta(days=days - 1)
+    rows = db.session.query(DailySignup.day, DailySignup.count).filter(DailySignup.day >= since).order_by(DailySignup.day).all()
+    return [{'date': day.isoformat(), 'count': count} for day, count in rows]
+
+def recount():
+    # Full rebuild from the raw tables (the one place that still scans them).
+    # Writes that commit while this runs can be missed, so run it at a quiet time.
+    expenses = ledger_table(Expense)  # Live + archived
+    volume, expense_count = db.session.query(func.sum(expenses.c.amount), func.count(expenses.c.id)).one()
+    values = {'users': User.query.count(), 'feedback': Feedback.query.count(),
+              'expense_volume': volume or 0.0, 'expense_count': expense_count}
+    db.session.execute(delete(PlatformCounter))
+    db.session.execute(PlatformCounter.__table__.insert(), [{'name': n, 'shard': 0, 'value': v} for n, v in values.items()])
+
+    day = func.date(User.joined_at)
+    per_day = db.session.query(day, func.count(User.id)).filter(User.joined_at.isnot(None)).group_by(day).all()
+    db.session.execute(delete(DailySignup))
+    if per_day:
+        db.session.execute(DailySignup.__table__.insert(),
+                           [{'day': d if isinstance(d, datetime.date) else datetime.date.fromisoformat(d), 'count': n} for d, n in per_day])
+    return values
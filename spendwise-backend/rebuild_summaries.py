@@ -0,0 +1,32 @@
+import sys
+from app import app
+from models import db, User
+from summaries import rebuild_for_users
+
+# Rebuilds the MonthlySummary rollup from the raw Expense/Income tables.
+# Use it once after deploying the summary table (backfill), or whenever the
+# totals look off. Runs in chunks of users, one commit per chunk.
+#   python rebuild_summaries.py            -> every user
+#   python rebuild_summaries.py alice bob  -> only these usernames
+
+CHUNK_SIZE = 500
+
+if __name__ == "__main__":
+    with app.app_context():
+        try:
+            query = db.session.query(User.id).order_by(User.id)
+            if len(sys.argv) > 1:
+                query = query.filter(User.username.in_(sys.argv[1:]))
+            last_id, users, rows = 0, 0, 0
+            while True:
+                ids = [r[0] for r in query.filter(User.id > last_id).limit(CHUNK_SIZE).all()]
+                if not ids: break
+                rows += rebuild_for_users(ids)
+                db.session.commit()
+                users += len(ids)
+                last_id = ids[-1]
+                print(f"   - rebuilt {users} users so far")
+            print(f"\n✅ SUCCESS: Rebuilt {rows} summary rows for {users} users.\n")
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ ERROR: Could not rebuild summaries. Reason: {e}\n")
@@ -0,0 +1,29 @@
+import argparse
+import time
+from app import app
+from models import db
+from platform_stats import recount
+
+# Rebuilds the platform counters behind /api/admin/stats (users, feedback,
+# expense volume/count, signups per day) from the raw tables.
+# Run it once after upgrading an existing database, then periodically
+# (e.g. nightly cron) to correct any drift:
+#   python recount_stats.py              -> once
+#   python recount_stats.py --loop 86400 -> keep running, once a day
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--loop', type=int, metavar='SECONDS', help='repeat forever with this pause')
+    args = parser.parse_args()
+
+    with app.app_context():
+        while True:
+            try:
+                values = recount()
+                db.session.commit()
+                print(f"\n✅ SUCCESS: Platform counters rebuilt: {values}\n")
+            except Exception as e:
+                db.session.rollback()
+                print(f"\n❌ ERROR: Could not rebuild the counters. Reason: {e}\n")
+            if not args.loop: break
+            time.sleep(args.loop)
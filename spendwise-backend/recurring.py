@@ -0,0 +1,131 @@
+import calendar
+import datetime
+import uuid
+from collections import defaultdict
+from sqlalchemy import update, insert, or_, bindparam
+from models import db, Expense, RecurringExpense
+from summaries import record_bulk
+from versions import bump_data_versions
+
+# ==========================================
+# RECURRING EXPENSE MATERIALIZER
+# ==========================================
+# Turns due subscriptions into Expense rows and moves next_due_date forward,
+# catching up on every period that was missed. Works through ALL users in
+# batches read off the (next_due_date, id) index, so memory is bounded by the
+# batch size, not by the number of subscriptions.
+#
+# Several processes can run it at the same time: each batch is claimed with a
+# token (conditional UPDATE, plus FOR UPDATE SKIP LOCKED on Postgres), and a
+# claim expires after a lease in case its process dies. Expenses, summary and
+# the advanced due date are committed together, so a crash never double-books;
+# and that transaction first re-checks the claim, so a batch that outlived its
+# lease (and was taken over by another process) books nothing.
+
+FREQUENCIES = ('daily', 'weekly', 'biweekly', 'monthly', 'quarterly', 'yearly')
+
+def add_months_clamped(d, n):
+    # Jan 31 + 1 month -> Feb 28/29, like a bank would do it
+    total = d.year * 12 + (d.month - 1) + n
+    year, month = total // 12, total % 12 + 1
+    return datetime.date(year, month, min(d.day, calendar.monthrange(year, month)[1]))
+
+MONTH_STEPS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+DAY_STEPS = {'daily': 1, 'weekly': 7, 'biweekly': 14}
+
+def occurrence(start, frequency, n):
+    # n-th occurrence counted from `start` (not chained), so a subscription due on
+    # the 31st comes back to the 31st after a short month instead of drifting to the 28th
+    if frequency in DAY_STEPS: return start + datetime.timedelta(days=DAY_STEPS[frequency] * n)
+    return add_months_clamped(start, MONTH_STEPS.get(frequency, 1) * n)  # unknown -> monthly
+
+def due_dates(next_due, frequency, today, max_periods):
+    # Every occurrence up to today, plus the new next_due_date.
+    # After max_periods we stop booking and just skip ahead (e.g. a daily sub left alone for years).
+    dates, n, d = [], 0, next_due
+    while d <= today:
+        if len(dates) < max_periods: dates.append(d)
+        n += 1
+        d = occurrence(next_due, frequency, n)
+    return dates, d
+
+def _claim(today, batch_size, lease_seconds):
+    now = datetime.datetime.utcnow()
+    unclaimed = or_(RecurringExpense.claim_token.is_(None), RecurringExpense.claimed_until < now)
+    query = db.session.query(RecurringExpense.id) \
+        .filter(RecurringExpense.next_due_date <= today, unclaimed) \
+        .order_by(RecurringExpense.next_due_date, RecurringExpense.id).limit(batch_size)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        query = query.with_for_update(skip_locked=True)
+    ids = [r[0] for r in query.all()]
+    if not ids:
+        db.session.commit()
+        return None, []
+
+    token = uuid.uuid4().hex
+    db.session.execute(update(RecurringExpense).where(RecurringExpense.id.in_(ids), unclaimed)
+                       .values(claim_token=token, claimed_until=now + datetime.timedelta(seconds=lease_seconds))
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+    rows = db.session.query(RecurringExpense.id, RecurringExpense.user_id, RecurringExpense.description, RecurringExpense.amount,
+                            RecurringExpense.category, RecurringExpense.frequency, RecurringExpense.next_due_date) \
+        .filter(RecurringExpense.claim_token == token).all()
+    return token, rows
+
+def materialize_batch(today, batch_size=1000, lease_seconds=600, max_periods=400):
+    # Processes one claimed batch. Returns (subscriptions handled, expenses created).
+    token, rows = _claim(today, batch_size, lease_seconds)
+    if not rows: return 0, 0
+
+    # Still ours? Renewing the lease write-locks the rows we own (the whole database on SQLite)
+    # until the commit below, so nobody can take them over in between
+    db.session.execute(update(RecurringExpense).where(RecurringExpense.claim_token == token)
+                       .values(claimed_until=datetime.datetime.utcnow() + datetime.timedelta(seconds=lease_seconds))
+                       .execution_options(synchronize_session=False))
+    owned = {r[0] for r in db.session.query(RecurringExpense.id).filter(RecurringExpense.claim_token == token)}
+    claimed, rows = len(rows), [r for r in rows if r.id in owned]
+    if not rows:
+        db.session.commit()
+        return claimed, 0  # Not (0, 0): that would end materialize_due with subscriptions still due
+
+    expenses, per_user, advanced = [], defaultdict(list), []
+    for r in rows:
+        dates, next_due = due_dates(r.next_due_date, r.frequency, today, max_periods)
+        for d in dates:
+            expense = {'amount': r.amount, 'category': r.category or 'Subscriptions', 'date': d,
+                       'description': r.description, 'payment_method': 'Recurring', 'user_id': r.user_id}
+            expenses.append(expense)
+            per_user[r.user_id].append(expense)
+        advanced.append({'rid': r.id, 'next_due': next_due})
+
+    # Every owner's version goes up (their subscriptions' next_due_date moves); new rows and
+    # advanced subscriptions carry it for delta sync
+    versions = bump_data_versions({r.user_id for r in rows})
+    for expense in expenses: expense['updated_seq'] = versions[expense['user_id']]
+    for item, r in zip(advanced, rows): item['seq'] = versions[r.user_id]
+    for start in range(0, len(expenses), 1000):
+        db.session.execute(insert(Expense), expenses[start:start + 1000])
+    for user_id, user_expenses in per_user.items():
+        record_bulk(user_id, user_expenses)
+
+    # Advance and release in one executemany
+    table = RecurringExpense.__table__
+    db.session.execute(table.update().where(table.c.id == bindparam('rid'), table.c.claim_token == token)
+                       .values(next_due_date=bindparam('next_due'), updated_seq=bindparam('seq'), claim_token=None, claimed_until=None), advanced)
+    db.session.commit()
+    return len(rows), len(expenses)
+
+def materialize_due(today=None, batch_size=1000, lease_seconds=600, max_periods=400, log=print):
+    today = today or datetime.date.today()
+    total_subs = total_expenses = 0
+    while True:
+        try:
+            subs, created = materialize_batch(today, batch_size, lease_seconds, max_periods)
+        except Exception:
+            db.session.rollback()
+            raise
+        if not subs: break
+        total_subs += subs
+        total_expenses += created
+        log(f"   - {total_subs} subscriptions processed, {total_expenses} expenses created")
+    return total_subs, total_expenses
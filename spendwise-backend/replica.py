@@ -0,0 +1,47 @@
+import datetime
+from functools import wraps
+from flask import request, current_app, has_request_context
+from flask_sqlalchemy.session import Session
+
+# ==========================================
+# READ-REPLICA ROUTING
+# ==========================================
+# With DATABASE_REPLICA_URL set, @read_only GET routes run their queries on the
+# 'replica' bind; everything else, and any write/flush even inside those routes,
+# stays on the primary. Without a replica configured this is all a no-op.
+#
+# Read-your-writes: for REPLICA_STICKY_SECONDS after a user's last write
+# (User.data_updated_at, carried by the cached user) their reads stay on the
+# primary, so they never see their own change missing. With USER_CACHE_BACKEND=local
+# and several processes, a process holding an older cached copy of the user can't
+# know about the write for up to USER_CACHE_TTL; use the redis backend if that matters.
+
+REPLICA_FLAG = 'spendwise.use_replica'
+
+class RoutingSession(Session):
+    # The flag is set on the request by @read_only, so it also covers streamed bodies
+    # (stream_with_context runs them in a fresh app context, with a fresh session).
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and request.environ.get(REPLICA_FLAG) and not self._flushing \
+                and not getattr(clause, 'is_dml', False) and not getattr(clause, 'is_ddl', False):
+            replica = self._db.engines.get('replica')
+            if replica is not None: return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def wrote_recently(user):
+    window = current_app.config.get('REPLICA_STICKY_SECONDS', 30)
+    return user.data_updated_at is not None and \
+        (datetime.datetime.utcnow() - user.data_updated_at).total_seconds() < window
+
+def read_only(f):
+    # Goes right under @token_required (auth itself always reads the primary)
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        if request.method == 'GET' and not wrote_recently(current_user):
+            request.environ[REPLICA_FLAG] = True
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+def use_primary():
+    # For the parts of a @read_only route that must see the latest state (e.g. export job rows)
+    request.environ.pop(REPLICA_FLAG, None)
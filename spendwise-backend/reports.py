@@ -0,0 +1,104 @@
+import io
+from xml.sax.saxutils import escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from models import db, Expense, Income
+from archive import ledger_table
+from dates import month_key
+
+# ==========================================
+# PDF REPORT BUILDER
+# ==========================================
+# Runs on the export worker pool (see jobs.py), never on a request thread.
+# Layout: summary by month, then Income and Expenses tables with a
+# subtotal row after each month.
+
+BATCH_SIZE = 1000
+
+def _money(amount):
+    return f"Rs.{amount:,.2f}"
+
+def _style(subtotal_rows, last_row):
+    style = [
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#bdc3c7')),
+    ]
+    for row in subtotal_rows:
+        style += [('FONTNAME', (0, row), (-1, row), 'Helvetica-Bold'), ('BACKGROUND', (0, row), (-1, row), colors.HexColor('#ecf0f1'))]
+    if last_row:
+        style += [('FONTNAME', (0, last_row), (-1, last_row), 'Helvetica-Bold'), ('BACKGROUND', (0, last_row), (-1, last_row), colors.HexColor('#d5dbdb'))]
+    return TableStyle(style)
+
+def _section(query, header, to_cells, month_totals):
+    # Streams rows out of the query and inserts a subtotal row whenever the month changes
+    rows, subtotal_rows = [header], []
+    current, subtotal, total = None, 0.0, 0.0
+    for record in query.yield_per(BATCH_SIZE):
+        month = month_key(record.date)
+        if current and month != current:
+            subtotal_rows.append(len(rows))
+            rows.append([f"Subtotal {current}"] + [''] * (len(header) - 2) + [_money(subtotal)])
+            subtotal = 0.0
+        current = month
+        subtotal += record.amount
+        total += record.amount
+        month_totals[month] = month_totals.get(month, 0.0) + record.amount
+        rows.append(to_cells(record))
+    if current:
+        subtotal_rows.append(len(rows))
+        rows.append([f"Subtotal {current}"] + [''] * (len(header) - 2) + [_money(subtotal)])
+    rows.append(['Total'] + [''] * (len(header) - 2) + [_money(total)])
+    return rows, subtotal_rows, total
+
+def _filters(t, user_id, start, end):
+    filters = [t.c.user_id == user_id]
+    if start: filters.append(t.c.date >= start)
+    if end: filters.append(t.c.date <= end)
+    return filters
+
+def build_pdf(user_id, username, start=None, end=None):
+    inc, exp = ledger_table(Income, user_id, start), ledger_table(Expense, user_id, start)  # + archive if the range reaches it
+    incomes = db.session.query(inc.c.date, inc.c.source, inc.c.amount) \
+        .filter(*_filters(inc, user_id, start, end)).order_by(inc.c.date, inc.c.id)
+    expenses = db.session.query(exp.c.date, exp.c.category, exp.c.description, exp.c.payment_method, exp.c.amount) \
+        .filter(*_filters(exp, user_id, start, end)).order_by(exp.c.date, exp.c.id)
+
+    income_by_month, expense_by_month = {}, {}
+    income_rows, income_subtotals, income_total = _section(
+        incomes, ['Date', 'Source', 'Amount'],
+        lambda r: [r.date.isoformat(), r.source, _money(r.amount)], income_by_month)
+    expense_rows, expense_subtotals, expense_total = _section(
+        expenses, ['Date', 'Category', 'Description', 'Payment', 'Amount'],
+        lambda r: [r.date.isoformat(), r.category, (r.description or '')[:40], r.payment_method or '', _money(r.amount)], expense_by_month)
+
+    summary_rows = [['Month', 'Income', 'Expenses', 'Net']]
+    for month in sorted(set(income_by_month) | set(expense_by_month)):
+        inc, exp = income_by_month.get(month, 0.0), expense_by_month.get(month, 0.0)
+        summary_rows.append([month, _money(inc), _money(exp), _money(inc - exp)])
+    summary_rows.append(['Total', _money(income_total), _money(expense_total), _money(income_total - expense_total)])
+
+    styles = getSampleStyleSheet()
+    period = f"{start.isoformat() if start else 'beginning'} to {end.isoformat() if end else 'today'}"
+    story = [
+        Paragraph(f"SpendWise Report - {escape(username)}", styles['Title']),  # Paragraph text is markup; table cells are plain
+        Paragraph(f"Period: {escape(period)}", styles['Normal']),
+        Spacer(1, 12),
+        Paragraph("Summary", styles['Heading2']),
+        Table(summary_rows, repeatRows=1, style=_style([], len(summary_rows) - 1)),
+        Spacer(1, 12),
+        Paragraph("Income", styles['Heading2']),
+        Table(income_rows, repeatRows=1, style=_style(income_subtotals, len(income_rows) - 1)),
+        Spacer(1, 12),
+        Paragraph("Expenses", styles['Heading2']),
+        Table(expense_rows, repeatRows=1, style=_style(expense_subtotals, len(expense_rows) - 1)),
+    ]
+
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=letter, title=f"SpendWise Report - {username}").build(story)
+    return buffer.getvalue()
@@ -1,38 +1,62 @@
-import csv
-import io
-from flask import send_file, make_response
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from flask import send_file, Response, stream_with_context
 from flask import Blueprint, request, jsonify, current_app
-from models import db, User, Expense, Income, Budget, RecurringExpense, EmergencyFund, Feedback
-from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import func
-from extensions import mail  # Import mail engine
-from flask_mail import Message
+from models import db, User, Expense, Income, Budget, RecurringExpense, EmergencyFund, Feedback, MonthlySummary, ExportJob, ImportBatch
+from sqlalchemy import func, and_, or_
+from sqlalchemy.exc import IntegrityError
+from dates import parse_date, parse_month, add_months, month_key, current_month, bucket_start, GRANULARITIES
+from summaries import record_expense, record_income
+from pagination import keyset_page, page_size, parse_fields, id_page, prefix_match
+from serialization import row_shape, rows_response
+from exports import csv_lines, gzip_stream
+from jobs import submit_export, build_now, expire_if_stuck, job_to_dict
+from versions import bump_data_version
+from mailer import queue_email, outbox_stats
+from auth_cache import user_cache
+from importer import parse_csv, parse_json, import_rows
+from recurring import FREQUENCIES
+from conditional import conditional_get, data_stamp
+from cache import cached_response, response_cache
+from replica import read_only, use_primary
+from search import search_expenses
+from archive import ledger_table, find_row
+from batch import BATCH_AUTH, parse_batch, run_batch
+from sync import changes_since, record_deletion, StaleToken
+from passwords import hash_password, verify_password, verify_and_update, hashing_stats, HashingBusy
+from analytics import build_series, METRICS, GROUP_BY
+from insights import ledger_cache, compute_insights
+from instrumentation import render_metrics
+from platform_stats import record_signup, record_feedback, totals, signups
 import jwt
 import datetime
+import hashlib
+import json
 from functools import wraps
 
 
 main = Blueprint('main', __name__)
 
+# The password hashing pool is backed up (passwords.py): tell the client to retry shortly
+@main.errorhandler(HashingBusy)
+def hashing_busy(e):
+    response = jsonify({'error': 'Server is busy, please try again'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 # ==========================================
 # 1. SECURITY & UTILS
 # ==========================================
 
-# Helper to send email without crashing if it fails
-def send_async_email(subject, recipient, body):
-    try:
-        msg = Message(subject, recipients=[recipient])
-        msg.body = body
-        mail.send(msg)
-    except Exception as e:
-        print(f"Email Error: {e}")
-
 # Decorator to protect routes
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
+        # Inside /api/batch: the batch already checked the token
+        claims = request.environ.get(BATCH_AUTH)
+        if claims is not None:
+            current_user = user_cache.load(claims['user_id'], claims['ver'])
+            if current_user is None: return jsonify({'error': 'Token is invalid!'}), 401
+            return f(current_user, *args, **kwargs)
+
         token = None
         if 'Authorization' in request.headers:
             auth_header = request.headers['Authorization']
@@ -44,13 +68,24 @@ def token_required(f):
         
         try:
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = User.query.filter_by(id=data['user_id']).first()
         except:
             return jsonify({'error': 'Token is invalid!'}), 401
+
+        # Served from the user cache; only a miss (or a revoked token) touches the DB
+        current_user = user_cache.load(data.get('user_id'), data.get('ver', 0))
+        if current_user is None:
+            return jsonify({'error': 'Token is invalid!'}), 401
             
         return f(current_user, *args, **kwargs)
     return decorated
 
+def issue_token(user):
+    return jwt.encode({
+        'user_id': user.id,
+        'ver': user.token_version or 0,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)
+    }, current_app.config['SECRET_KEY'], algorithm="HS256")
+
 # ==========================================
 # 2. AUTHENTICATION & REGISTRATION
 # ==========================================
@@ -64,7 +99,7 @@ def register():
     if User.query.filter_by(email=data.get('email')).first():
         return jsonify({'error': 'Email already exists'}), 400
 
-    hashed_password = generate_password_hash(data.get('password'), method='pbkdf2:sha256')
+    hashed_password = hash_password(data.get('password'))
     
     new_user = User(
         username=data.get('username'),
@@ -77,14 +112,15 @@ def register():
     
     db.session.add(new_user)
     db.session.add(fund)
-    db.session.commit()
+    record_signup()
     
-    # [EMAIL TRIGGER 1] Welcome Email
-    send_async_email(
+    # [EMAIL TRIGGER 1] Welcome Email (queued in the same transaction as the user)
+    queue_email(
         "Welcome to SpendWise", 
         new_user.email, 
         f"Hi {new_user.username},\n\nWelcome to SpendWise! Your account has been successfully created.\nStart tracking your expenses today!"
     )
+    db.session.commit()
     
     return jsonify({'message': 'User created successfully'}), 201
 
@@ -93,13 +129,11 @@ def login():
     data = request.get_json()
     user = User.query.filter_by(username=data.get('username')).first()
     
-    if not user or not check_password_hash(user.password_hash, data.get('password')):
+    if not user or not verify_and_update(user, data.get('password')):
         return jsonify({'error': 'Invalid username or password'}), 401
+    if user in db.session.dirty: db.session.commit()  # Hash re-done with the current PASSWORD_HASH_METHOD
         
-    token = jwt.encode({
-        'user_id': user.id,
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)
-    }, current_app.config['SECRET_KEY'], algorithm="HS256")
+    token = issue_token(user)
     
     return jsonify({
         'message': 'Login successful',
@@ -142,11 +176,12 @@ def forgot_password():
         # ... rest of the code ...
         
         # [EMAIL TRIGGER 2] Reset Link
-        send_async_email(
+        queue_email(
             "SpendWise Password Reset", 
             email, 
             f"Hi {user.username},\n\nClick the link below to reset your password:\n{link}\n\nThis link expires in 15 minutes."
         )
+        db.session.commit()
 
     return jsonify({'message': 'If registered, you will receive a reset link.'})
 
@@ -157,18 +192,22 @@ def reset_password():
         payload = jwt.decode(data.get('token'), current_app.config['SECRET_KEY'], algorithms=["HS256"])
         user = User.query.filter_by(id=payload['user_id']).first()
         if user:
-            user.password_hash = generate_password_hash(data.get('new_password'), method='pbkdf2:sha256')
-            db.session.commit()
+            user.password_hash = hash_password(data.get('new_password'))
+            user.token_version = (user.token_version or 0) + 1  # Log out every existing session
             
             # [EMAIL TRIGGER] Confirmation
-            send_async_email(
+            queue_email(
                 "Password Changed Successfully", 
                 user.email, 
                 "Your SpendWise password has been reset successfully."
             )
+            db.session.commit()
+            user_cache.invalidate(user.id)
             
             return jsonify({'message': 'Password reset successful'})
         return jsonify({'error': 'User not found'}), 404
+    except HashingBusy:
+        raise  # 503, not a bad token
     except:
         return jsonify({'error': 'Invalid or expired token'}), 400
 
@@ -178,16 +217,27 @@ def reset_password():
 
 @main.route('/api/dashboard', methods=['GET'])
 @token_required
+@read_only
+@conditional_get
+@cached_response
 def get_dashboard(current_user):
-    month_str = request.args.get('month', datetime.datetime.now().strftime('%Y-%m'))
+    try: month_str = month_key(parse_month(request.args.get('month', current_month())))
+    except ValueError: return jsonify({'error': 'Invalid month'}), 400
     
-    total_income = db.session.query(func.sum(Income.amount)).filter(Income.user_id == current_user.id, Income.date.like(f'{month_str}%')).scalar() or 0
-    total_expenses = db.session.query(func.sum(Expense.amount)).filter(Expense.user_id == current_user.id, Expense.date.like(f'{month_str}%')).scalar() or 0
+    # Totals and the category split come from the monthly rollup: one indexed read of a few rows
+    summary = MonthlySummary.query.filter_by(user_id=current_user.id, month=month_str).all()
+    total_income = sum(s.income_total for s in summary if s.income_count > 0)
+    total_expenses = sum(s.expense_total for s in summary if s.expense_count > 0)
     
-    recent = Expense.query.filter_by(user_id=current_user.id).order_by(Expense.date.desc()).limit(5).all()
-    recent_data = [{'id': e.id, 'category': e.category, 'amount': e.amount, 'date': e.date, 'description': e.description} for e in recent]
+    recent = Expense.query.filter_by(user_id=current_user.id).order_by(Expense.date.desc(), Expense.id.desc()).limit(5).all()
+    if len(recent) < 5:  # Quiet account: the rest may be in the archive
+        t = ledger_table(Expense, current_user.id)
+        if t is not Expense.__table__:
+            recent = db.session.query(t.c.id, t.c.category, t.c.amount, t.c.date, t.c.description) \
+                .filter(t.c.user_id == current_user.id).order_by(t.c.date.desc(), t.c.id.desc()).limit(5).all()
+    recent_data = [{'id': e.id, 'category': e.category, 'amount': e.amount, 'date': e.date.isoformat(), 'description': e.description} for e in recent]
     
-    cat_query = db.session.query(Expense.category, func.sum(Expense.amount)).filter(Expense.user_id == current_user.id, Expense.date.like(f'{month_str}%')).group_by(Expense.category).all()
+    cat_query = [(s.category, s.expense_total) for s in summary if s.expense_count > 0]
     category_data = [{'category': c[0], 'amount': c[1], 'percentage': round((c[1]/total_expenses*100),1)} for c in cat_query] if total_expenses > 0 else []
 
     return jsonify({
@@ -201,135 +251,342 @@ def get_dashboard(current_user):
 
 @main.route('/api/analytics/monthly', methods=['GET'])
 @token_required
+@read_only
+@conditional_get
+@cached_response
 def get_monthly_trends(current_user):
-    # 1. Get Data from DB
-    incomes = db.session.query(func.substr(Income.date, 1, 7).label('month'), func.sum(Income.amount)).filter_by(user_id=current_user.id).group_by('month').all()
-    expenses = db.session.query(func.substr(Expense.date, 1, 7).label('month'), func.sum(Expense.amount)).filter_by(user_id=current_user.id).group_by('month').all()
-    
-    # 2. Convert DB data to Dictionary
-    data_map = {}
-    all_months = set()
-    
-    for i in incomes: 
-        data_map[i[0]] = {'month': i[0], 'income': i[1], 'expenses': 0}
-        all_months.add(i[0])
-        
-    for e in expenses:
-        if e[0] not in data_map: data_map[e[0]] = {'month': e[0], 'income': 0, 'expenses': 0}
-        data_map[e[0]]['expenses'] = e[1]
-        all_months.add(e[0])
-
-    # 3. Smart Date Logic (Fill empty months)
-    # If no data, start from Today. If data exists (even future), start from the latest data point.
-    if not all_months:
-        latest_date = datetime.date.today()
-    else:
-        # Find the latest month in your data (e.g., "2025-12")
-        sorted_months = sorted(list(all_months))
-        latest_str = sorted_months[-1]
-        # Robust parsing for YYYY-MM
-        year, month = map(int, latest_str.split('-'))
-        latest_date = datetime.date(year, month, 1)
-        
-        # If your data is old, make sure we at least show up to today
-        today = datetime.date.today()
-        if latest_date < datetime.date(today.year, today.month, 1):
-            latest_date = today
-
-    # 4. Generate the last 12 months backwards from the latest date
-    final_result = []
-    curr_year = latest_date.year
-    curr_month = latest_date.month
-    
-    for _ in range(12):
-        key = f"{curr_year}-{curr_month:02d}"
-        
-        if key in data_map:
-            final_result.append(data_map[key])
-        else:
-            final_result.append({'month': key, 'income': 0, 'expenses': 0})
-            
-        # Move back one month
-        curr_month -= 1
-        if curr_month == 0:
-            curr_month = 12
-            curr_year -= 1
-
-    # 5. Return sorted chronologically (Oldest -> Newest)
-    return jsonify(final_result[::-1])
+    # 1. Smart Date Logic
+    # If no data, end at Today. If data exists (even future), end at the latest data point.
+    # MAX(month) per user is a single seek on the summary's (user_id, month, category) key.
+    today = datetime.date.today()
+    latest_date = datetime.date(today.year, today.month, 1)
+    latest = db.session.query(func.max(MonthlySummary.month)).filter(MonthlySummary.user_id == current_user.id).scalar()
+    if latest and parse_month(latest) > latest_date:
+        latest_date = parse_month(latest)
+
+    # 2. The 12-month window ending there, gaps filled with zeros (analytics.build_series)
+    data = build_series(current_user.id, 'month', add_months(latest_date, -11), latest_date, ['income', 'expense'])
+    income, expenses = data['series'][0]['values'], data['series'][1]['values']
+
+    # 3. Sorted chronologically (Oldest -> Newest)
+    return jsonify([{'month': b[:7], 'income': i, 'expenses': e} for b, i, e in zip(data['buckets'], income, expenses)])
+
+# Time series for charts, any range and granularity, one request per chart:
+#   /api/analytics/series?granularity=week&from=2024-01-01&to=2026-10-31&metrics=income,expense,net&group_by=category&top=8
+#   -> {granularity, from, to, buckets: [bucket start dates], series: [{metric, group, total, values: [one per bucket]}]}
+# The range is widened to whole buckets (weeks start on Monday). With group_by, income and
+# expense get one series per group (category/source = expense category + income source,
+# payment_method = expenses only), the top N by total plus "(other)"; net is always the overall total.
+@main.route('/api/analytics/series', methods=['GET'])
+@token_required
+@read_only
+@conditional_get
+@cached_response
+def analytics_series(current_user):
+    granularity = request.args.get('granularity', 'month')
+    metrics = [m.strip() for m in request.args.get('metrics', ','.join(METRICS)).split(',') if m.strip()]
+    group_by = request.args.get('group_by') or None
+    if granularity not in GRANULARITIES: return jsonify({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    if not metrics or set(metrics) - set(METRICS): return jsonify({'error': f"metrics must be from {', '.join(METRICS)}"}), 400
+    if group_by and group_by not in GROUP_BY: return jsonify({'error': f"group_by must be one of {', '.join(GROUP_BY)}"}), 400
+    top = max(1, min(request.args.get('top', 10, type=int), current_app.config.get('SERIES_MAX_GROUPS', 50)))
+    try:
+        last = parse_date(request.args['to']) if request.args.get('to') else datetime.date.today()
+        # Default: the last 12 buckets
+        first = parse_date(request.args['from']) if request.args.get('from') else None
+        if first is None:
+            first = bucket_start(last, granularity)
+            for _ in range(11): first = bucket_start(first - datetime.timedelta(days=1), granularity)
+        return jsonify(build_series(current_user.id, granularity, first, last, metrics, group_by, top,
+                                    current_app.config.get('SERIES_MAX_BUCKETS', 3700)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+# Everything the insights screen shows, from one in-memory snapshot of the user's ledger:
+#   /api/analytics/insights?months=12&as_of=2026-10-18
+#   -> pivot (category x month, income source x month), rolling 3/6/12-month averages of completed
+#      months (overall + per category), projection of the current month, anomalies (single
+#      transactions far above their category's usual amount, categories running hot this month)
+@main.route('/api/analytics/insights', methods=['GET'])
+@token_required
+@read_only
+@conditional_get
+@cached_response
+def analytics_insights(current_user):
+    months = max(1, min(request.args.get('months', 12, type=int), current_app.config.get('INSIGHTS_MAX_MONTHS', 36)))
+    try:
+        as_of = parse_date(request.args['as_of']) if request.args.get('as_of') else datetime.date.today()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    snapshot = ledger_cache.snapshot(current_user.id, data_stamp(current_user.id)[0])
+    return jsonify(compute_insights(snapshot, as_of, months))
 
 # ==========================================
 # 5. TRANSACTIONS & BUDGETS
 # ==========================================
 
+EXPENSE_FIELDS = ['id', 'amount', 'category', 'date', 'description', 'payment_method']
+INCOME_FIELDS = ['id', 'amount', 'source', 'date']
+
+# Shared GET path for /api/expenses and /api/income:
+#   ?limit=100&cursor=<X-Next-Cursor>&from=YYYY-MM-DD&to=YYYY-MM-DD&category=Food&fields=id,amount,date&shape=rows
+# Body stays a plain JSON array (or {fields, rows} with shape=rows, see serialization.py);
+# the next page's cursor goes in the X-Next-Cursor header.
+def list_transactions(current_user, model, allowed_fields, default_fields, filter_args):
+    try:
+        fields = parse_fields(allowed_fields, default_fields)
+        start = parse_date(request.args['from']) if request.args.get('from') else None
+        table = ledger_table(model, current_user.id, start)  # Reads the archive too if the range reaches it
+        filters = [table.c.user_id == current_user.id]
+        if start: filters.append(table.c.date >= start)
+        if request.args.get('to'): filters.append(table.c.date <= parse_date(request.args['to']))
+        for arg in filter_args:
+            if request.args.get(arg): filters.append(table.c[arg] == request.args[arg])
+        shape = row_shape()
+        rows, next_cursor = keyset_page(table, fields, filters, request.args.get('cursor'), page_size())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    response = rows_response(fields, rows, shape)
+    if next_cursor: response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
 @main.route('/api/expenses', methods=['GET', 'POST'])
 @token_required
+@read_only
+@conditional_get
 def handle_expenses(current_user):
     if request.method == 'POST':
         data = request.get_json()
-        db.session.add(Expense(amount=data['amount'], category=data['category'], date=data['date'], payment_method=data.get('payment_method'), description=data.get('description'), user_id=current_user.id))
+        try: date = parse_date(data['date'])
+        except ValueError: return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+        expense = Expense(amount=data['amount'], category=data['category'], date=date, payment_method=data.get('payment_method'), description=data.get('description'), user_id=current_user.id)
+        expense.updated_seq = bump_data_version(current_user.id)
+        db.session.add(expense)
+        record_expense(expense)
         db.session.commit()
         return jsonify({'message': 'Expense added'}), 201
-    exps = Expense.query.filter_by(user_id=current_user.id).order_by(Expense.date.desc()).all()
-    return jsonify([{'id': e.id, 'amount': e.amount, 'category': e.category, 'date': e.date, 'description': e.description} for e in exps])
+    return list_transactions(current_user, Expense, EXPENSE_FIELDS, ['id', 'amount', 'category', 'date', 'description'], ['category', 'payment_method'])
 
 @main.route('/api/expenses/<int:id>', methods=['DELETE'])
 @token_required
 def delete_expense(current_user, id):
-    exp = Expense.query.filter_by(id=id, user_id=current_user.id).first()
-    if exp: db.session.delete(exp); db.session.commit()
+    _, exp = find_row(Expense, current_user.id, id)  # Live or archived
+    if exp:
+        db.session.delete(exp); record_expense(exp, sign=-1)
+        record_deletion(current_user.id, 'expense', id, bump_data_version(current_user.id))
+        db.session.commit()
     return jsonify({'message': 'Deleted'})
 
+# Full-text search, best matches first, then newest (see search.py):
+#   /api/expenses/search?q=groc uber&from=2026-01-01&to=2026-06-30&min_amount=100&max_amount=5000&category=Food&limit=50&cursor=<X-Next-Cursor>
+# Every word must match the start of a word in the category, description or payment method.
+# Same body shape as /api/expenses, plus an integer 'score' per row: +2 per word found in
+# the category, +1 per word found in the description (0 = payment method only).
+@main.route('/api/expenses/search', methods=['GET'])
+@token_required
+@read_only
+@conditional_get
+def search_expense_list(current_user):
+    try:
+        fields = parse_fields(EXPENSE_FIELDS, ['id', 'amount', 'category', 'date', 'description', 'payment_method'])
+        start = parse_date(request.args['from']) if request.args.get('from') else None
+        end = parse_date(request.args['to']) if request.args.get('to') else None
+        min_amount = float(request.args['min_amount']) if request.args.get('min_amount') else None
+        max_amount = float(request.args['max_amount']) if request.args.get('max_amount') else None
+        category = request.args.get('category')
+        def filters(t):
+            conditions = []
+            if start: conditions.append(t.c.date >= start)
+            if end: conditions.append(t.c.date <= end)
+            if min_amount is not None: conditions.append(t.c.amount >= min_amount)
+            if max_amount is not None: conditions.append(t.c.amount <= max_amount)
+            if category: conditions.append(t.c.category == category)
+            return conditions
+        items, next_cursor = search_expenses(current_user.id, request.args.get('q'), fields, filters, start,
+                                             request.args.get('cursor'), page_size())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    response = jsonify(items)
+    if next_cursor: response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
 @main.route('/api/income', methods=['GET', 'POST'])
 @token_required
+@read_only
+@conditional_get
 def handle_income(current_user):
     if request.method == 'POST':
         data = request.get_json()
-        db.session.add(Income(amount=data['amount'], source=data['source'], date=data['date'], user_id=current_user.id))
+        try: date = parse_date(data['date'])
+        except ValueError: return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+        income = Income(amount=data['amount'], source=data['source'], date=date, user_id=current_user.id)
+        income.updated_seq = bump_data_version(current_user.id)
+        db.session.add(income)
+        record_income(income)
         db.session.commit()
         return jsonify({'message': 'Income added'}), 201
-    incs = Income.query.filter_by(user_id=current_user.id).order_by(Income.date.desc()).all()
-    return jsonify([{'id': i.id, 'amount': i.amount, 'source': i.source, 'date': i.date} for i in incs])
+    return list_transactions(current_user, Income, INCOME_FIELDS, INCOME_FIELDS, ['source'])
+
+def import_format(upload):
+    # 'csv' or 'json': the uploaded file's type, then its extension, then the request's Content-Type
+    if upload:
+        mimetype, name = upload.mimetype or '', (upload.filename or '').lower()
+        if 'json' in mimetype: return 'json'
+        if 'csv' in mimetype: return 'csv'
+        if name.endswith('.json'): return 'json'
+        return 'csv'  # .csv, or no telling: CSV is what the export produces
+    return 'csv' if 'csv' in (request.content_type or '') else 'json'
+
+# Bulk import: CSV in the /api/export/csv format, or JSON rows
+# [{"type": "expense", "amount": 12.5, "category": "Food", "date": "2026-10-01", ...}],
+# as the body (text/csv or application/json) or a multipart 'file' (its type or extension decides).
+# An Idempotency-Key header (default: hash of the body) makes retries and re-uploads safe.
+# ?atomic=1 -> insert nothing if any row is invalid.
+@main.route('/api/import', methods=['POST'])
+@token_required
+def import_transactions(current_user):
+    upload = request.files.get('file')
+    raw = upload.read() if upload else request.get_data()
+    if not raw: return jsonify({'error': 'Nothing to import'}), 400
+    key = request.headers.get('Idempotency-Key') or hashlib.sha256(raw).hexdigest()
+
+    previous = ImportBatch.query.filter_by(user_id=current_user.id, idempotency_key=key).first()
+    if previous: return jsonify({**json.loads(previous.result), 'replayed': True})
+
+    try:
+        if import_format(upload) == 'csv':
+            rows = parse_csv(raw.decode('utf-8-sig'))
+        else:
+            rows = parse_json(json.loads(raw))
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Could not parse upload: {e}'}), 400
+    if len(rows) > current_app.config.get('IMPORT_MAX_ROWS', 50000):
+        return jsonify({'error': f"Too many rows (max {current_app.config.get('IMPORT_MAX_ROWS', 50000)}), split the file"}), 413
+
+    # Claim the key first: a concurrent retry with the same key waits on / fails this unique row
+    batch = ImportBatch(user_id=current_user.id, idempotency_key=key)
+    db.session.add(batch)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        previous = ImportBatch.query.filter_by(user_id=current_user.id, idempotency_key=key).first()
+        if previous and previous.result: return jsonify({**json.loads(previous.result), 'replayed': True})
+        return jsonify({'error': 'This import is already in progress'}), 409
+
+    atomic = request.args.get('atomic') in ('1', 'true')
+    result = import_rows(current_user.id, rows, current_app.config.get('IMPORT_CHUNK_SIZE', 1000), atomic)
+    if atomic and result['error_count']:
+        db.session.rollback()
+        return jsonify(result), 400
+    batch.result = json.dumps(result)
+    db.session.commit()
+    return jsonify({**result, 'idempotency_key': key}), 201 if result['inserted'] else 200
 
 @main.route('/api/budget', methods=['GET', 'POST'])
 @token_required
+@read_only
+@conditional_get
 def handle_budget(current_user):
     if request.method == 'POST':
         data = request.get_json()
         existing = Budget.query.filter_by(user_id=current_user.id, category=data['category'], month=data['month']).first()
-        if existing: existing.amount = data['amount']
-        else: db.session.add(Budget(category=data['category'], amount=data['amount'], month=data['month'], user_id=current_user.id))
+        seq = bump_data_version(current_user.id)
+        if existing: existing.amount = data['amount']; existing.updated_seq = seq
+        else: db.session.add(Budget(category=data['category'], amount=data['amount'], month=data['month'], user_id=current_user.id, updated_seq=seq))
         db.session.commit()
         return jsonify({'message': 'Budget set'}), 201
-    month = request.args.get('month', datetime.datetime.now().strftime('%Y-%m'))
+    month = request.args.get('month', current_month())
     buds = Budget.query.filter_by(user_id=current_user.id, month=month).all()
     return jsonify([{'category': b.category, 'amount': b.amount, 'month': b.month} for b in buds])
 
+# Budget vs actual for every (month, category) budget in [first, last] in ONE query:
+# Budget LEFT JOIN the monthly rollup on (user, month, category). No per-budget SUM.
+def budget_vs_actual(user_id, first, last):
+    actual = func.coalesce(MonthlySummary.expense_total, 0)
+    return db.session.query(Budget.month, Budget.category, Budget.amount, actual) \
+        .outerjoin(MonthlySummary, and_(MonthlySummary.user_id == Budget.user_id, MonthlySummary.month == Budget.month, MonthlySummary.category == Budget.category)) \
+        .filter(Budget.user_id == user_id, Budget.month >= first, Budget.month <= last) \
+        .order_by(Budget.month, Budget.category).all()
+
+def budget_entry(category, budgeted, actual):
+    return {'category': category, 'budgeted': budgeted, 'actual': actual, 'status': 'over' if actual > budgeted else 'under'}
+
+def budget_totals(entries):
+    budgeted = sum(e['budgeted'] for e in entries)
+    actual = sum(e['actual'] for e in entries)
+    return {'budgeted': budgeted, 'actual': actual, 'status': 'over' if actual > budgeted else 'under'}
+
+MAX_BUDGET_MONTHS = 120
+
 @main.route('/api/budget-analysis', methods=['GET'])
 @token_required
+@read_only
+@conditional_get
+@cached_response
 def budget_analysis(current_user):
-    month = request.args.get('month', datetime.datetime.now().strftime('%Y-%m'))
-    budgets = Budget.query.filter_by(user_id=current_user.id, month=month).all()
-    analysis = []
-    for b in budgets:
-        spent = db.session.query(func.sum(Expense.amount)).filter(Expense.user_id == current_user.id, Expense.category == b.category, Expense.date.like(f'{month}%')).scalar() or 0
-        analysis.append({'category': b.category, 'budgeted': b.amount, 'actual': spent, 'status': 'over' if spent > b.amount else 'under'})
-    return jsonify(analysis)
+    # Old single-month shape: ?month=YYYY-MM -> [{category, budgeted, actual, status}]
+    if not request.args.get('from') and not request.args.get('to'):
+        try: month = month_key(parse_month(request.args.get('month', current_month())))
+        except ValueError: return jsonify({'error': 'Invalid month, expected YYYY-MM'}), 400
+        return jsonify([budget_entry(c, b, a) for _, c, b, a in budget_vs_actual(current_user.id, month, month)])
+
+    # Range shape: ?from=2026-01&to=2026-10 -> per-month breakdown + range totals + year-to-date
+    try:
+        first = parse_month(request.args.get('from') or request.args['to'])
+        last = parse_month(request.args.get('to') or request.args['from'])
+    except ValueError:
+        return jsonify({'error': 'Invalid month, expected YYYY-MM'}), 400
+    if first > last:
+        return jsonify({'error': "'from' must not be after 'to'"}), 400
+    months = [month_key(add_months(first, i)) for i in range((last.year - first.year) * 12 + last.month - first.month + 1)]
+    if len(months) > MAX_BUDGET_MONTHS:
+        return jsonify({'error': f'Range too long (max {MAX_BUDGET_MONTHS} months)'}), 400
+
+    # One round trip covers both the requested range and January..'to' for the YTD figures
+    ytd_start = month_key(datetime.date(last.year, 1, 1))
+    rows = budget_vs_actual(current_user.id, min(months[0], ytd_start), months[-1])
+
+    by_month = {m: [] for m in months}
+    range_cats, ytd_cats = {}, {}
+    for month, category, budgeted, actual in rows:
+        if month in by_month:
+            by_month[month].append(budget_entry(category, budgeted, actual))
+            total = range_cats.setdefault(category, [0, 0])
+            total[0] += budgeted; total[1] += actual
+        if month >= ytd_start:
+            total = ytd_cats.setdefault(category, [0, 0])
+            total[0] += budgeted; total[1] += actual
+
+    range_entries = [budget_entry(c, b, a) for c, (b, a) in sorted(range_cats.items())]
+    ytd_entries = [budget_entry(c, b, a) for c, (b, a) in sorted(ytd_cats.items())]
+    return jsonify({
+        'from': months[0],
+        'to': months[-1],
+        'months': [{'month': m, 'categories': entries, **budget_totals(entries)} for m, entries in by_month.items()],
+        'range_totals': {'categories': range_entries, **budget_totals(range_entries)},
+        'year_to_date': {'from': ytd_start, 'to': months[-1], 'categories': ytd_entries, **budget_totals(ytd_entries)},
+    })
 
 @main.route('/api/recurring', methods=['GET', 'POST', 'DELETE'])
 @main.route('/api/recurring/<int:id>', methods=['DELETE'])
 @token_required
+@conditional_get
 def handle_recurring(current_user, id=None):
     if request.method == 'POST':
         data = request.get_json()
-        db.session.add(RecurringExpense(description=data['description'], amount=data['amount'], category=data['category'], frequency=data['frequency'], next_due_date=data['next_due_date'], user_id=current_user.id))
+        if data.get('frequency', 'monthly') not in FREQUENCIES: return jsonify({'error': f"frequency must be one of {', '.join(FREQUENCIES)}"}), 400
+        try: next_due = parse_date(data['next_due_date'])
+        except ValueError: return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+        db.session.add(RecurringExpense(description=data['description'], amount=data['amount'], category=data['category'], frequency=data.get('frequency', 'monthly'), next_due_date=next_due, user_id=current_user.id,
+                                        updated_seq=bump_data_version(current_user.id)))
         db.session.commit(); return jsonify({'message': 'Added'}), 201
     if request.method == 'DELETE':
         rec = RecurringExpense.query.filter_by(id=id, user_id=current_user.id).first()
-        if rec: db.session.delete(rec); db.session.commit()
+        if rec: db.session.delete(rec); record_deletion(current_user.id, 'recurring', id, bump_data_version(current_user.id)); db.session.commit()
         return jsonify({'message': 'Deleted'})
     recs = RecurringExpense.query.filter_by(user_id=current_user.id).all()
-    return jsonify([{'id': r.id, 'description': r.description, 'amount': r.amount, 'next_due_date': r.next_due_date, 'frequency': r.frequency} for r in recs])
+    return jsonify([{'id': r.id, 'description': r.description, 'amount': r.amount, 'next_due_date': r.next_due_date.isoformat(), 'frequency': r.frequency} for r in recs])
 
 # ==========================================
 # 6. EMERGENCY FUND & PROFILE
@@ -337,12 +594,14 @@ def handle_recurring(current_user, id=None):
 
 @main.route('/api/emergency-fund', methods=['GET', 'PUT'])
 @token_required
+@conditional_get
 def handle_fund(current_user):
     fund = EmergencyFund.query.filter_by(user_id=current_user.id).first()
     if not fund: fund = EmergencyFund(user_id=current_user.id); db.session.add(fund); db.session.commit()
     if request.method == 'PUT':
         data = request.get_json()
         for k, v in data.items(): setattr(fund, k, v)
+        bump_data_version(current_user.id)
         db.session.commit(); return jsonify({'message': 'Fund updated'})
     return jsonify({'target_amount': fund.target_amount, 'current_amount': fund.current_amount, 'alert_threshold': fund.alert_threshold, 'monthly_goal': fund.monthly_goal, 'progress_percentage': round((fund.current_amount/fund.target_amount*100), 1) if fund.target_amount > 0 else 0})
 
@@ -350,28 +609,34 @@ def handle_fund(current_user):
 @token_required
 def update_profile(current_user):
     data = request.get_json()
-    if 'username' in data: current_user.username = data['username']
-    if 'email' in data: current_user.email = data['email']
-    if 'user_type' in data: current_user.user_type = data['user_type']
-    db.session.commit(); return jsonify({'message': 'Profile updated'})
+    user = db.session.get(User, current_user.id)
+    if 'username' in data: user.username = data['username']
+    if 'email' in data: user.email = data['email']
+    if 'user_type' in data: user.user_type = data['user_type']
+    db.session.commit(); user_cache.invalidate(user.id)
+    return jsonify({'message': 'Profile updated'})
 
 @main.route('/api/user/password', methods=['PUT'])
 @token_required
 def update_password(current_user):
     data = request.get_json()
-    if not check_password_hash(current_user.password_hash, data['current_password']): return jsonify({'error': 'Incorrect current password'}), 401
+    user = db.session.get(User, current_user.id)
+    if not verify_password(user.password_hash, data['current_password']): return jsonify({'error': 'Incorrect current password'}), 401
     
-    current_user.password_hash = generate_password_hash(data['new_password'], method='pbkdf2:sha256')
-    db.session.commit()
+    user.password_hash = hash_password(data['new_password'])
+    user.token_version = (user.token_version or 0) + 1  # Other sessions are logged out
     
     # [EMAIL TRIGGER 3] Password Change Alert
-    send_async_email(
+    queue_email(
         "Security Alert: Password Changed", 
-        current_user.email, 
-        f"Hi {current_user.username},\n\nYour password was just changed. If this wasn't you, please contact support immediately."
+        user.email, 
+        f"Hi {user.username},\n\nYour password was just changed. If this wasn't you, please contact support immediately."
     )
+    db.session.commit()
+    user_cache.invalidate(user.id)
     
-    return jsonify({'message': 'Password updated'})
+    # This session keeps going with a fresh token
+    return jsonify({'message': 'Password updated', 'access_token': issue_token(user)})
 
 # ==========================================
 # 7. ADMIN & FEEDBACK
@@ -382,67 +647,179 @@ def update_password(current_user):
 def submit_feedback(current_user):
     data = request.get_json()
     db.session.add(Feedback(user_username=current_user.username, rating=data['rating'], message=data['message']))
+    record_feedback()
     db.session.commit(); return jsonify({'message': 'Feedback received'})
 
 @main.route('/api/admin/stats', methods=['GET'])
 @token_required
+@read_only
 def admin_stats(current_user):
     if not current_user.is_admin: return jsonify({'error': 'Unauthorized'}), 403
-    return jsonify({'total_users': User.query.count(), 'total_volume': db.session.query(func.sum(Expense.amount)).scalar() or 0, 'total_feedback': Feedback.query.count()})
+    # Maintained counters (platform_stats.py), not COUNT/SUM over the whole tables
+    stats = totals()
+    return jsonify({'total_users': int(stats['users']), 'total_volume': stats['expense_volume'], 'total_feedback': int(stats['feedback']),
+                    'total_expenses': int(stats['expense_count']), 'signups_last_30_days': signups(30)})
+
+@main.route('/api/admin/outbox', methods=['GET'])
+@token_required
+def admin_outbox(current_user):
+    if not current_user.is_admin: return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(outbox_stats())
+
+@main.route('/api/admin/cache-stats', methods=['GET'])
+@token_required
+def admin_cache_stats(current_user):
+    if not current_user.is_admin: return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify({'responses': response_cache.stats(), 'users': user_cache.stats(), 'ledgers': ledger_cache.stats()})
+
+# Prometheus text format; scrape with the admin's bearer token
+@main.route('/api/admin/metrics', methods=['GET'])
+@token_required
+def admin_metrics(current_user):
+    if not current_user.is_admin: return jsonify({'error': 'Unauthorized'}), 403
+    body = render_metrics({'outbox': outbox_stats(), 'response_cache': response_cache.stats(), 'user_cache': user_cache.stats(),
+                           'ledger_cache': ledger_cache.stats(), 'password_hashing': hashing_stats()})
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+# Admin listings, newest first, paged with ?limit=&cursor=<X-Next-Cursor>
+#   /api/admin/users?q=ali&user_type=business&joined_from=2026-01-01&joined_to=2026-06-30
+#     q is a prefix of the username or the email (case-sensitive)
+#   /api/admin/feedback?user=ali&rating=5
+def admin_page(query, id_col, to_dict):
+    try:
+        rows, next_cursor = id_page(query, id_col, request.args.get('cursor'), page_size())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    response = jsonify([to_dict(r) for r in rows])
+    if next_cursor: response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @main.route('/api/admin/users', methods=['GET'])
 @token_required
+@read_only
 def admin_users(current_user):
     if not current_user.is_admin: return jsonify({'error': 'Unauthorized'}), 403
-    return jsonify([{'username': u.username, 'email': u.email, 'user_type': u.user_type, 'joined': u.joined_at.strftime('%Y-%m-%d'), 'is_admin': u.is_admin} for u in User.query.limit(20).all()])
+    query = db.session.query(User.id, User.username, User.email, User.user_type, User.joined_at, User.is_admin)
+    if request.args.get('q'): query = query.filter(or_(prefix_match(User.username, request.args['q']), prefix_match(User.email, request.args['q'])))
+    if request.args.get('user_type'): query = query.filter(User.user_type == request.args['user_type'])
+    try:
+        if request.args.get('joined_from'): query = query.filter(User.joined_at >= parse_date(request.args['joined_from']))
+        if request.args.get('joined_to'): query = query.filter(User.joined_at < parse_date(request.args['joined_to']) + datetime.timedelta(days=1))
+    except ValueError:
+        return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+    return admin_page(query, User.id, lambda u: {'username': u.username, 'email': u.email, 'user_type': u.user_type, 'joined': u.joined_at.strftime('%Y-%m-%d'), 'is_admin': u.is_admin})
 
 @main.route('/api/admin/feedback', methods=['GET'])
 @token_required
+@read_only
 def admin_feedback(current_user):
     if not current_user.is_admin: return jsonify({'error': 'Unauthorized'}), 403
-    return jsonify([{'user': f.user_username, 'rating': f.rating, 'message': f.message, 'date': f.date.strftime('%Y-%m-%d')} for f in Feedback.query.order_by(Feedback.date.desc()).limit(20).all()])
+    query = db.session.query(Feedback.id, Feedback.user_username, Feedback.rating, Feedback.message, Feedback.date)
+    if request.args.get('user'): query = query.filter(prefix_match(Feedback.user_username, request.args['user']))
+    if request.args.get('rating'): query = query.filter(Feedback.rating == request.args.get('rating', type=int))
+    return admin_page(query, Feedback.id, lambda f: {'user': f.user_username, 'rating': f.rating, 'message': f.message, 'date': f.date.strftime('%Y-%m-%d')})
 # ==========================================
 # EXPORT DATA (CSV & PDF)
 # ==========================================
 @main.route('/api/export/<format_type>', methods=['GET'])
 @token_required
+@read_only
 def export_data(current_user, format_type):
     try:
-        incomes = Income.query.filter_by(user_id=current_user.id).all()
-        expenses = Expense.query.filter_by(user_id=current_user.id).all()
+        start = parse_date(request.args['from']) if request.args.get('from') else None
+        end = parse_date(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
 
+    try:
         if format_type == 'csv':
-            si = io.StringIO()
-            cw = csv.writer(si)
-            cw.writerow(['Type', 'Category', 'Amount', 'Date'])
-            for i in incomes: cw.writerow(['Income', i.source, i.amount, i.date])
-            for e in expenses: cw.writerow(['Expense', e.category, e.amount, e.date])
-            
-            output = make_response(si.getvalue())
-            output.headers["Content-Disposition"] = "attachment; filename=report.csv"
-            output.headers["Content-type"] = "text/csv"
+            # Streamed straight from a server-side cursor: ?from=&to=&gzip=1
+            body = csv_lines(current_user.id, start, end)
+            if request.args.get('gzip') in ('1', 'true'):
+                output = Response(stream_with_context(gzip_stream(body)), mimetype='application/gzip')
+                output.headers["Content-Disposition"] = "attachment; filename=report.csv.gz"
+            else:
+                output = Response(stream_with_context(body), mimetype='text/csv')
+                output.headers["Content-Disposition"] = "attachment; filename=report.csv"
             return output
 
         elif format_type == 'pdf':
-            buffer = io.BytesIO()
-            p = canvas.Canvas(buffer, pagesize=letter)
-            y = 750
-            p.setFont("Helvetica-Bold", 16)
-            p.drawString(50, y, f"SpendWise Report - {current_user.username}")
-            y -= 30
-            p.setFont("Helvetica", 10)
-            
-            p.drawString(50, y, "EXPENSES:")
-            y -= 20
-            for e in expenses:
-                p.drawString(50, y, f"{e.date} | {e.category} | Rs.{e.amount}")
-                y -= 15
-                if y < 50: p.showPage(); y = 750
-            
-            p.save()
-            buffer.seek(0)
-            return send_file(buffer, as_attachment=True, download_name='report.pdf', mimetype='application/pdf')
+            # Kept for old clients; new ones should use POST /api/export/jobs.
+            # Served from the cached artifact when the data hasn't changed.
+            use_primary()  # Job rows are written here and must be read back fresh
+            job = build_now(current_user.id, 'pdf', export_params(start, end))
+            if job.status != 'done': return jsonify({'error': 'Export failed'}), 500
+            return send_file(job.file_path, as_attachment=True, download_name='report.pdf', mimetype='application/pdf')
+
+        return jsonify({'error': 'Unsupported export format'}), 400
             
     except Exception as e:
         print(e)
-        return jsonify({'error': 'Export failed'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Export failed'}), 500
+
+def export_params(start, end):
+    return {'from': start.isoformat() if start else None, 'to': end.isoformat() if end else None}
+
+# Background PDF reports:
+#   POST /api/export/jobs {"format": "pdf", "from": "2026-01-01", "to": "2026-10-31"}
+#   GET  /api/export/jobs/<id>           -> status
+#   GET  /api/export/jobs/<id>/download  -> the file, once status is 'done'
+@main.route('/api/export/jobs', methods=['POST'])
+@token_required
+def create_export_job(current_user):
+    data = request.get_json(silent=True) or {}
+    if data.get('format', 'pdf') != 'pdf': return jsonify({'error': 'Unsupported export format'}), 400
+    try:
+        start = parse_date(data['from']) if data.get('from') else None
+        end = parse_date(data['to']) if data.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+    job = submit_export(current_user.id, 'pdf', export_params(start, end))
+    return jsonify(job_to_dict(job)), 200 if job.status == 'done' else 202
+
+@main.route('/api/export/jobs/<job_id>', methods=['GET'])
+@token_required
+def export_job_status(current_user, job_id):
+    job = ExportJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job: return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_to_dict(expire_if_stuck(job)))
+
+@main.route('/api/export/jobs/<job_id>/download', methods=['GET'])
+@token_required
+def export_job_download(current_user, job_id):
+    job = ExportJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job: return jsonify({'error': 'Job not found'}), 404
+    if job.status != 'done': return jsonify({'error': f'Job is {job.status}'}), 409
+    return send_file(job.file_path, as_attachment=True, download_name='report.pdf', mimetype='application/pdf')
+
+# ==========================================
+# BATCHED REQUESTS (one round trip per page, see batch.py)
+# ==========================================
+#   POST /api/batch {"requests": [{"id": "dash", "path": "/api/dashboard"}, {"id": "fund", "path": "/api/emergency-fund"}], "parallel": true}
+@main.route('/api/batch', methods=['POST'])
+@token_required
+def batch_requests(current_user):
+    try:
+        items = parse_batch(request.get_json(silent=True), current_app.config.get('BATCH_MAX_REQUESTS', 20))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    claims = {'user_id': current_user.id, 'ver': current_user.token_version or 0}
+    return jsonify({'responses': run_batch(items, claims, parallel=bool(request.get_json().get('parallel')))})
+
+# ==========================================
+# DELTA SYNC (only what changed since the last sync, see sync.py)
+# ==========================================
+#   GET /api/sync -> first page of everything; then /api/sync?since=<next> until has_more is false
+@main.route('/api/sync', methods=['GET'])
+@token_required
+@read_only
+@conditional_get
+def sync_changes(current_user):
+    maximum = current_app.config.get('SYNC_PAGE_SIZE_MAX', 2000)
+    limit = max(1, min(request.args.get('limit', current_app.config.get('SYNC_PAGE_SIZE', 500), type=int), maximum))
+    try:
+        return jsonify(changes_since(current_user.id, request.args.get('since'), limit))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except StaleToken:
+        return jsonify({'error': 'Sync token is newer than the server data, sync again without since'}), 410
@@ -0,0 +1,29 @@
+import argparse
+import time
+from app import app
+from archive import archive_transactions, cutoff_date
+
+# Moves expenses/incomes dated more than ARCHIVE_AFTER_DAYS ago into the archive
+# tables (see archive.py). Batched by primary key, one short transaction per
+# batch, so it can run while the app is serving. Safe to run from several
+# processes at once (a row is only ever moved by one of them).
+#   python run_archive.py               -> one pass (nightly cron)
+#   python run_archive.py --loop 86400  -> keep running, once a day
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, default=app.config.get('ARCHIVE_BATCH_SIZE', 1000))
+    parser.add_argument('--pause', type=float, default=app.config.get('ARCHIVE_PAUSE_SECONDS', 0.05), help='seconds between batches')
+    parser.add_argument('--loop', type=int, metavar='SECONDS', help='repeat forever with this pause')
+    args = parser.parse_args()
+
+    with app.app_context():
+        while True:
+            days = app.config.get('ARCHIVE_AFTER_DAYS', 730)
+            try:
+                moved = archive_transactions(cutoff_date(days), args.batch_size, args.pause)
+                print(f"\n✅ SUCCESS: {sum(moved.values())} transactions older than {days} days archived.\n")
+            except Exception as e:
+                print(f"\n❌ ERROR: Archive run failed. Reason: {e}\n")
+            if not args.loop: break
+            time.sleep(args.loop)
@@ -0,0 +1,14 @@
+import time
+from app import app
+from mailer import dispatch_batch
+
+# Standalone outbox dispatcher, for deployments that set MAIL_DISPATCHER=off
+# on the web workers and run mail delivery as its own process.
+#   python run_mailer.py
+
+if __name__ == "__main__":
+    print("📬 Mail dispatcher running (Ctrl+C to stop)")
+    with app.app_context():
+        while True:
+            if not dispatch_batch(app):
+                time.sleep(app.config.get('MAIL_POLL_SECONDS', 2))
@@ -0,0 +1,31 @@
+import argparse
+import datetime
+import time
+from app import app
+from recurring import materialize_due
+
+# Books due recurring expenses for every user and advances their next_due_date.
+# Safe to run from several processes / cron hosts at once.
+#   python run_recurring.py                   -> one pass (cron)
+#   python run_recurring.py --loop 300        -> keep running, one pass every 5 minutes
+#   python run_recurring.py --date 2026-12-31 -> book everything due up to that date
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--date', help='treat this day as today (YYYY-MM-DD)')
+    parser.add_argument('--batch-size', type=int, default=app.config.get('RECURRING_BATCH_SIZE', 1000))
+    parser.add_argument('--loop', type=int, metavar='SECONDS', help='repeat forever with this pause')
+    args = parser.parse_args()
+
+    with app.app_context():
+        while True:
+            today = datetime.date.fromisoformat(args.date) if args.date else datetime.date.today()
+            try:
+                subs, created = materialize_due(today, args.batch_size,
+                                                app.config.get('RECURRING_CLAIM_LEASE_SECONDS', 600),
+                                                app.config.get('RECURRING_MAX_CATCHUP', 400))
+                print(f"\n✅ SUCCESS: {subs} subscriptions processed, {created} expenses created (up to {today}).\n")
+            except Exception as e:
+                print(f"\n❌ ERROR: Recurring run failed. Reason: {e}\n")
+            if not args.loop: break
+            time.sleep(args.loop)
@@ -0,0 +1,146 @@
+import re
+from sqlalchemy import select, table, column, literal_column, func, text, or_, and_, union_all, case
+from models import db, Expense, ExpenseArchive
+from pagination import encode_cursor, decode_cursor
+from archive import archived_through
+from dates import parse_date
+
+# ==========================================
+# FULL-TEXT SEARCH OVER EXPENSES (/api/expenses/search)
+# ==========================================
+# Index over description, category and payment_method, maintained by the
+# database itself so every writer (routes, importer, seed, recurring runner)
+# keeps it in sync without app code:
+#   SQLite   -> expense_fts, an FTS5 table with external content (rows live only
+#               in `expense`), updated by AFTER INSERT/UPDATE/DELETE triggers
+#   Postgres -> expense.search_vector, a generated tsvector column + GIN index
+#   other    -> no index; falls back to LIKE (fine for small accounts only)
+# Both are created by migrate.py (migration 6, and 7 for expense_archive, which
+# gets the same index; searches reaching back into archived dates query both).
+# Every query word matches as a prefix ("groc" finds "Groceries"), all words
+# must match.
+#
+# Ranking is a per-row score from the row's own text, not the engine's
+# relevance (bm25 / ts_rank), which depends on index-wide statistics: every
+# other user's write would shift it, and the live and archive indexes would
+# score on different scales. Each query word adds 2 if it starts a word of the
+# category, 1 if it starts a word of the description, 0 otherwise (payment
+# method only). Results come by (score desc, date desc, id desc), so cursors
+# are stable and live/archived rows merge correctly.
+
+MAX_TERMS = 8
+WORD = re.compile(r'[^\W_]+', re.UNICODE)
+
+PG_VECTOR = ("setweight(to_tsvector('simple', coalesce(category, '')), 'A') || "
+             "setweight(to_tsvector('simple', coalesce(description, '')), 'B') || "
+             "setweight(to_tsvector('simple', coalesce(payment_method, '')), 'C')")
+
+# ==========================================
+# SCHEMA (called from migrate.py)
+# ==========================================
+
+def create_search_index(conn, table='expense'):
+    dialect = conn.dialect.name
+    fts = f'{table}_fts'
+    if dialect == 'sqlite':
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"), {'n': fts}).first()
+        conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                          f"category, description, payment_method, content='{table}', content_rowid='id', "
+                          "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"))
+        new = "(NEW.id, NEW.category, NEW.description, NEW.payment_method)"
+        old = "('delete', OLD.id, OLD.category, OLD.description, OLD.payment_method)"
+        columns = "(rowid, category, description, payment_method)"
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+                          f"INSERT INTO {fts}{columns} VALUES {new}; END"))
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+                          f"INSERT INTO {fts}({fts}, rowid, category, description, payment_method) VALUES {old}; END"))
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF category, description, payment_method ON {table} BEGIN "
+                          f"INSERT INTO {fts}({fts}, rowid, category, description, payment_method) VALUES {old}; "
+                          f"INSERT INTO {fts}{columns} VALUES {new}; END"))
+        if not exists:
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))  # Index the rows already there
+    elif dialect == 'postgresql':
+        # Postgres 12+; the column fills itself for existing rows (rewrites the table once)
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({PG_VECTOR}) STORED"))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING GIN (search_vector)"))
+
+# ==========================================
+# QUERY
+# ==========================================
+
+_has_fts = {}  # (engine url, table) -> its FTS table exists (checked once per process)
+
+def _sqlite_fts(bind, table):
+    key = (str(bind.url), table)
+    if key not in _has_fts:
+        _has_fts[key] = db.session.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"), {'n': f'{table}_fts'}).first() is not None
+    return _has_fts[key]
+
+def search_terms(q):
+    return [w.lower() for w in WORD.findall(q or '')][:MAX_TERMS]
+
+def _like_escape(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _starts_word(col, term):
+    # Some word of col starts with term (words split on spaces; close enough for ranking)
+    pattern = _like_escape(term) + '%'
+    return or_(func.lower(col).like(pattern, escape='\\'), func.lower(col).like('% ' + pattern, escape='\\'))
+
+def _matched(terms, t):
+    # (match condition, (table, on) to join or None) for table t
+    bind = db.session.get_bind(clause=select(Expense.id))
+    if bind.dialect.name == 'sqlite' and _sqlite_fts(bind, t.name):
+        name = f'{t.name}_fts'
+        fts = table(name, column('rowid'))
+        match = ' '.join('"' + term + '"*' for term in terms)
+        return literal_column(name).op('MATCH')(match), (fts, fts.c.rowid == t.c.id)
+    if bind.dialect.name == 'postgresql':
+        vector = literal_column(f'{t.name}.search_vector')
+        return vector.op('@@')(func.to_tsquery('simple', ' & '.join(term + ':*' for term in terms))), None
+    # No index: LIKE anywhere in the three columns (fine for small accounts only)
+    def contains(col, term):
+        return func.lower(col).like('%' + _like_escape(term) + '%', escape='\\')
+    return and_(*[or_(contains(t.c.category, term), contains(t.c.description, term), contains(t.c.payment_method, term)) for term in terms]), None
+
+def _score(terms, t):
+    # See the top of the file: 2 per word starting a category word, 1 per word starting a description word
+    return sum(case((_starts_word(t.c.category, term), 2), (_starts_word(t.c.description, term), 1), else_=0) for term in terms)
+
+def search_expenses(user_id, q, fields, filters=lambda t: [], start=None, cursor=None, limit=50):
+    # filters(t) -> conditions on table t (expense or expense_archive); start = lowest date asked for.
+    # Ordered by (score desc, date desc, id desc); the cursor holds the last row's triple.
+    # Returns (list of dicts with a 'score', next_cursor or None).
+    terms = search_terms(q)
+    if not terms: raise ValueError("'q' must contain at least one word")
+    tables = [Expense.__table__]
+    through = archived_through(Expense, user_id)
+    if through is not None and (start is None or start <= through): tables.append(ExpenseArchive.__table__)
+    columns = list(dict.fromkeys(fields + ['date', 'id']))
+    parts = []
+    for t in tables:
+        condition, join = _matched(terms, t)
+        part = select(*[t.c[c] for c in columns], _score(terms, t).label('score')).where(t.c.user_id == user_id, condition, *filters(t))
+        if join is not None: part = part.join_from(t, *join)
+        parts.append(part)
+    hits = (parts[0] if len(parts) == 1 else union_all(*parts)).subquery()
+    query = select(*[hits.c[c] for c in columns], hits.c.score)
+    if cursor:
+        try:
+            last_score, last_date, last_id = decode_cursor(cursor)
+            last_score, last_date, last_id = int(last_score), parse_date(last_date), int(last_id)
+        except (TypeError, ValueError): raise ValueError('Invalid cursor')
+        query = query.where(or_(hits.c.score < last_score,
+                                and_(hits.c.score == last_score, or_(hits.c.date < last_date, and_(hits.c.date == last_date, hits.c.id < last_id)))))
+    rows = db.session.execute(query.order_by(hits.c.score.desc(), hits.c.date.desc(), hits.c.id.desc()).limit(limit + 1)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = []
+    for row in rows:
+        values = row._mapping
+        item = {f: values[f] for f in fields}
+        item['score'] = int(values['score'])
+        items.append(item)
+    next_cursor = encode_cursor(int(rows[-1].score), rows[-1].date, rows[-1].id) if has_more else None
+    return items, next_cursor
@@ -0,0 +1,125 @@
+import argparse
+import datetime
+import random
+from sqlalchemy import insert
+from passwords import hash_password
+from models import db, User, Expense, Income, Budget, RecurringExpense, EmergencyFund
+from summaries import rebuild_for_users
+from platform_stats import recount
+from dates import add_months, month_key
+
+# ==========================================
+# SYNTHETIC DATA GENERATOR
+# ==========================================
+# Fills the database with realistic-looking users: salary + side income,
+# rent, groceries, commutes, bills, the odd trip, monthly budgets,
+# subscriptions and an emergency fund. Used by the benchmarks, handy for
+# trying the app locally too. Every seeded user's password is 'password'.
+# Needs an up-to-date schema (python migrate.py).
+#   python seed_data.py --users 50 --years 3
+#   python seed_data.py --users 5 --years 10 --prefix heavy   (a few very old accounts)
+
+# (category, expected entries per month, min amount, max amount, descriptions)
+SPENDING = [
+    ('Groceries', 8, 300, 3500, ['Supermarket', 'Vegetables', 'Milk & bread', 'Weekly groceries']),
+    ('Food', 14, 80, 1200, ['Lunch', 'Coffee', 'Dinner out', 'Swiggy order', 'Snacks']),
+    ('Transport', 12, 30, 600, ['Metro card', 'Auto', 'Cab ride', 'Fuel']),
+    ('Bills', 3, 400, 4000, ['Electricity', 'Internet', 'Mobile recharge', 'Water']),
+    ('Shopping', 4, 300, 6000, ['Clothes', 'Electronics', 'Home supplies', 'Gift']),
+    ('Entertainment', 3, 150, 1500, ['Movie', 'Concert', 'Games', 'Books']),
+    ('Health', 1, 200, 5000, ['Pharmacy', 'Doctor visit', 'Lab test']),
+    ('Travel', 0.3, 3000, 40000, ['Flight', 'Hotel', 'Train tickets']),
+]
+PAYMENT_METHODS = ['UPI', 'Card', 'Cash', 'Bank Transfer']
+SUBSCRIPTIONS = [
+    ('Netflix', 649, 'Entertainment', 'monthly'), ('Spotify', 119, 'Entertainment', 'monthly'),
+    ('Gym membership', 2000, 'Health', 'monthly'), ('Cloud storage', 130, 'Bills', 'monthly'),
+    ('Phone plan', 599, 'Bills', 'monthly'), ('Health insurance', 18000, 'Health', 'yearly'),
+    ('Newspaper', 350, 'Bills', 'monthly'), ('Car insurance', 9000, 'Transport', 'yearly'),
+]
+BUDGETED = ['Groceries', 'Food', 'Transport', 'Shopping', 'Entertainment']
+CHUNK = 5000
+
+def _count(rng, mean):
+    # Poisson-ish number of entries for a month (cheap and good enough)
+    return sum(1 for _ in range(int(mean * 2) + 1) if rng.random() < mean / (int(mean * 2) + 1))
+
+def user_rows(rng, user_id, first_month, months, today):
+    salary = rng.randrange(30000, 150000, 1000)
+    rent = rng.randrange(8000, 40000, 500)
+    expenses, incomes, budgets = [], [], []
+    for m in range(months):
+        start = add_months(first_month, m)
+        days = (add_months(start, 1) - start).days
+        last_day = min(days, (today - start).days + 1) if start <= today else 0
+        if last_day <= 0: break
+
+        incomes.append({'user_id': user_id, 'amount': float(salary), 'source': 'Salary', 'date': start})
+        if rng.random() < 0.3:
+            incomes.append({'user_id': user_id, 'amount': float(rng.randrange(2000, 30000, 100)), 'source': 'Freelance',
+                            'date': start + datetime.timedelta(days=rng.randrange(last_day))})
+        expenses.append({'user_id': user_id, 'amount': float(rent), 'category': 'Rent', 'date': start,
+                         'description': 'Monthly rent', 'payment_method': 'Bank Transfer'})
+        for category, mean, low, high, descriptions in SPENDING:
+            for _ in range(_count(rng, mean)):
+                expenses.append({'user_id': user_id, 'amount': round(rng.uniform(low, high), 2), 'category': category,
+                                 'date': start + datetime.timedelta(days=rng.randrange(last_day)),
+                                 'description': rng.choice(descriptions), 'payment_method': rng.choice(PAYMENT_METHODS)})
+        for category in rng.sample(BUDGETED, rng.randint(3, len(BUDGETED))):
+            budgets.append({'user_id': user_id, 'category': category, 'month': month_key(start),
+                            'amount': float(rng.randrange(1000, 20000, 500))})
+    return expenses, incomes, budgets
+
+def seed(users=20, years=3, rng_seed=42, prefix='seed', today=None, log=print):
+    # Returns the usernames it created (existing ones are left alone)
+    rng = random.Random(rng_seed)
+    today = today or datetime.date.today()
+    months = years * 12
+    first_month = add_months(datetime.date(today.year, today.month, 1), -(months - 1))
+    password_hash = hash_password('password')  # Once, it's slow on purpose
+
+    created = []
+    for i in range(users):
+        username = f"{prefix}{i:05d}"
+        if User.query.filter_by(username=username).first(): continue
+        user = User(username=username, email=f"{username}@example.com", password_hash=password_hash,
+                    user_type=rng.choice(['individual', 'individual', 'family', 'business']),
+                    joined_at=datetime.datetime.combine(first_month, datetime.time()) + datetime.timedelta(days=rng.randrange(28)))
+        db.session.add(user)
+        db.session.flush()
+
+        expenses, incomes, budgets = user_rows(rng, user.id, first_month, months, today)
+        for model, rows in ((Expense, expenses), (Income, incomes), (Budget, budgets)):
+            for start in range(0, len(rows), CHUNK):
+                db.session.execute(insert(model), rows[start:start + CHUNK])
+        for description, amount, category, frequency in rng.sample(SUBSCRIPTIONS, rng.randint(2, 6)):
+            db.session.add(RecurringExpense(description=description, amount=amount, category=category, frequency=frequency,
+                                            next_due_date=today + datetime.timedelta(days=rng.randrange(1, 30)), user_id=user.id))
+        db.session.add(EmergencyFund(user_id=user.id, target_amount=float(rng.randrange(100000, 600000, 10000)),
+                                     current_amount=float(rng.randrange(0, 300000, 1000)), alert_threshold=20000.0, monthly_goal=5000.0))
+        rebuild_for_users([user.id])
+        user.data_version = 1
+        db.session.commit()
+        created.append(username)
+        log(f"   - {username}: {len(expenses)} expenses, {len(incomes)} incomes, {len(budgets)} budgets")
+    # Rows went in with bulk inserts, so bring the admin counters up to date in one go
+    recount()
+    db.session.commit()
+    return created
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42, help='random seed (same seed -> same data)')
+    parser.add_argument('--prefix', default='seed', help='username prefix')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        try:
+            created = seed(args.users, args.years, args.seed, args.prefix)
+            print(f"\n✅ SUCCESS: Seeded {len(created)} users (password: 'password').\n")
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ ERROR: Seeding failed. Reason: {e}\n")
@@ -0,0 +1,106 @@
+import datetime
+import gzip
+from flask import request, current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson  # Optional: ~5-10x faster than the stdlib json module
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # Optional: only used when the client accepts 'br'
+except ImportError:
+    brotli = None
+
+# ==========================================
+# JSON PROVIDER (jsonify / request.get_json)
+# ==========================================
+# orjson when it's installed, the stdlib otherwise; same output either way
+# except for key order (kept as the handler built the dict, not sorted) and
+# float formatting details. A `date` is written as 'YYYY-MM-DD', so query rows
+# can go out as they come from the database (see rows_response).
+
+class SpendwiseJSONProvider(DefaultJSONProvider):
+    sort_keys = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime.date) and not isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)  # datetime -> HTTP date, Decimal, UUID, dataclasses, __html__
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None: return super().dumps(obj, **kwargs)
+        return self._orjson(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None: return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def _orjson(self, obj):
+        # Non-str keys and datetimes go through default() like with the stdlib provider;
+        # numpy scalars (analytics/insights) are floats/ints to the stdlib, so orjson takes them too
+        return orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY)
+
+    def response(self, *args, **kwargs):
+        if orjson is None: return super().response(*args, **kwargs)
+        # Straight to bytes, skipping the str round trip
+        return self._app.response_class(self._orjson(self._prepare_response_obj(args, kwargs)) + b"\n", mimetype=self.mimetype)
+
+# ==========================================
+# ROW LISTINGS
+# ==========================================
+# Listings hand over the query's row tuples as-is:
+#   ?shape=objects (default) -> [{"id": 1, "amount": 250.0, ...}, ...]
+#   ?shape=rows              -> {"fields": ["id", "amount", ...], "rows": [[1, 250.0, ...], ...]}
+# 'rows' builds no per-row dict at all and is about half the bytes.
+
+SHAPES = ('objects', 'rows')
+
+def row_shape():
+    shape = request.args.get('shape', 'objects')
+    if shape not in SHAPES: raise ValueError(f"shape must be one of {', '.join(SHAPES)}")
+    return shape
+
+def rows_response(fields, rows, shape='objects'):
+    if shape == 'rows':
+        return current_app.json.response({'fields': fields, 'rows': [tuple(r) for r in rows]})
+    return current_app.json.response([dict(zip(fields, r)) for r in rows])
+
+# ==========================================
+# RESPONSE COMPRESSION
+# ==========================================
+# Negotiated from Accept-Encoding (br if available, then gzip) for text-like
+# bodies of at least COMPRESS_MIN_BYTES. Skips streamed bodies (CSV export,
+# already gzipped on request), files (send_file) and anything already encoded.
+
+COMPRESSIBLE = ('application/json', 'text/csv', 'text/plain', 'text/html')
+
+def _encoding(accept):
+    if brotli is not None and accept['br']: return 'br'
+    if accept['gzip']: return 'gzip'
+    return None
+
+def compress_response(response):
+    config = current_app.config
+    if response.status_code < 200 or response.status_code in (204, 206, 304) or response.direct_passthrough \
+            or response.is_streamed or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _encoding(request.accept_encodings)
+    if encoding is None or (response.content_length or 0) < config.get('COMPRESS_MIN_BYTES', 1024):
+        return response
+    body = response.get_data()
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=config.get('COMPRESS_BROTLI_QUALITY', 4)))
+    else:
+        response.set_data(gzip.compress(body, compresslevel=config.get('COMPRESS_GZIP_LEVEL', 6), mtime=0))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def init_serialization(app):
+    app.json = SpendwiseJSONProvider(app)
+    if app.config.get('COMPRESS_RESPONSES', True):
+        app.after_request(compress_response)
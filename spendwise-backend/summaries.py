@@ -0,0 +1,99 @@
+from sqlalchemy import update, delete, func
+from sqlalchemy.exc import IntegrityError
+from models import db, Expense, Income, MonthlySummary
+from dates import parse_date, month_key, month_expr
+from platform_stats import record_expenses
+from archive import ledger_table
+
+# ==========================================
+# MONTHLY SUMMARY MAINTENANCE
+# ==========================================
+# Every write to Expense/Income also adjusts the matching MonthlySummary row
+# in the SAME session, so it is committed (or rolled back) together with the
+# transaction itself. Callers still do the db.session.commit().
+# Expense writes also move the platform-wide counters (platform_stats.py).
+
+def _apply(user_id, month, category, income=0.0, income_count=0, expense=0.0, expense_count=0):
+    key = (MonthlySummary.user_id == user_id, MonthlySummary.month == month, MonthlySummary.category == category)
+    bump = update(MonthlySummary).where(*key).values(
+        income_total=MonthlySummary.income_total + income,
+        income_count=MonthlySummary.income_count + income_count,
+        expense_total=MonthlySummary.expense_total + expense,
+        expense_count=MonthlySummary.expense_count + expense_count,
+    ).execution_options(synchronize_session=False)
+
+    # Increment in SQL so concurrent writers can't lose each other's updates
+    if db.session.execute(bump).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(MonthlySummary(user_id=user_id, month=month, category=category,
+                                          income_total=income, income_count=income_count,
+                                          expense_total=expense, expense_count=expense_count))
+    except IntegrityError:
+        # Another request created the row first, so just add onto it
+        db.session.execute(bump)
+
+def _prune(user_id, month, category):
+    # Drop rows that no longer count anything (keeps float dust out of the totals)
+    db.session.execute(delete(MonthlySummary).where(
+        MonthlySummary.user_id == user_id, MonthlySummary.month == month, MonthlySummary.category == category,
+        MonthlySummary.income_count <= 0, MonthlySummary.expense_count <= 0,
+    ).execution_options(synchronize_session=False))
+
+def record_expense(expense, sign=1):
+    month = month_key(parse_date(expense.date))
+    _apply(expense.user_id, month, expense.category, expense=sign * expense.amount, expense_count=sign)
+    record_expenses(expense.user_id, sign * expense.amount, sign)
+    if sign < 0: _prune(expense.user_id, month, expense.category)
+
+def record_income(income, sign=1):
+    month = month_key(parse_date(income.date))
+    _apply(income.user_id, month, income.source, income=sign * income.amount, income_count=sign)
+    if sign < 0: _prune(income.user_id, month, income.source)
+
+def record_bulk(user_id, expenses=(), incomes=()):
+    # For batch writers (import, recurring materializer): rows are dicts with
+    # date / amount / category (expenses) or source (incomes). Deltas are folded
+    # per (month, category) first, so it's one statement per key, not per row.
+    deltas = {}
+    for row in expenses:
+        d = deltas.setdefault((month_key(parse_date(row['date'])), row['category']), [0.0, 0, 0.0, 0])
+        d[2] += row['amount']; d[3] += 1
+    for row in incomes:
+        d = deltas.setdefault((month_key(parse_date(row['date'])), row['source']), [0.0, 0, 0.0, 0])
+        d[0] += row['amount']; d[1] += 1
+    for (month, category), (inc, inc_n, exp, exp_n) in deltas.items():
+        _apply(user_id, month, category, income=inc, income_count=inc_n, expense=exp, expense_count=exp_n)
+    if expenses:
+        record_expenses(user_id, sum(row['amount'] for row in expenses), len(expenses))
+
+# ==========================================
+# REBUILD / BACKFILL
+# ==========================================
+
+def rebuild_for_users(user_ids):
+    # Recomputes the summary rows of the given users from the raw tables.
+    # The grouped queries return O(months x categories) rows per user, not raw transactions.
+    user_ids = list(user_ids)
+    if not user_ids: return 0
+    exp, inc = ledger_table(Expense), ledger_table(Income)  # Archived rows count too
+    exp_month = month_expr(exp.c.date).label('month')
+    inc_month = month_expr(inc.c.date).label('month')
+    expenses = db.session.query(exp.c.user_id, exp_month, exp.c.category, func.sum(exp.c.amount), func.count(exp.c.id)) \
+        .filter(exp.c.user_id.in_(user_ids)).group_by(exp.c.user_id, exp_month, exp.c.category).all()
+    incomes = db.session.query(inc.c.user_id, inc_month, inc.c.source, func.sum(inc.c.amount), func.count(inc.c.id)) \
+        .filter(inc.c.user_id.in_(user_ids)).group_by(inc.c.user_id, inc_month, inc.c.source).all()
+
+    rows = {}
+    for user_id, month, category, total, count in expenses:
+        row = rows.setdefault((user_id, month, category), {'user_id': user_id, 'month': month, 'category': category, 'income_total': 0.0, 'income_count': 0})
+        row.update(expense_total=total, expense_count=count)
+    for user_id, month, source, total, count in incomes:
+        row = rows.setdefault((user_id, month, source), {'user_id': user_id, 'month': month, 'category': source, 'expense_total': 0.0, 'expense_count': 0})
+        row.update(income_total=total, income_count=count)
+
+    db.session.execute(delete(MonthlySummary).where(MonthlySummary.user_id.in_(user_ids)).execution_options(synchronize_session=False))
+    if rows:
+        db.session.execute(MonthlySummary.__table__.insert(), list(rows.values()))
+    return len(rows)
@@ -0,0 +1,94 @@
+from sqlalchemy import select, or_, and_
+from models import db, Expense, Income, RecurringExpense, Budget, Tombstone
+from pagination import encode_cursor, decode_cursor
+from versions import get_data_version
+from archive import ARCHIVE_OF, ledger_table
+
+# ==========================================
+# DELTA SYNC (/api/sync)
+# ==========================================
+# Every write stamps the rows it touches with the user's new data_version
+# (updated_seq), and every delete leaves a Tombstone with that version. So
+# "what changed since version N" is an index range scan per table:
+#
+#   GET /api/sync                 -> everything (first sync)
+#   GET /api/sync?since=<next>    -> only what changed after that point
+#   -> {"upserted": {"expense": [...], "income": [...], "recurring": [...], "budget": [...]},
+#       "deleted": {"expense": [ids], "recurring": [ids]},
+#       "next": "<token>", "has_more": false}
+#
+# Changes come in pages of `limit` rows, ordered by (seq, resource, id); the
+# token is the last position handed out. Keep calling with ?since=<next> while
+# has_more is true, then store `next` for the next sync. Within a page, apply
+# the deletes before the upserts (ids can be reused after a delete, never the
+# other way round).
+#
+# Each page only reads up to the user's current data_version: rows with a
+# higher seq may belong to a transaction that hasn't committed yet, and a page
+# must never step past a version that could still gain rows.
+
+RESOURCES = {
+    'expense': (Expense, ['id', 'amount', 'category', 'date', 'payment_method', 'description']),
+    'income': (Income, ['id', 'amount', 'source', 'date']),
+    'recurring': (RecurringExpense, ['id', 'description', 'amount', 'category', 'frequency', 'next_due_date']),
+    'budget': (Budget, ['id', 'category', 'amount', 'month']),
+}
+KINDS = list(RESOURCES) + ['deleted']  # Position of each stream in the (seq, kind, id) order
+END = len(KINDS)  # A token at (seq, END, 0) means "everything up to seq"
+
+class StaleToken(Exception):
+    # The token is from a later version than the server has (e.g. restored database): resync from scratch
+    pass
+
+def record_deletion(user_id, resource, row_id, seq):
+    db.session.add(Tombstone(user_id=user_id, resource=resource, row_id=row_id, seq=seq))
+
+def parse_token(token):
+    # -> (seq, kind, id); raises ValueError on anything that isn't one of our tokens
+    try: seq, kind, row_id = (int(v) for v in decode_cursor(token))
+    except (TypeError, ValueError): raise ValueError('Invalid sync token')
+    if seq < 0 or not 0 <= kind <= END: raise ValueError('Invalid sync token')
+    return seq, kind, row_id
+
+def _after(seq_col, id_col, kind, position):
+    # (seq, kind, id) > position for a stream whose kind is fixed
+    if position is None: return None
+    last_seq, last_kind, last_id = position
+    if kind > last_kind: return seq_col >= last_seq
+    if kind < last_kind: return seq_col > last_seq
+    return or_(seq_col > last_seq, and_(seq_col == last_seq, id_col > last_id))
+
+def _stream(kind, query, seq_col, id_col, position, upto, limit):
+    after = _after(seq_col, id_col, kind, position)
+    query = query.where(seq_col <= upto, *([after] if after is not None else []))
+    rows = db.session.execute(query.order_by(seq_col, id_col).limit(limit + 1)).all()
+    return [((row.seq, kind, row.id), row) for row in rows]
+
+def changes_since(user_id, token=None, limit=500):
+    # Returns the response dict. token=None -> from the beginning.
+    position = parse_token(token) if token else None
+    upto = get_data_version(user_id)
+    if position and position[0] > upto: raise StaleToken()
+
+    found = []
+    for kind, (name, (model, fields)) in enumerate(RESOURCES.items()):
+        t = ledger_table(model, user_id) if model in ARCHIVE_OF else model.__table__  # Archived rows too
+        query = select(*[t.c[f] for f in fields], t.c.updated_seq.label('seq')).where(t.c.user_id == user_id)
+        found += _stream(kind, query, t.c.updated_seq, t.c.id, position, upto, limit)
+    t = Tombstone.__table__
+    query = select(t.c.id, t.c.resource, t.c.row_id, t.c.seq).where(t.c.user_id == user_id)
+    found += _stream(END - 1, query, t.c.seq, t.c.id, position, upto, limit)
+
+    found.sort(key=lambda item: item[0])
+    has_more = len(found) > limit
+    found = found[:limit]
+    upserted = {name: [] for name in RESOURCES}
+    deleted = {name: [] for name in RESOURCES}
+    for (_, kind, _), row in found:
+        if kind == END - 1:
+            deleted[row.resource].append(row.row_id)
+        else:
+            name = KINDS[kind]
+            upserted[name].append({f: row._mapping[f] for f in RESOURCES[name][1]})
+    next_position = found[-1][0] if has_more else (upto, END, 0)
+    return {'upserted': upserted, 'deleted': deleted, 'next': encode_cursor(*next_position), 'has_more': has_more}
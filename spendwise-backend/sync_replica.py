@@ -0,0 +1,43 @@
+import argparse
+import os
+import sqlite3
+import time
+from sqlalchemy.engine import make_url
+from config import Config
+
+# Local stand-in for replication when both DATABASE_URL and DATABASE_REPLICA_URL
+# point at SQLite files: copies the primary into the replica file (online backup,
+# safe while the app is running). With --loop the replica lags by up to SECONDS,
+# which is handy for trying the read-your-writes behaviour.
+#   DATABASE_URL=sqlite:///primary.db DATABASE_REPLICA_URL=sqlite:///replica.db python sync_replica.py --loop 5
+
+def sqlite_path(uri):
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or not url.database:
+        raise ValueError(f"{uri} is not a SQLite file (use real replication for other databases)")
+    # Relative paths live in the instance folder, like Flask-SQLAlchemy resolves them
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', url.database)
+
+def sync(primary, replica):
+    source, target = sqlite3.connect(primary), sqlite3.connect(replica)
+    try:
+        source.backup(target)
+    finally:
+        source.close(); target.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--loop', type=int, metavar='SECONDS', help='repeat forever with this pause')
+    args = parser.parse_args()
+
+    try:
+        primary = sqlite_path(Config.SQLALCHEMY_DATABASE_URI or '')
+        replica = sqlite_path(Config.SQLALCHEMY_BINDS['replica']['url'] if Config.SQLALCHEMY_BINDS else '')
+    except ValueError as e:
+        print(f"\n❌ ERROR: {e}\n")
+        raise SystemExit(1)
+    while True:
+        sync(primary, replica)
+        print(f"✅ Replica synced from {primary}")
+        if not args.loop: break
+        time.sleep(args.loop)
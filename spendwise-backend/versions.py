@@ -0,0 +1,60 @@
+import datetime
+from sqlalchemy import update, select, event
+from flask_sqlalchemy.session import Session
+from models import db, User
+from auth_cache import user_cache
+
+# ==========================================
+# PER-USER DATA VERSION
+# ==========================================
+# A counter on the user row that goes up by one on every write to that user's
+# data. Anything derived from the data (cached reports, ...) is keyed by it,
+# so a write invalidates it without having to track down every copy.
+# data_updated_at goes along with it for Last-Modified headers.
+#
+# The version is also part of the cached user (auth_cache.py) so conditional
+# GETs can answer 304 without a query; that entry is dropped once the bump
+# is COMMITTED (dropping it earlier could let a reader cache the old value).
+#
+# Rows written alongside a bump are stamped with the new version (updated_seq)
+# for delta sync. The UPDATE locks the user row until commit, so one user's
+# versions always commit in order.
+
+def _touched(user_ids):
+    db.session.info.setdefault('touched_users', set()).update(user_ids)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_touched(session):
+    for user_id in session.info.pop('touched_users', ()):
+        user_cache.invalidate(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_touched(session):
+    session.info.pop('touched_users', None)
+
+def bump_data_version(user_id):
+    # Atomic +1 inside the caller's transaction; returns the new version
+    _touched([user_id])
+    stmt = update(User).where(User.id == user_id) \
+        .values(data_version=User.data_version + 1, data_updated_at=datetime.datetime.utcnow()) \
+        .execution_options(synchronize_session=False)
+    if db.session.get_bind().dialect.update_returning:
+        return db.session.execute(stmt.returning(User.data_version)).scalar()
+    db.session.execute(stmt)
+    return get_data_version(user_id)
+
+def bump_data_versions(user_ids):
+    # Same, for batch jobs touching many users at once (one statement); returns {user_id: new version}
+    user_ids = list(user_ids)
+    if not user_ids: return {}
+    _touched(user_ids)
+    stmt = update(User).where(User.id.in_(user_ids)) \
+        .values(data_version=User.data_version + 1, data_updated_at=datetime.datetime.utcnow()) \
+        .execution_options(synchronize_session=False)
+    if db.session.get_bind().dialect.update_returning:
+        return dict(db.session.execute(stmt.returning(User.id, User.data_version)).all())
+    db.session.execute(stmt)
+    return dict(db.session.execute(select(User.id, User.data_version).where(User.id.in_(user_ids))).all())
+
+def get_data_version(user_id):
+    return db.session.execute(select(User.data_version).where(User.id == user_id)).scalar() or 0